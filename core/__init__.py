@@ -16,5 +16,9 @@ This package includes configuration modules and database interfaces for both SQL
 from .config import aws, ideation, sql, noSql
 from .database.sqlDatabase import sqlDb
 from .database.noSqlDatabase import NoSqlConnection
+from .database.asyncNoSqlDatabase import AsyncNoSqlConnection
 
-__all__ = ['aws', 'ideation', 'sql', 'noSql', 'sqlDb', 'NoSqlConnection']
+__all__ = [
+    'aws', 'ideation', 'sql', 'noSql', 'sqlDb', 'NoSqlConnection',
+    'AsyncNoSqlConnection'
+]
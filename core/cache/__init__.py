@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Package Name: cache
+Description: This package contains the caches shared by the services.
+Author: MathTeixeira
+Date: July 26, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+from .lruCache import LruTtlCache
+from .cacheBackend import CacheBackend, MemoryCacheBackend, createCacheBackend
+
+__all__ = [
+    'LruTtlCache', 'CacheBackend', 'MemoryCacheBackend', 'createCacheBackend'
+]
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: cacheBackend.py
+Description: This module defines the CacheBackend interface, its in-process
+ implementation and the factory that picks a backend from the configuration.
+Author: MathTeixeira
+Date: July 27, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+from typing import Any
+
+from .lruCache import LruTtlCache
+
+
+class CacheBackend:
+  """
+  The storage behind a service cache.
+
+  Values must be JSON-compatible (pydantic models included), so the same
+  service code runs on an in-process backend and on a shared one. Every
+  method is async; a backend that cannot reach its store answers like an
+  empty cache instead of raising.
+
+  Attributes:
+    name (str): The backend name reported in the stats.
+  """
+
+  name: str = "none"
+
+  @property
+  def enabled(self) -> bool:
+    """
+    bool: Whether the backend can hold any entry.
+    """
+    return True
+
+  async def get(self, key: str) -> Any:
+    """
+    Get a value.
+
+    Args:
+      key (str): The cache key.
+
+    Returns:
+      Any: The cached value, or None if it is missing or expired.
+    """
+    raise NotImplementedError
+
+  async def getMany(self, keys: list[str]) -> list[Any]:
+    """
+    Get several values at once.
+
+    Args:
+      keys (list[str]): The cache keys.
+
+    Returns:
+      list[Any]: The cached value of each key, None where it is missing.
+    """
+    raise NotImplementedError
+
+  async def set(self, key: str, value: Any, ttl: float) -> None:
+    """
+    Store a value.
+
+    Args:
+      key (str): The cache key.
+      value (Any): The value to store.
+      ttl (float): Seconds the value stays valid.
+    """
+    raise NotImplementedError
+
+  async def setMany(self, values: dict[str, Any], ttl: float) -> None:
+    """
+    Store several values at once.
+
+    Args:
+      values (dict[str, Any]): The values to store by key.
+      ttl (float): Seconds the values stay valid.
+    """
+    raise NotImplementedError
+
+  async def delete(self, key: str) -> None:
+    """
+    Remove a key.
+
+    Args:
+      key (str): The cache key.
+    """
+    raise NotImplementedError
+
+  async def incr(self, key: str, amount: int, start: int, ttl: float) -> int:
+    """
+    Atomically add to a counter.
+
+    A missing counter is created with the value `start` before `amount` is
+    added. The TTL is set when the counter is created or changed, so reading
+    it with an `amount` of 0 does not keep it alive.
+
+    Args:
+      key (str): The counter key.
+      amount (int): The amount to add; 0 only reads the counter.
+      start (int): Value of a counter that does not exist yet.
+      ttl (float): Seconds the counter stays valid after it last changed.
+
+    Returns:
+      int: The counter after the addition, or None if the backend failed.
+    """
+    raise NotImplementedError
+
+  def getStats(self) -> dict:
+    """
+    Get the backend counters.
+
+    Returns:
+      dict: Backend-specific counters.
+    """
+    return {}
+
+  async def close(self) -> None:
+    """
+    Release the backend's connections.
+    """
+
+
+class MemoryCacheBackend(CacheBackend):
+  """
+  A CacheBackend holding its entries in this worker's memory.
+
+  Values are stored as they are, without serialization, so callers must not
+  mutate what they store or read.
+
+  Attributes:
+    cache (LruTtlCache): The underlying entries.
+  """
+
+  name: str = "memory"
+
+  def __init__(self, maxSize: int, ttl: float) -> None:
+    """
+    Initialize the MemoryCacheBackend instance.
+
+    Args:
+      maxSize (int): Maximum number of entries. 0 disables the backend.
+      ttl (float): Default seconds an entry stays valid.
+    """
+    self.cache: LruTtlCache = LruTtlCache(maxSize, ttl)
+
+  @property
+  def enabled(self) -> bool:
+    """
+    bool: Whether the backend can hold any entry.
+    """
+    return self.cache.maxSize > 0
+
+  async def get(self, key: str) -> Any:
+    """
+    See CacheBackend.get.
+    """
+    return self.cache.get(key)
+
+  async def getMany(self, keys: list[str]) -> list[Any]:
+    """
+    See CacheBackend.getMany.
+    """
+    return [self.cache.get(key) for key in keys]
+
+  async def set(self, key: str, value: Any, ttl: float) -> None:
+    """
+    See CacheBackend.set.
+    """
+    self.cache.set(key, value, ttl)
+
+  async def setMany(self, values: dict[str, Any], ttl: float) -> None:
+    """
+    See CacheBackend.setMany.
+    """
+    for key, value in values.items():
+      self.cache.set(key, value, ttl)
+
+  async def delete(self, key: str) -> None:
+    """
+    See CacheBackend.delete.
+    """
+    self.cache.delete(key)
+
+  async def incr(self, key: str, amount: int, start: int, ttl: float) -> int:
+    """
+    See CacheBackend.incr.
+    """
+    entry = self.cache.entries.get(key)
+    if entry is None or entry[0] <= self.cache.clock():
+      self.cache.set(key, start + amount, ttl)
+      return start + amount
+    if amount:
+      self.cache.set(key, entry[1] + amount, ttl)
+    else:
+      self.cache.entries.move_to_end(key)
+    return entry[1] + amount
+
+  def getStats(self) -> dict:
+    """
+    See CacheBackend.getStats.
+    """
+    return {
+        "entries": len(self.cache),
+        "evictions": self.cache.stats["evictions"],
+        "expirations": self.cache.stats["expirations"]
+    }
+
+
+def createCacheBackend(backend: str, maxSize: int, ttl: float,
+                       redisUrl: str) -> CacheBackend:
+  """
+  Create the cache backend named in the configuration.
+
+  The Redis backend is imported here so the `redis` package is only needed
+  when it is selected.
+
+  Args:
+    backend (str): 'memory' or 'redis'.
+    maxSize (int): Maximum number of entries of a memory backend.
+    ttl (float): Default seconds an entry of a memory backend stays valid.
+    redisUrl (str): URL of the Redis server of a redis backend.
+
+  Returns:
+    CacheBackend: The new backend.
+
+  Raises:
+    ValueError: If the backend name is unknown.
+  """
+  if backend == "memory":
+    return MemoryCacheBackend(maxSize, ttl)
+  if backend == "redis":
+    from .redisCacheBackend import RedisCacheBackend
+    return RedisCacheBackend.fromUrl(redisUrl)
+  raise ValueError(f"Unknown cache backend '{backend}'")
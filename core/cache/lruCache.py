@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: lruCache.py
+Description: This module provides a size-bounded, time-bounded in-process
+ cache.
+Author: MathTeixeira
+Date: July 26, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+
+class LruTtlCache:
+  """
+  A least-recently-used cache whose entries also expire after a TTL.
+
+  Reading an entry makes it the most recently used one; storing a new entry
+  when the cache is full evicts the least recently used one. Expired entries
+  are dropped when they are read.
+
+  Attributes:
+    maxSize (int): Maximum number of entries.
+    ttl (float): Seconds an entry stays valid after it is stored.
+    clock (Callable[[], float]): Monotonic time source.
+    entries (OrderedDict[str, tuple[float, Any]]): Expiry time and value of
+     each key, least recently used first.
+    stats (dict): Hits, misses, evictions and expirations.
+  """
+
+  def __init__(self,
+               maxSize: int,
+               ttl: float,
+               clock: Callable[[], float] = time.monotonic) -> None:
+    """
+    Initialize the LruTtlCache instance.
+
+    Args:
+      maxSize (int): Maximum number of entries.
+      ttl (float): Seconds an entry stays valid after it is stored.
+      clock (Callable[[], float]): Monotonic time source. Defaults to
+       time.monotonic.
+    """
+    self.maxSize: int = maxSize
+    self.ttl: float = ttl
+    self.clock: Callable[[], float] = clock
+    self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+    self.stats: dict = {
+        "hits": 0,
+        "misses": 0,
+        "evictions": 0,
+        "expirations": 0
+    }
+
+  def __len__(self) -> int:
+    """
+    Get the number of entries, including expired ones not read yet.
+
+    Returns:
+      int: The number of entries.
+    """
+    return len(self.entries)
+
+  def get(self, key: str, default: Any = None) -> Any:
+    """
+    Get a value and mark it as recently used.
+
+    Args:
+      key (str): The cache key.
+      default (Any): Returned when the key is missing or expired.
+
+    Returns:
+      Any: The cached value or `default`.
+    """
+    entry = self.entries.get(key)
+    if entry is None:
+      self.stats["misses"] += 1
+      return default
+    if entry[0] <= self.clock():
+      del self.entries[key]
+      self.stats["expirations"] += 1
+      self.stats["misses"] += 1
+      return default
+    self.entries.move_to_end(key)
+    self.stats["hits"] += 1
+    return entry[1]
+
+  def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+    """
+    Store a value, evicting the least recently used entries if needed.
+
+    Args:
+      key (str): The cache key.
+      value (Any): The value to store.
+      ttl (float | None): Seconds the value stays valid. Defaults to the
+       cache's `ttl`.
+    """
+    if self.maxSize <= 0:
+      return
+    self.entries[key] = (self.clock() + (self.ttl if ttl is None else ttl),
+                         value)
+    self.entries.move_to_end(key)
+    while len(self.entries) > self.maxSize:
+      self.entries.popitem(last=False)
+      self.stats["evictions"] += 1
+
+  def delete(self, key: str) -> bool:
+    """
+    Remove a key.
+
+    Args:
+      key (str): The cache key.
+
+    Returns:
+      bool: True if the key was cached.
+    """
+    return self.entries.pop(key, None) is not None
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: redisCacheBackend.py
+Description: This module provides a CacheBackend stored on a Redis server,
+ shared by every worker that points at it.
+Author: MathTeixeira
+Date: July 27, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import json
+import logging
+from typing import Any
+
+import pydantic_core
+from redis import asyncio as redis
+from redis.exceptions import RedisError
+
+from .cacheBackend import CacheBackend
+
+
+class RedisCacheBackend(CacheBackend):
+  """
+  A CacheBackend on any server speaking the Redis protocol.
+
+  Values are stored as JSON. A failing server never fails the request: every
+  operation logs the error, counts it and answers like an empty cache.
+
+  Attributes:
+    client (redis.Redis): The asyncio Redis client.
+    stats (dict): Errors returned by the server.
+  """
+
+  name: str = "redis"
+
+  def __init__(self, client: redis.Redis) -> None:
+    """
+    Initialize the RedisCacheBackend instance.
+
+    Args:
+      client (redis.Redis): The asyncio Redis client, e.g. a
+       `fakeredis.aioredis.FakeRedis` in a test.
+    """
+    self.client: redis.Redis = client
+    self.stats: dict = {"errors": 0}
+
+  @classmethod
+  def fromUrl(cls, url: str) -> 'RedisCacheBackend':
+    """
+    Create a backend connected to a Redis URL.
+
+    Args:
+      url (str): The Redis URL, e.g. redis://localhost:6379/0.
+
+    Returns:
+      RedisCacheBackend: The new backend.
+    """
+    return cls(redis.Redis.from_url(url))
+
+  def failed(self, operation: str, error: RedisError) -> None:
+    """
+    Record a failed operation.
+
+    Args:
+      operation (str): The backend method that failed.
+      error (RedisError): The error.
+    """
+    self.stats["errors"] += 1
+    logging.error(f"Redis cache {operation} failed: {error}")
+
+  @staticmethod
+  def milliseconds(ttl: float) -> int:
+    """
+    Convert a TTL to the milliseconds Redis expects.
+
+    Args:
+      ttl (float): The TTL in seconds.
+
+    Returns:
+      int: The TTL in milliseconds, at least 1.
+    """
+    return max(int(ttl * 1000), 1)
+
+  async def get(self, key: str) -> Any:
+    """
+    See CacheBackend.get.
+    """
+    try:
+      value = await self.client.get(key)
+    except RedisError as e:
+      self.failed("get", e)
+      return None
+    return json.loads(value) if value is not None else None
+
+  async def getMany(self, keys: list[str]) -> list[Any]:
+    """
+    See CacheBackend.getMany.
+    """
+    try:
+      values = await self.client.mget(keys)
+    except RedisError as e:
+      self.failed("getMany", e)
+      return [None] * len(keys)
+    return [json.loads(value) if value is not None else None for value in values]
+
+  async def set(self, key: str, value: Any, ttl: float) -> None:
+    """
+    See CacheBackend.set.
+    """
+    try:
+      await self.client.set(key,
+                            pydantic_core.to_json(value),
+                            px=self.milliseconds(ttl))
+    except RedisError as e:
+      self.failed("set", e)
+
+  async def setMany(self, values: dict[str, Any], ttl: float) -> None:
+    """
+    See CacheBackend.setMany.
+    """
+    try:
+      async with self.client.pipeline(transaction=False) as pipe:
+        for key, value in values.items():
+          pipe.set(key, pydantic_core.to_json(value), px=self.milliseconds(ttl))
+        await pipe.execute()
+    except RedisError as e:
+      self.failed("setMany", e)
+
+  async def delete(self, key: str) -> None:
+    """
+    See CacheBackend.delete.
+    """
+    try:
+      await self.client.delete(key)
+    except RedisError as e:
+      self.failed("delete", e)
+
+  async def incr(self, key: str, amount: int, start: int, ttl: float) -> int:
+    """
+    See CacheBackend.incr.
+
+    The create, add and expire commands run in one MULTI/EXEC round trip.
+    """
+    try:
+      async with self.client.pipeline(transaction=True) as pipe:
+        pipe.set(key, start, nx=True, px=self.milliseconds(ttl))
+        pipe.incrby(key, amount)
+        if amount:
+          pipe.pexpire(key, self.milliseconds(ttl))
+        results = await pipe.execute()
+    except RedisError as e:
+      self.failed("incr", e)
+      return None
+    return results[1]
+
+  def getStats(self) -> dict:
+    """
+    See CacheBackend.getStats.
+    """
+    return dict(self.stats)
+
+  async def close(self) -> None:
+    """
+    See CacheBackend.close.
+    """
+    await self.client.aclose()
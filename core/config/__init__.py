@@ -8,7 +8,7 @@ Version: 1.0.0
 License: MIT License
 Contact Information: mathteixeira55
 
-This file imports and exports configuration instances for SQL, AWS, Ideation, and NoSQL components.
+This file imports and exports configuration instances for SQL, AWS, Ideation, NoSQL, 1-page BP and model layer components.
 These instances are created using the singleton pattern implemented in their respective modules.
 """
 
@@ -17,5 +17,6 @@ from .awsConfig import aws
 from .ideationConfig import ideation
 from .noSqlConfig import noSql
 from .pageBPConfig import pageBP
+from .llmConfig import llm
 
-__all__ = ['sql', 'aws', 'ideation', 'noSql', pageBP]
+__all__ = ['sql', 'aws', 'ideation', 'noSql', pageBP, 'llm']
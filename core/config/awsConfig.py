@@ -25,6 +25,8 @@ class AWSConfig:
   Attributes:
     AWS_ACCESS_KEY_ID (str): The AWS access key ID.
     AWS_SECRET_ACCESS_KEY (str): The AWS secret access key.
+    MAX_POOL_CONNECTIONS (int): The maximum number of pooled HTTP connections
+     kept by each shared boto3 client.
 
   Raises:
     ValueError: If required environment variables are not set.
@@ -44,6 +46,8 @@ class AWSConfig:
     load_dotenv()
     self.AWS_ACCESS_KEY_ID: str = self.getEnv('AWS_ACCESS_KEY_ID')
     self.AWS_SECRET_ACCESS_KEY: str = self.getEnv('AWS_SECRET_ACCESS_KEY')
+    self.MAX_POOL_CONNECTIONS: int = int(
+        os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
 
   @classmethod
   def getInstance(cls) -> 'AWSConfig':
@@ -26,8 +26,49 @@ class IdeationConfig:
     MAX_TOKENS (int): Maximum tokens to generate for the output.
     TEMPERATURE (float): Temperature parameter for sampling creativity.
     TRIM_SIZE (int): The maximum number of tokens to keep in the chat history.
+    TRIM_STRATEGY (str): How the chat history is trimmed to TRIM_SIZE, either
+     'last' (most recent messages) or 'keepFirst' (first turn plus most recent
+     messages).
+    HISTORY_WINDOW_MESSAGES (int): Most recent messages read from the database
+     for the 'last' strategy in 'window' mode, before token trimming.
+    MEMORY_MODE (str): 'window' sends the trimmed history only; 'summary' also
+     keeps a rolling summary of older turns and sends summary plus recent ones.
+    SUMMARY_RECENT_MESSAGES (int): Most recent messages never summarized.
+    SUMMARY_BATCH_MESSAGES (int): Minimum number of messages folded into the
+     summary per background update.
     MODEL (str): The model to use for the chatbot.
-    CHATHISTORY_DB_URL (str): URL for the chat history database.
+    CHATHISTORY_COLLECTION_NAME (str): Collection that stores the chat histories.
+    CHATHISTORY_SEARCH_FIELD (str): Field that identifies a chat session.
+    MESSAGE_BUCKET_SIZE (int): Maximum number of messages per bucket document.
+    MESSAGE_BUCKET_SUFFIX (str): Suffix appended to a chat history collection
+     name to get the collection of its message buckets.
+    SESSION_CACHE_SIZE (int): Maximum number of entries of the worker's session
+     cache (0 disables it).
+    SESSION_CACHE_TTL (float): Seconds a cached session entry stays valid.
+    SESSION_CACHE_MAX_MESSAGES (int): Largest session whose messages are
+     cached.
+    SESSION_CACHE_BACKEND (str): Where the session cache lives: 'memory' (one
+     cache per worker) or 'redis' (one cache shared by every worker).
+    SESSION_CACHE_REDIS_URL (str): Redis server of the 'redis' backend.
+    TRANSFER_BATCH_SIZE (int): Sessions read or written per batch by the NDJSON
+     export and import.
+    TRANSFER_MAX_ERRORS (int): Maximum number of line errors reported by an
+     import.
+    WRITE_BEHIND_ENABLED (bool): Whether chat turns are saved by the
+     background write queue instead of inline.
+    WRITE_BEHIND_BATCH_SIZE (int): Sessions written per bulk write.
+    WRITE_BEHIND_FLUSH_SECONDS (float): Seconds a queued turn may wait for its
+     batch to fill.
+    WRITE_BEHIND_MAX_PENDING (int): Messages the write queue may hold; a turn
+     finding it full waits for a flush.
+    WRITE_BEHIND_MAX_ATTEMPTS (int): Attempts to write the queued messages of
+     a session before they are dropped.
+    WRITE_BEHIND_RETRY_SECONDS (float): Seconds before the first retry of a
+     failed write, doubled at each attempt.
+    CHECKPOINT_TOKENS (int): Output tokens after which a partial answer is
+     saved again (0 disables the token trigger).
+    CHECKPOINT_SECONDS (float): Seconds after which a partial answer is saved
+     again (0 disables the time trigger).
   """
 
   instance: 'IdeationConfig | None' = None
@@ -44,11 +85,40 @@ class IdeationConfig:
     self.MAX_TOKENS: int = 500
     self.TEMPERATURE: float = 0.7
     self.TRIM_SIZE: int = 500
+    self.TRIM_STRATEGY: str = 'last'
+    self.HISTORY_WINDOW_MESSAGES: int = 100
+    self.MEMORY_MODE: str = 'window'
+    self.SUMMARY_RECENT_MESSAGES: int = 6
+    self.SUMMARY_BATCH_MESSAGES: int = 6
     self.MODEL: str = 'anthropic.claude-3-haiku-20240307-v1:0'
-    self.CHATHISTORY_DB_URL: str = 'http://localhost:8000/api/chathistory'
     self.CHATHISTORY_COLLECTION_NAME: str = 'chatHistories'
     self.CHATHISTORY_SEARCH_FIELD: str = 'sessionName'
-    self.MESSAGE_LIST_URL: str = 'http://localhost:8000/api/messages'
+    self.MESSAGE_BUCKET_SIZE: int = 50
+    self.MESSAGE_BUCKET_SUFFIX: str = '.buckets'
+    self.SESSION_CACHE_SIZE: int = 1000
+    self.SESSION_CACHE_TTL: float = 300.0
+    self.SESSION_CACHE_MAX_MESSAGES: int = 1000
+    self.SESSION_CACHE_BACKEND: str = os.getenv('SESSION_CACHE_BACKEND',
+                                                'memory')
+    self.SESSION_CACHE_REDIS_URL: str = os.getenv('SESSION_CACHE_REDIS_URL',
+                                                  'redis://localhost:6379/0')
+    self.TRANSFER_BATCH_SIZE: int = 500
+    self.TRANSFER_MAX_ERRORS: int = 20
+    self.WRITE_BEHIND_ENABLED: bool = os.getenv('WRITE_BEHIND_ENABLED',
+                                                'true').lower() == 'true'
+    self.WRITE_BEHIND_BATCH_SIZE: int = int(
+        os.getenv('WRITE_BEHIND_BATCH_SIZE', '100'))
+    self.WRITE_BEHIND_FLUSH_SECONDS: float = float(
+        os.getenv('WRITE_BEHIND_FLUSH_SECONDS', '0.05'))
+    self.WRITE_BEHIND_MAX_PENDING: int = int(
+        os.getenv('WRITE_BEHIND_MAX_PENDING', '2000'))
+    self.WRITE_BEHIND_MAX_ATTEMPTS: int = int(
+        os.getenv('WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+    self.WRITE_BEHIND_RETRY_SECONDS: float = float(
+        os.getenv('WRITE_BEHIND_RETRY_SECONDS', '0.2'))
+    self.CHECKPOINT_TOKENS: int = int(os.getenv('CHECKPOINT_TOKENS', '200'))
+    self.CHECKPOINT_SECONDS: float = float(
+        os.getenv('CHECKPOINT_SECONDS', '5'))
 
     if langchainTrack:
       os.environ["LANGCHAIN_PROJECT"] = "skillsLangSmith"
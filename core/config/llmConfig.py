@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: llmConfig.py
+Description: This module handles the configuration of the model layer shared
+ by the ideation chatbot and the 1-page BP.
+Author: MathTeixeira
+Date: July 28, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import json
+import os
+
+
+class LlmConfig:
+  """
+  Config class to load environment variables and provide configuration values for the model layer.
+
+  This class implements a singleton pattern with lazy loading to ensure
+  only one instance is created and only when it's first needed.
+
+  Attributes:
+    MAX_CONCURRENCY (int): Model calls a worker runs at once per model ID.
+    MODEL_CONCURRENCY (dict[str, int]): Per-model overrides of MAX_CONCURRENCY,
+     read as JSON from LLM_MODEL_CONCURRENCY.
+    MAX_QUEUE (int): Calls that may wait for a slot per model ID; further
+     calls are rejected with 429.
+    QUEUE_TIMEOUT (float): Seconds a call waits for a slot before it is
+     rejected with 503.
+    PRIORITY_INTERACTIVE (int): Queue priority of ideation chat turns.
+    PRIORITY_BATCH (int): Queue priority of business plan generations.
+    PRIORITY_BACKGROUND (int): Queue priority of background summaries.
+    RETRY_ATTEMPTS (int): Retries of a throttled or failed call before its
+     first chunk; a call is never retried once it has streamed.
+    RETRY_BASE_DELAY (float): Base of the exponential backoff, in seconds.
+    RETRY_MAX_DELAY (float): Cap of the backoff, in seconds. The delay is
+     drawn uniformly up to the capped exponential (full jitter).
+    FIRST_CHUNK_TIMEOUT (float): Seconds a call may take to its first chunk
+     before it is abandoned and retried.
+    HEDGE_ENABLED (bool): Whether a second call is started when the first
+     chunk is late.
+    HEDGE_PERCENTILE (float): Percentile of the observed time to first chunk
+     after which the second call is started.
+    HEDGE_MIN_SAMPLES (int): Observed calls needed before hedging starts.
+    HEDGE_MIN_DELAY (float): Minimum seconds before a second call is started.
+    BREAKER_FAILURE_THRESHOLD (int): Consecutive failed calls that open the
+     circuit of a model.
+    BREAKER_RESET_TIMEOUT (float): Seconds an open circuit fails fast before
+     a trial call is let through.
+    MODEL_ROUTES (dict[str, list[dict]]): Candidate models of each route
+     ('ideation', 'pageBP'), in order of preference, read as JSON from
+     LLM_MODEL_ROUTES. Each rule has a `model` and optionally the `tiers` it
+     serves and the `minPromptTokens` and `maxPromptTokens` it accepts. A
+     route without rules uses the MODEL of its service.
+    DEFAULT_TIER (str): User tier of requests that do not send a trusted
+     one.
+    TRUST_TIER_HEADER (bool): Whether the tier a request sends (the
+     `X-User-Tier` header, or the `tier` query parameter of a WebSocket) is
+     used. Nothing here authenticates it, so enable it only behind a gateway
+     that authenticates the user and sets the header itself.
+    USER_TIERS (list[str]): The tiers a trusted request may name, read as
+     JSON from LLM_USER_TIERS; any other tier falls back to DEFAULT_TIER.
+    SLOW_FIRST_CHUNK_SECONDS (float): Median time to first chunk above which
+     a model is considered slow.
+    SLOW_TOKENS_PER_SECOND (float): Median output rate below which a model is
+     considered slow.
+    ROUTING_SAMPLES (int): Most recent calls the medians are taken over.
+    ROUTING_STALE_SECONDS (float): Seconds without calls after which the
+     samples of a model are ignored, so a slow model gets traffic again.
+    STREAM_FLUSH_CHARS (int): Characters of model output merged into one
+     write of a streaming response.
+    STREAM_FLUSH_SECONDS (float): Seconds model output may wait to be merged
+     before it is written anyway.
+    RESUME_TTL_SECONDS (float): Seconds a finished stream can still be
+     resumed by a client that dropped.
+    RESUME_MAX_CHARS (int): Characters the resumable stream buffers of a
+     worker may hold in total.
+    RESUME_GRACE_SECONDS (float): Seconds a generation keeps running after
+     its client dropped, waiting for it to resume.
+    DISCONNECT_POLL_SECONDS (float): Seconds between two checks of whether
+     the client of a streaming response is still connected.
+  """
+
+  instance: 'LlmConfig | None' = None
+
+  def __init__(self) -> None:
+    """
+    Initialize the LlmConfig instance.
+    """
+    self.MAX_CONCURRENCY: int = int(os.getenv('LLM_MAX_CONCURRENCY', '16'))
+    self.MODEL_CONCURRENCY: dict[str, int] = json.loads(
+        os.getenv('LLM_MODEL_CONCURRENCY', '{}'))
+    self.MAX_QUEUE: int = int(os.getenv('LLM_MAX_QUEUE', '64'))
+    self.QUEUE_TIMEOUT: float = float(os.getenv('LLM_QUEUE_TIMEOUT', '10'))
+    # Lower values are admitted first
+    self.PRIORITY_INTERACTIVE: int = 0
+    self.PRIORITY_BATCH: int = 1
+    self.PRIORITY_BACKGROUND: int = 2
+    self.RETRY_ATTEMPTS: int = int(os.getenv('LLM_RETRY_ATTEMPTS', '3'))
+    self.RETRY_BASE_DELAY: float = float(
+        os.getenv('LLM_RETRY_BASE_DELAY', '0.5'))
+    self.RETRY_MAX_DELAY: float = float(os.getenv('LLM_RETRY_MAX_DELAY', '8'))
+    self.FIRST_CHUNK_TIMEOUT: float = float(
+        os.getenv('LLM_FIRST_CHUNK_TIMEOUT', '30'))
+    self.HEDGE_ENABLED: bool = os.getenv('LLM_HEDGE_ENABLED',
+                                         'false').lower() == 'true'
+    self.HEDGE_PERCENTILE: float = float(
+        os.getenv('LLM_HEDGE_PERCENTILE', '95'))
+    self.HEDGE_MIN_SAMPLES: int = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', '20'))
+    self.HEDGE_MIN_DELAY: float = float(
+        os.getenv('LLM_HEDGE_MIN_DELAY', '0.5'))
+    self.BREAKER_FAILURE_THRESHOLD: int = int(
+        os.getenv('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+    self.BREAKER_RESET_TIMEOUT: float = float(
+        os.getenv('LLM_BREAKER_RESET_TIMEOUT', '30'))
+    self.MODEL_ROUTES: dict[str, list[dict]] = json.loads(
+        os.getenv('LLM_MODEL_ROUTES', '{}'))
+    self.DEFAULT_TIER: str = os.getenv('LLM_DEFAULT_TIER', 'standard')
+    self.TRUST_TIER_HEADER: bool = os.getenv('LLM_TRUST_TIER_HEADER',
+                                             'false').lower() == 'true'
+    self.USER_TIERS: list[str] = json.loads(os.getenv('LLM_USER_TIERS', '[]'))
+    self.SLOW_FIRST_CHUNK_SECONDS: float = float(
+        os.getenv('LLM_SLOW_FIRST_CHUNK_SECONDS', '5'))
+    self.SLOW_TOKENS_PER_SECOND: float = float(
+        os.getenv('LLM_SLOW_TOKENS_PER_SECOND', '10'))
+    self.ROUTING_SAMPLES: int = int(os.getenv('LLM_ROUTING_SAMPLES', '20'))
+    self.ROUTING_STALE_SECONDS: float = float(
+        os.getenv('LLM_ROUTING_STALE_SECONDS', '300'))
+    self.STREAM_FLUSH_CHARS: int = int(
+        os.getenv('LLM_STREAM_FLUSH_CHARS', '256'))
+    self.STREAM_FLUSH_SECONDS: float = float(
+        os.getenv('LLM_STREAM_FLUSH_SECONDS', '0.05'))
+    self.RESUME_TTL_SECONDS: float = float(
+        os.getenv('LLM_RESUME_TTL_SECONDS', '300'))
+    self.RESUME_MAX_CHARS: int = int(
+        os.getenv('LLM_RESUME_MAX_CHARS', str(16 * 1024 * 1024)))
+    self.RESUME_GRACE_SECONDS: float = float(
+        os.getenv('LLM_RESUME_GRACE_SECONDS', '60'))
+    self.DISCONNECT_POLL_SECONDS: float = float(
+        os.getenv('LLM_DISCONNECT_POLL_SECONDS', '1'))
+
+  @classmethod
+  def getInstance(cls) -> 'LlmConfig':
+    """
+    Get the singleton instance of LlmConfig.
+
+    Returns:
+      LlmConfig: The singleton instance of LlmConfig.
+
+    This method ensures that only one instance of LlmConfig is created.
+    """
+    if cls.instance is None:
+      cls.instance = cls()
+    return cls.instance
+
+
+# Global instance of LlmConfig
+# This will create the instance when the module is imported
+llm: LlmConfig = LlmConfig.getInstance()
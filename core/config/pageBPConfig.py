@@ -26,6 +26,14 @@ class PageBPConfig:
     MAX_TOKENS (int): Maximum tokens to generate for the output.
     TEMPERATURE (float): Temperature parameter for sampling creativity.
     MODEL (str): The model to use for the chatbot.
+    PROMPT_VERSION (str): Version of the business plan prompt; bump it when
+     the prompt changes so cached plans of the old prompt are not replayed.
+    CACHE_COLLECTION_NAME (str): Collection that stores the generated plans.
+    CACHE_TTL (int): Seconds a cached plan is kept (0 disables the cache).
+    CACHE_REPLAY_CHUNK_SIZE (int): Characters per chunk when a cached plan is
+     streamed back.
+    PLANS_COLLECTION_NAME (str): Collection that keeps every finished plan,
+     one per questionnaire and prompt version.
   """
 
   instance: 'PageBPConfig | None' = None
@@ -42,6 +50,13 @@ class PageBPConfig:
     self.MAX_TOKENS: int = 5000
     self.TEMPERATURE: float = 0.7
     self.MODEL: str = 'anthropic.claude-3-haiku-20240307-v1:0'
+    self.PROMPT_VERSION: str = '1'
+    self.CACHE_COLLECTION_NAME: str = 'businessPlanCache'
+    self.CACHE_TTL: int = int(os.getenv('BUSINESS_PLAN_CACHE_TTL',
+                                        str(7 * 24 * 3600)))
+    self.CACHE_REPLAY_CHUNK_SIZE: int = 256
+    self.PLANS_COLLECTION_NAME: str = os.getenv(
+        'BUSINESS_PLANS_COLLECTION_NAME', 'businessPlans')
 
     if langchainTrack:
       os.environ["LANGCHAIN_PROJECT"] = "skillsLangSmith"
@@ -10,11 +10,21 @@ License: MIT License
 Contact Information: mathteixeira55
 
 This file imports and exports database instances for SQL and NoSQL databases.
-The SQL database instance is pre-initialized, while the NoSQL database class is
- exported for on-demand instantiation.
+The SQL database instance is pre-initialized, while the NoSQL database classes
+ (blocking and asyncio) are exported for on-demand instantiation, together
+ with the registry of the indexes the NoSQL collections need and the queue
+ that batches background writes.
 """
 
 from .sqlDatabase import sqlDb
 from .noSqlDatabase import NoSqlConnection, getNoSqlConn
+from .asyncNoSqlDatabase import (AsyncNoSqlConnection, getAsyncNoSqlConn,
+                                 CollectionScanError)
+from .noSqlIndexes import NoSqlIndexRegistry, getNoSqlIndexRegistry
+from .writeBehindQueue import WriteBehindQueue
 
-__all__ = ['sqlDb', 'NoSqlConnection', 'getNoSqlConn']
+__all__ = [
+    'sqlDb', 'NoSqlConnection', 'getNoSqlConn', 'AsyncNoSqlConnection',
+    'getAsyncNoSqlConn', 'CollectionScanError', 'NoSqlIndexRegistry',
+    'getNoSqlIndexRegistry', 'WriteBehindQueue'
+]
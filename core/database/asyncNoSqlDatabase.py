@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: asyncNoSqlDatabase.py
+Description: This module provides an asyncio class for interacting with a NoSQL
+ database.
+Author: MathTeixeira
+Date: July 22, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import logging
+from pymongo import AsyncMongoClient, errors
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.results import UpdateResult
+from core.config import noSql
+
+
+class CollectionScanError(Exception):
+  """
+  Raised when a query would scan a whole collection and the COLLSCAN_POLICY is
+  'refuse'.
+  """
+
+
+class AsyncNoSqlConnection:
+  """
+  An asyncio counterpart of NoSqlConnection built on PyMongo's async client.
+
+  It exposes the same operations as NoSqlConnection as coroutines, so the
+  services can await database I/O instead of blocking the event loop (and
+  every token stream running on it) while MongoDB answers.
+
+  Attributes:
+    dbUrl (str): The URL for the NoSql connection.
+    dbName (str): The name of the database to connect to.
+    NoSqlClient (AsyncMongoClient): The async NoSql client instance.
+    database (AsyncDatabase): The async NoSql database instance.
+    collscanPolicy (str): 'off', 'log' or 'refuse' for collection scans.
+    queryPlans (dict[str, bool]): Whether each checked query shape scans its
+     whole collection.
+  """
+
+  _instance: 'AsyncNoSqlConnection | None' = None
+
+  def __init__(self, dbUrl: str = noSql.URL, dbName: str = noSql.NAME):
+    """
+    Initialize the AsyncNoSqlConnection instance.
+
+    The client connects lazily, on the first awaited operation.
+
+    Args:
+      dbUrl (str): The URL for the NoSql connection. Defaults to the URL from noSqlConfig.
+      dbName (str): The name of the database to connect to. Defaults to the NAME from noSqlConfig.
+    """
+    self.dbUrl: str = dbUrl
+    self.dbName: str = dbName
+    self.collscanPolicy: str = noSql.COLLSCAN_POLICY
+    self.queryPlans: dict[str, bool] = {}
+
+    try:
+      self.NoSqlClient: AsyncMongoClient = AsyncMongoClient(dbUrl)
+      self.database: AsyncDatabase = self.NoSqlClient[dbName]
+      print("Async NoSql client created!")
+    except errors.ConnectionFailure as e:
+      print(f"Connection error: {e}")
+
+  @classmethod
+  def getInstance(cls) -> 'AsyncNoSqlConnection':
+    """
+    Get the singleton instance of AsyncNoSqlConnection.
+
+    Returns:
+      AsyncNoSqlConnection: The singleton instance of AsyncNoSqlConnection.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  async def shutdownDbClient(self) -> None:
+    """
+    Close the async NoSql client connection.
+    """
+    await self.NoSqlClient.close()
+    print("Async NoSql connection closed.")
+
+  async def insertDocument(self, collection_name: str, document: dict) -> dict:
+    """
+    Insert a document into a specified collection.
+
+    The document is returned as written; it is not read back from the
+    database.
+
+    Args:
+      collection_name (str): The name of the collection to insert the document into.
+      document (dict): The document to be inserted.
+
+    Returns:
+      dict: The inserted document with its ID.
+    """
+    try:
+      newDocument = await self.database[collection_name].insert_one(document)
+      return {**document, "_id": newDocument.inserted_id}
+    except errors.PyMongoError as e:
+      print(f"Error inserting document: {e}")
+      return None
+
+  async def insertDocuments(self, collection_name: str,
+                            documents: list[dict]) -> dict[int, str]:
+    """
+    Insert several documents into a specified collection in one unordered batch.
+
+    A failing document does not stop the others from being inserted.
+
+    Args:
+      collection_name (str): The name of the collection to insert the documents into.
+      documents (list[dict]): The documents to be inserted.
+
+    Returns:
+      dict[int, str]: The error message of each document that was not
+       inserted, keyed by its position in `documents`, or None on error.
+    """
+    try:
+      await self.database[collection_name].insert_many(documents, ordered=False)
+      return {}
+    except errors.BulkWriteError as e:
+      return {
+          writeError["index"]: writeError["errmsg"]
+          for writeError in e.details.get("writeErrors", [])
+      }
+    except errors.PyMongoError as e:
+      print(f"Error inserting documents: {e}")
+      return None
+
+  @staticmethod
+  def hasCollectionScan(plan) -> bool:
+    """
+    Check whether a query plan, or any of its input stages, is a COLLSCAN.
+
+    Args:
+      plan (dict | list): A query plan or part of it, as returned by explain.
+
+    Returns:
+      bool: True if the plan scans the whole collection.
+    """
+    if isinstance(plan, list):
+      return any(AsyncNoSqlConnection.hasCollectionScan(p) for p in plan)
+    if isinstance(plan, dict):
+      return plan.get("stage") == "COLLSCAN" or any(
+          AsyncNoSqlConnection.hasCollectionScan(p) for p in plan.values())
+    return False
+
+  async def checkQueryPlan(self, collection_name: str, query: dict) -> None:
+    """
+    Explain a query shape the first time it is used and react to collection
+    scans according to the COLLSCAN_POLICY.
+
+    Each shape (collection and filtered fields) is explained once per process.
+    Shapes on a collection that does not exist yet are checked again later.
+
+    Args:
+      collection_name (str): The name of the collection to query.
+      query (dict): The query filter.
+
+    Raises:
+      CollectionScanError: If the query would scan the whole collection and
+       the policy is 'refuse'.
+    """
+    if self.collscanPolicy == "off":
+      return
+    shape = f"{collection_name}({', '.join(sorted(query))})"
+    if shape not in self.queryPlans:
+      try:
+        explain = await self.database[collection_name].find(query).explain()
+      except errors.PyMongoError as e:
+        print(f"Error explaining query shape {shape}: {e}")
+        return
+      winningPlan = explain.get("queryPlanner", {}).get("winningPlan", {})
+      if winningPlan.get("stage") == "EOF":
+        return
+      self.queryPlans[shape] = self.hasCollectionScan(winningPlan)
+      if self.queryPlans[shape]:
+        logging.error(f"Query shape {shape} scans the whole collection; "
+                      f"register an index for it in noSqlIndexes")
+    if self.queryPlans[shape] and self.collscanPolicy == "refuse":
+      raise CollectionScanError(
+          f"Query shape {shape} would scan the whole collection")
+
+  async def findDocumentByField(self, collection_name: str, field: str,
+                                value: str) -> dict:
+    """
+    Find a document in a specified collection by a field and its value.
+
+    The query plan of each new (collection, field) shape is checked for
+    collection scans first (see checkQueryPlan).
+
+    Args:
+      collection_name (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      dict: The found document or None if no document is found.
+
+    Raises:
+      CollectionScanError: If the query would scan the whole collection and
+       the COLLSCAN_POLICY is 'refuse'.
+    """
+    try:
+      await self.checkQueryPlan(collection_name, {field: value})
+      document = await self.database[collection_name].find_one({field: value})
+      return document
+    except errors.PyMongoError as e:
+      print(f"Error finding document: {e}")
+      return None
+
+  async def updateDocument(self, collection_name: str, query: dict,
+                           fields: dict) -> UpdateResult:
+    """
+    Set the given fields on the first document matching a query.
+
+    Args:
+      collection_name (str): The name of the collection to update.
+      query (dict): The filter that selects the document.
+      fields (dict): The fields to set on the document.
+
+    Returns:
+      UpdateResult: The result of the update or None on error.
+    """
+    try:
+      return await self.database[collection_name].update_one(
+          query, {"$set": fields})
+    except errors.PyMongoError as e:
+      print(f"Error updating document: {e}")
+      return None
+
+  async def deleteDocument(self, collection_name: str, query: dict) -> bool:
+    """
+    Delete the first document matching a query.
+
+    Args:
+      collection_name (str): The name of the collection to delete from.
+      query (dict): The filter that selects the document.
+
+    Returns:
+      bool: True if a document was deleted, False otherwise.
+    """
+    try:
+      deleteResult = await self.database[collection_name].delete_one(query)
+      return deleteResult.deleted_count > 0
+    except errors.PyMongoError as e:
+      print(f"Error deleting document: {e}")
+      return False
+
+
+# Alias for AsyncNoSqlConnection.getInstance
+# This alias allows for easier access to the AsyncNoSqlConnection singleton instance.
+getAsyncNoSqlConn = AsyncNoSqlConnection.getInstance
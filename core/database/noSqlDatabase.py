@@ -12,6 +12,7 @@ Contact Information: mathteixeira55
 ### Imports ###
 from pymongo import MongoClient, errors
 from pymongo.database import Database
+from pymongo.results import UpdateResult
 from core.config import noSql
 
 
@@ -46,7 +47,7 @@ class NoSqlConnection:
       self.NoSqlClient: MongoClient = MongoClient(dbUrl)
       self.database: Database = self.NoSqlClient[dbName]
       print("Connected to the NoSql database!")
-    except errors.ConnectionError as e:
+    except errors.ConnectionFailure as e:
       print(f"Connection error: {e}")
 
   @classmethod
@@ -72,6 +73,9 @@ class NoSqlConnection:
     """
     Insert a document into a specified collection.
 
+    The document is returned as written; it is not read back from the
+    database.
+
     Args:
       collection_name (str): The name of the collection to insert the document into.
       document (dict): The document to be inserted.
@@ -81,13 +85,38 @@ class NoSqlConnection:
     """
     try:
       newDocument = self.database[collection_name].insert_one(document)
-      insertedDocument = self.database[collection_name].find_one(
-          {"_id": newDocument.inserted_id})
-      return insertedDocument
+      return {**document, "_id": newDocument.inserted_id}
     except errors.PyMongoError as e:
       print(f"Error inserting document: {e}")
       return None
 
+  def insertDocuments(self, collection_name: str,
+                      documents: list[dict]) -> dict[int, str]:
+    """
+    Insert several documents into a specified collection in one unordered batch.
+
+    A failing document does not stop the others from being inserted.
+
+    Args:
+      collection_name (str): The name of the collection to insert the documents into.
+      documents (list[dict]): The documents to be inserted.
+
+    Returns:
+      dict[int, str]: The error message of each document that was not
+       inserted, keyed by its position in `documents`, or None on error.
+    """
+    try:
+      self.database[collection_name].insert_many(documents, ordered=False)
+      return {}
+    except errors.BulkWriteError as e:
+      return {
+          writeError["index"]: writeError["errmsg"]
+          for writeError in e.details.get("writeErrors", [])
+      }
+    except errors.PyMongoError as e:
+      print(f"Error inserting documents: {e}")
+      return None
+
   def findDocumentByField(self, collection_name: str, field: str,
                           value: str) -> dict:
     """
@@ -108,6 +137,44 @@ class NoSqlConnection:
       print(f"Error finding document: {e}")
       return None
 
+  def updateDocument(self, collection_name: str, query: dict,
+                     fields: dict) -> UpdateResult:
+    """
+    Set the given fields on the first document matching a query.
+
+    Args:
+      collection_name (str): The name of the collection to update.
+      query (dict): The filter that selects the document.
+      fields (dict): The fields to set on the document.
+
+    Returns:
+      UpdateResult: The result of the update or None on error.
+    """
+    try:
+      return self.database[collection_name].update_one(query, {"$set": fields})
+    except errors.PyMongoError as e:
+      print(f"Error updating document: {e}")
+      return None
+
+  def deleteDocument(self, collection_name: str, query: dict) -> bool:
+    """
+    Delete the first document matching a query.
+
+    Args:
+      collection_name (str): The name of the collection to delete from.
+      query (dict): The filter that selects the document.
+
+    Returns:
+      bool: True if a document was deleted, False otherwise.
+    """
+    try:
+      deleteResult = self.database[collection_name].delete_one(query)
+      return deleteResult.deleted_count > 0
+    except errors.PyMongoError as e:
+      print(f"Error deleting document: {e}")
+      return False
+
+
 # Alias for NoSqlConnection.getInstance
 # This alias allows for easier access to the NoSqlDatabase singleton instance.
 getNoSqlConn = NoSqlConnection.getInstance
\ No newline at end of file
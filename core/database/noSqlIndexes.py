@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: noSqlIndexes.py
+Description: This module declares the indexes of the NoSQL collections and
+ creates them at startup.
+Author: MathTeixeira
+Date: July 25, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import logging
+from pymongo import ASCENDING, IndexModel, errors
+
+from core.config import ideation
+
+
+class NoSqlIndexRegistry:
+  """
+  Declarative registry of the indexes every NoSQL collection needs.
+
+  Modules register the indexes of the collections they query; the application
+  lifespan then applies the whole registry once at startup. Creating an index
+  that already exists with the same definition is a no-op in MongoDB, so
+  applying the registry is idempotent and safe on every start.
+
+  Attributes:
+    indexes (dict[str, list[IndexModel]]): The indexes of each collection.
+  """
+
+  _instance: 'NoSqlIndexRegistry | None' = None
+
+  def __init__(self) -> None:
+    """
+    Initialize the NoSqlIndexRegistry with the default indexes.
+
+    Message buckets are only queried by `_id` ranges, so their collections
+    need no index besides the default one.
+    """
+    self.indexes: dict[str, list[IndexModel]] = {}
+    # Every ideation turn looks its session up by CHATHISTORY_SEARCH_FIELD
+    self.register(
+        ideation.CHATHISTORY_COLLECTION_NAME,
+        IndexModel([(ideation.CHATHISTORY_SEARCH_FIELD, ASCENDING)],
+                   name=f"{ideation.CHATHISTORY_SEARCH_FIELD}_unique",
+                   unique=True))
+
+  @classmethod
+  def getInstance(cls) -> 'NoSqlIndexRegistry':
+    """
+    Get the singleton instance of NoSqlIndexRegistry.
+
+    Returns:
+      NoSqlIndexRegistry: The singleton instance of NoSqlIndexRegistry.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  def register(self, collectionName: str, *indexes: IndexModel) -> None:
+    """
+    Declare indexes for a collection.
+
+    Args:
+      collectionName (str): The name of the collection.
+      *indexes (IndexModel): The indexes the collection needs.
+    """
+    self.indexes.setdefault(collectionName, []).extend(indexes)
+
+  async def apply(self, conn) -> dict[str, list[str]]:
+    """
+    Create every registered index that does not exist yet.
+
+    A collection whose indexes cannot be created (e.g. duplicate values under
+    a unique index) is reported and skipped; startup goes on.
+
+    Args:
+      conn (AsyncNoSqlConnection): The async NoSql connection.
+
+    Returns:
+      dict[str, list[str]]: The names of the indexes ensured per collection.
+    """
+    applied = {}
+    for collectionName, indexes in self.indexes.items():
+      try:
+        applied[collectionName] = await conn.database[
+            collectionName].create_indexes(indexes)
+        print(f"Indexes ensured on '{collectionName}': "
+              f"{', '.join(applied[collectionName])}")
+      except errors.PyMongoError as e:
+        logging.error(f"Error creating indexes on '{collectionName}': {e}")
+    return applied
+
+
+# Alias for NoSqlIndexRegistry.getInstance
+# This alias allows for easier access to the NoSqlIndexRegistry singleton instance.
+getNoSqlIndexRegistry = NoSqlIndexRegistry.getInstance
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: writeBehindQueue.py
+Description: This module provides the WriteBehindQueue class, which takes
+ writes off the request path and applies them in batches from a background
+ task.
+Author: MathTeixeira
+Date: July 31, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+
+class WriteBehindQueue:
+  """
+  Buffers writes by key and applies them in batches.
+
+  `put` adds items to the pending list of a key and returns at once, unless
+  `maxPending` items are already waiting, in which case it waits for a flush.
+  A background task takes the pending items of up to `batchSize` keys,
+  waiting at most `flushSeconds` for a batch to fill, and hands them to
+  `writeBatch` in one call. The items of a key are written in the order they
+  were put, one batch at a time.
+
+  The items of a key that fail (`writeBatch` raises or returns a falsy result
+  for it) go back in front of the items queued since, and are retried after
+  `retrySeconds`, doubled at each attempt. After `maxAttempts` failed
+  attempts they are dropped; `flushKey`, `flush` and `close` then return
+  False.
+
+  Queued items are lost if the process dies before they are written; `close`
+  writes everything still queued on shutdown.
+
+  Attributes:
+    name (str): Name of the queue, for the logs.
+    writeBatch (Callable[[dict], Awaitable[dict]]): Writes the items of each
+     key of a batch and returns whether each key was written.
+    batchSize (int): Keys written per batch.
+    maxPending (int): Items the queue may hold.
+    flushSeconds (float): Seconds an item may wait for its batch to fill.
+    maxAttempts (int): Attempts to write the items of a key before they are
+     dropped.
+    retrySeconds (float): Seconds before the first retry of a failed key.
+    pending (dict[Any, list]): The items not written yet, by key; keys being
+     retried come first.
+    queuedAt (dict[Any, float]): When the oldest pending item of each key was
+     put.
+    attempts (dict[Any, int]): Failed attempts of the keys being retried.
+    retryAt (dict[Any, float]): When each key being retried may be written
+     again.
+    dropped (dict[Any, int]): Items dropped after `maxAttempts`, by key.
+    writing (dict[Any, list]): The items of the batch being written.
+    changed (asyncio.Condition): Notified after every batch.
+    wakeup (asyncio.Event): Set when a batch should be written now.
+    task (asyncio.Task | None): The background writer, started by the first
+     `put`.
+    stats (dict): Items queued, written, retried and failed (dropped),
+     batches, waits on a full queue, the largest depth and the flush times.
+  """
+
+  def __init__(self,
+               name: str,
+               writeBatch: Callable[[dict[Any, list]], Awaitable[dict[Any,
+                                                                      bool]]],
+               batchSize: int,
+               maxPending: int,
+               flushSeconds: float,
+               maxAttempts: int = 5,
+               retrySeconds: float = 0.2) -> None:
+    """
+    Initialize an empty WriteBehindQueue.
+
+    Args:
+      name (str): Name of the queue, for the logs.
+      writeBatch (Callable[[dict], Awaitable[dict]]): Writes the items of
+       each key of a batch and returns whether each key was written.
+      batchSize (int): Keys written per batch.
+      maxPending (int): Items the queue may hold.
+      flushSeconds (float): Seconds an item may wait for its batch to fill.
+      maxAttempts (int): Attempts to write the items of a key before they
+       are dropped. Defaults to 5.
+      retrySeconds (float): Seconds before the first retry of a failed key,
+       doubled at each attempt. Defaults to 0.2.
+    """
+    self.name: str = name
+    self.writeBatch: Callable[[dict[Any, list]],
+                              Awaitable[dict[Any, bool]]] = writeBatch
+    self.batchSize: int = batchSize
+    self.maxPending: int = maxPending
+    self.flushSeconds: float = flushSeconds
+    self.maxAttempts: int = maxAttempts
+    self.retrySeconds: float = retrySeconds
+    self.pending: dict[Any, list] = {}
+    self.queuedAt: dict[Any, float] = {}
+    self.attempts: dict[Any, int] = {}
+    self.retryAt: dict[Any, float] = {}
+    self.dropped: dict[Any, int] = {}
+    self.writing: dict[Any, list] = {}
+    self.changed: asyncio.Condition = asyncio.Condition()
+    self.wakeup: asyncio.Event = asyncio.Event()
+    self.task: asyncio.Task | None = None
+    self.stats: dict = {
+        "queued": 0,
+        "written": 0,
+        "retried": 0,
+        "failed": 0,
+        "batches": 0,
+        "fullWaits": 0,
+        "maxDepth": 0,
+        "flushSeconds": 0.0,
+        "maxFlushSeconds": 0.0,
+        "maxLagSeconds": 0.0
+    }
+
+  def depth(self) -> int:
+    """
+    Get the number of items not written yet.
+
+    Returns:
+      int: The pending items plus the ones being written.
+    """
+    return (sum(len(items) for items in self.pending.values()) +
+            sum(len(items) for items in self.writing.values()))
+
+  def has(self, key: Any) -> bool:
+    """
+    Check whether a key has items not written yet.
+
+    Args:
+      key (Any): The key.
+
+    Returns:
+      bool: True if items of the key are pending or being written.
+    """
+    return key in self.pending or key in self.writing
+
+  def readyKeys(self) -> list:
+    """
+    Get the pending keys that may be written now.
+
+    Returns:
+      list: The pending keys not waiting for a retry, oldest first.
+    """
+    now = time.monotonic()
+    return [key for key in self.pending if self.retryAt.get(key, 0.0) <= now]
+
+  async def put(self, key: Any, items: list) -> None:
+    """
+    Queue items for a key.
+
+    Args:
+      key (Any): The key, e.g. a session ID.
+      items (list): The items to write, in order.
+    """
+    async with self.changed:
+      if self.depth() + len(items) > self.maxPending and self.depth():
+        # Back pressure: the caller waits like an inline write would
+        self.stats["fullWaits"] += 1
+        self.wakeup.set()
+        await self.changed.wait_for(
+            lambda: not self.depth() or
+            self.depth() + len(items) <= self.maxPending)
+      self.pending.setdefault(key, []).extend(items)
+      self.queuedAt.setdefault(key, time.monotonic())
+      self.stats["queued"] += len(items)
+      self.stats["maxDepth"] = max(self.stats["maxDepth"], self.depth())
+    if len(self.pending) >= self.batchSize:
+      self.wakeup.set()
+    if self.task is None or self.task.done():
+      self.task = asyncio.create_task(self.run())
+
+  async def run(self) -> None:
+    """
+    Write batches until nothing is pending.
+    """
+    while self.pending:
+      ready = len(self.readyKeys())
+      if ready < self.batchSize and not self.wakeup.is_set():
+        # Only keys waiting for a retry: sleep until the first one is due
+        timeout = (self.flushSeconds if ready else
+                   min(self.retryAt[key] for key in self.pending) -
+                   time.monotonic())
+        try:
+          await asyncio.wait_for(self.wakeup.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+          pass
+      self.wakeup.clear()
+      await self.writeNext()
+
+  async def writeNext(self) -> None:
+    """
+    Write the pending items of the oldest `batchSize` keys that may be
+    written now, and requeue the ones that fail.
+    """
+    keys = self.readyKeys()[:self.batchSize]
+    if not keys:
+      return
+    self.writing = {key: self.pending.pop(key) for key in keys}
+    queuedAt = {key: self.queuedAt.pop(key) for key in keys}
+    started = time.monotonic()
+    try:
+      results = await self.writeBatch(dict(self.writing))
+    except Exception as e:
+      logging.error(f"Write queue '{self.name}': batch failed: {e}")
+      results = {}
+    finished = time.monotonic()
+
+    retry = {}
+    for key, items in self.writing.items():
+      if results.get(key):
+        self.stats["written"] += len(items)
+        self.attempts.pop(key, None)
+        self.retryAt.pop(key, None)
+        continue
+      attempts = self.attempts.get(key, 0) + 1
+      if attempts < self.maxAttempts:
+        self.attempts[key] = attempts
+        self.retryAt[key] = finished + self.retrySeconds * 2**(attempts - 1)
+        self.stats["retried"] += len(items)
+        retry[key] = items
+        logging.warning(f"Write queue '{self.name}': {len(items)} items of "
+                        f"{key} failed, attempt {attempts} of "
+                        f"{self.maxAttempts}")
+        continue
+      self.attempts.pop(key, None)
+      self.retryAt.pop(key, None)
+      self.dropped[key] = self.dropped.get(key, 0) + len(items)
+      self.stats["failed"] += len(items)
+      logging.error(f"Write queue '{self.name}': {len(items)} items of "
+                    f"{key} were not written after {attempts} attempts")
+    # Failed items go back in front of the items queued since
+    self.pending = {
+        **{key: items + self.pending.pop(key, []) for key, items in
+           retry.items()},
+        **self.pending
+    }
+    for key in retry:
+      self.queuedAt[key] = min(queuedAt[key],
+                               self.queuedAt.get(key, queuedAt[key]))
+    oldest = min(queuedAt.values())
+    self.stats["batches"] += 1
+    self.stats["flushSeconds"] += finished - started
+    self.stats["maxFlushSeconds"] = max(self.stats["maxFlushSeconds"],
+                                        finished - started)
+    self.stats["maxLagSeconds"] = max(self.stats["maxLagSeconds"],
+                                      finished - oldest)
+    async with self.changed:
+      self.writing = {}
+      self.changed.notify_all()
+
+  async def flushKey(self, key: Any) -> bool:
+    """
+    Wait until the queued items of a key are written or dropped.
+
+    Args:
+      key (Any): The key.
+
+    Returns:
+      bool: False if items of the key were dropped while waiting.
+    """
+    if not self.has(key):
+      return True
+    dropped = self.dropped.get(key, 0)
+    self.wakeup.set()
+    async with self.changed:
+      await self.changed.wait_for(lambda: not self.has(key))
+    return self.dropped.get(key, 0) == dropped
+
+  async def flush(self) -> bool:
+    """
+    Wait until every queued item is written or dropped.
+
+    Returns:
+      bool: False if items were dropped while waiting.
+    """
+    if not self.depth():
+      return True
+    failed = self.stats["failed"]
+    self.wakeup.set()
+    async with self.changed:
+      await self.changed.wait_for(lambda: not self.depth())
+    return self.stats["failed"] == failed
+
+  async def close(self) -> bool:
+    """
+    Write everything still queued. Called on application shutdown.
+
+    Returns:
+      bool: False if items were dropped instead of written.
+    """
+    written = await self.flush()
+    if self.task is not None:
+      await self.task
+    return written
+
+  def getStats(self) -> dict:
+    """
+    Get the queue counters.
+
+    Returns:
+      dict: The current depth, pending keys and keys waiting for a retry,
+       the queued, written, retried and failed (dropped) items, batches,
+       waits on a full queue, the largest depth, and
+       the total, average and maximum flush seconds and the maximum seconds
+       an item waited to be written.
+    """
+    return {
+        "depth": self.depth(),
+        "pendingKeys": len(self.pending),
+        "retryingKeys": len(self.attempts),
+        **self.stats,
+        "averageFlushSeconds": self.stats["flushSeconds"] /
+                               max(self.stats["batches"], 1)
+    }
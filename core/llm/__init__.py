@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Package Name: llm
+Description: This package contains the model layer shared by the services
+ that call Bedrock.
+Author: MathTeixeira
+Date: July 28, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+from .admissionController import (AdmissionController, AdmissionRejected,
+                                  AdmissionSlot, getAdmissionController)
+from .modelRouter import ModelRouter, RoutingDecision, getModelRouter
+from .resilience import (CircuitOpen, FirstChunkTimeout, ResilienceController,
+                         getResilienceController)
+
+__all__ = [
+    'AdmissionController', 'AdmissionRejected', 'AdmissionSlot',
+    'getAdmissionController', 'CircuitOpen', 'FirstChunkTimeout',
+    'ResilienceController', 'getResilienceController', 'ModelRouter',
+    'RoutingDecision', 'getModelRouter'
+]
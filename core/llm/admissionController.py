@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: admissionController.py
+Description: This module provides the AdmissionController class, which limits
+ the concurrent model calls of a worker per model ID, queues the excess by
+ priority and sheds load once the queue is full.
+Author: MathTeixeira
+Date: July 28, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import heapq
+import itertools
+import time
+
+from core.config import llm
+
+
+class AdmissionRejected(Exception):
+  """
+  Raised when a model call is not admitted.
+
+  Attributes:
+    statusCode (int): 429 when the queue was full, 503 when the call waited
+     QUEUE_TIMEOUT seconds without getting a slot.
+    retryAfter (int): Seconds the client should wait before retrying.
+  """
+
+  def __init__(self, message: str, statusCode: int, retryAfter: int) -> None:
+    """
+    Initialize the AdmissionRejected error.
+
+    Args:
+      message (str): The error message.
+      statusCode (int): The HTTP status code to answer with.
+      retryAfter (int): Seconds the client should wait before retrying.
+    """
+    super().__init__(message)
+    self.statusCode: int = statusCode
+    self.retryAfter: int = retryAfter
+
+
+class AdmissionSlot:
+  """
+  A granted slot of a ModelGate.
+
+  Attributes:
+    gate (ModelGate): The gate the slot belongs to.
+    released (bool): Whether the slot was given back.
+  """
+
+  def __init__(self, gate: 'ModelGate') -> None:
+    """
+    Initialize a granted slot.
+
+    Args:
+      gate (ModelGate): The gate the slot belongs to.
+    """
+    self.gate: ModelGate = gate
+    self.released: bool = False
+
+  def release(self) -> None:
+    """
+    Give the slot back. Releasing twice is a no-op.
+    """
+    if not self.released:
+      self.released = True
+      self.gate.release()
+
+
+class ModelGate:
+  """
+  The slots and the wait queue of one model ID.
+
+  A freed slot goes straight to the waiting call with the lowest priority
+  value, oldest first, so a queued call never loses its turn to a new one.
+
+  Attributes:
+    modelId (str): The model ID.
+    limit (int): Calls running at once.
+    maxQueue (int): Calls that may wait for a slot.
+    queueTimeout (float): Seconds a call waits before it is rejected.
+    active (int): Calls holding a slot.
+    waiters (list[tuple[int, int, asyncio.Future]]): The wait queue, as a heap
+     of (priority, arrival, future).
+    order (itertools.count): Arrival counter, breaking priority ties.
+    stats (dict): Admitted, queued and rejected calls and the queue times.
+  """
+
+  def __init__(self, modelId: str, limit: int, maxQueue: int,
+               queueTimeout: float) -> None:
+    """
+    Initialize the ModelGate instance.
+
+    Args:
+      modelId (str): The model ID.
+      limit (int): Calls running at once.
+      maxQueue (int): Calls that may wait for a slot.
+      queueTimeout (float): Seconds a call waits before it is rejected.
+    """
+    self.modelId: str = modelId
+    self.limit: int = limit
+    self.maxQueue: int = maxQueue
+    self.queueTimeout: float = queueTimeout
+    self.active: int = 0
+    self.waiters: list[tuple[int, int, asyncio.Future]] = []
+    self.order: itertools.count = itertools.count()
+    self.stats: dict = {
+        "admitted": 0,
+        "queued": 0,
+        "rejectedQueueFull": 0,
+        "rejectedTimeout": 0,
+        "queueSeconds": 0.0,
+        "maxQueueSeconds": 0.0
+    }
+
+  def waiting(self) -> int:
+    """
+    Get the number of calls waiting for a slot.
+
+    Returns:
+      int: The waiting calls, without the ones that gave up.
+    """
+    return sum(1 for *_, future in self.waiters if not future.done())
+
+  async def acquire(self, priority: int) -> AdmissionSlot:
+    """
+    Get a slot, waiting in the queue if every slot is taken.
+
+    Args:
+      priority (int): Queue priority; lower values are admitted first.
+
+    Returns:
+      AdmissionSlot: The granted slot.
+
+    Raises:
+      AdmissionRejected: If the queue is full (429) or no slot was freed
+       within `queueTimeout` seconds (503).
+    """
+    if self.active < self.limit and not self.waiting():
+      self.active += 1
+      self.stats["admitted"] += 1
+      return AdmissionSlot(self)
+    if self.waiting() >= self.maxQueue:
+      self.stats["rejectedQueueFull"] += 1
+      raise AdmissionRejected(
+          f"Too many requests waiting for model '{self.modelId}'", 429,
+          max(int(self.queueTimeout), 1))
+
+    if len(self.waiters) > 2 * self.maxQueue:
+      # Drop the calls that gave up while no slot was freed
+      self.waiters = [
+          waiter for waiter in self.waiters if not waiter[2].done()
+      ]
+      heapq.heapify(self.waiters)
+    future = asyncio.get_running_loop().create_future()
+    heapq.heappush(self.waiters, (priority, next(self.order), future))
+    self.stats["queued"] += 1
+    started = time.perf_counter()
+    try:
+      await asyncio.wait_for(asyncio.shield(future), self.queueTimeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+      # A slot handed over right as the wait ended is passed on
+      if future.done() and not future.cancelled():
+        self.release()
+      else:
+        future.cancel()
+      if isinstance(e, asyncio.CancelledError):
+        raise
+      self.stats["rejectedTimeout"] += 1
+      raise AdmissionRejected(
+          f"Model '{self.modelId}' is overloaded, no slot within "
+          f"{self.queueTimeout:g}s", 503, max(int(self.queueTimeout), 1))
+    finally:
+      waited = time.perf_counter() - started
+      self.stats["queueSeconds"] += waited
+      self.stats["maxQueueSeconds"] = max(self.stats["maxQueueSeconds"], waited)
+    self.stats["admitted"] += 1
+    return AdmissionSlot(self)
+
+  def tryAcquire(self) -> AdmissionSlot | None:
+    """
+    Get a slot only if one is free and no call is waiting for it.
+
+    Returns:
+      AdmissionSlot | None: The granted slot, or None.
+    """
+    if self.active >= self.limit or self.waiting():
+      return None
+    self.active += 1
+    self.stats["admitted"] += 1
+    return AdmissionSlot(self)
+
+  def release(self) -> None:
+    """
+    Hand a freed slot to the next waiting call, or free it.
+    """
+    while self.waiters:
+      *_, future = heapq.heappop(self.waiters)
+      if not future.done():
+        future.set_result(None)
+        return
+    self.active -= 1
+
+  def getStats(self) -> dict:
+    """
+    Get the gate counters.
+
+    Returns:
+      dict: The limit, running and waiting calls, the admitted, queued and
+       rejected counters, and the total, average and maximum queue seconds.
+    """
+    return {
+        "limit": self.limit,
+        "active": self.active,
+        "waiting": self.waiting(),
+        **self.stats,
+        "averageQueueSeconds": self.stats["queueSeconds"] /
+                               max(self.stats["queued"], 1)
+    }
+
+
+class AdmissionController:
+  """
+  The ModelGates of a worker, one per model ID.
+
+  Every model call of the services goes through `acquire` first, so a burst
+  queues in the worker instead of driving Bedrock into throttling.
+
+  Attributes:
+    gates (dict[str, ModelGate]): The gate of each model ID.
+  """
+
+  _instance: 'AdmissionController | None' = None
+
+  def __init__(self) -> None:
+    """
+    Initialize the AdmissionController with no gates.
+    """
+    self.gates: dict[str, ModelGate] = {}
+
+  @classmethod
+  def getInstance(cls) -> 'AdmissionController':
+    """
+    Get the singleton instance of AdmissionController.
+
+    Returns:
+      AdmissionController: The singleton instance of AdmissionController.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  def getGate(self, modelId: str) -> ModelGate:
+    """
+    Get the gate of a model ID, creating it on first use.
+
+    Args:
+      modelId (str): The model ID.
+
+    Returns:
+      ModelGate: The gate of the model ID.
+    """
+    if modelId not in self.gates:
+      self.gates[modelId] = ModelGate(
+          modelId, llm.MODEL_CONCURRENCY.get(modelId, llm.MAX_CONCURRENCY),
+          llm.MAX_QUEUE, llm.QUEUE_TIMEOUT)
+    return self.gates[modelId]
+
+  async def acquire(self, modelId: str, priority: int) -> AdmissionSlot:
+    """
+    Get a slot to call a model.
+
+    Args:
+      modelId (str): The model ID.
+      priority (int): Queue priority; one of the PRIORITY_* values of
+       llmConfig.
+
+    Returns:
+      AdmissionSlot: The granted slot; release it when the call ends.
+
+    Raises:
+      AdmissionRejected: If the call is rejected.
+    """
+    return await self.getGate(modelId).acquire(priority)
+
+  def getStats(self) -> dict:
+    """
+    Get the counters of every gate.
+
+    Returns:
+      dict: The gate counters by model ID.
+    """
+    return {modelId: gate.getStats() for modelId, gate in self.gates.items()}
+
+
+# Alias for AdmissionController.getInstance
+# This alias allows for easier access to the AdmissionController singleton instance.
+getAdmissionController = AdmissionController.getInstance
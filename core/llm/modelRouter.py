@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: modelRouter.py
+Description: This module provides the ModelRouter class, which picks the model
+ of each request from the rules of its route, the user tier and the observed
+ latency of the candidate models.
+Author: MathTeixeira
+Date: July 29, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import json
+import logging
+import uuid
+
+from core.config import llm
+from .resilience import getResilienceController
+
+
+class RoutingDecision:
+  """
+  The model picked for a request, and why.
+
+  Attributes:
+    requestId (str): The ID given to the request.
+    route (str): The route of the request.
+    tier (str): The user tier of the request.
+    promptTokens (int): The estimated size of the prompt.
+    modelId (str): The picked model ID.
+    reason (str): 'default' (the route has no rules), 'noRuleMatched',
+     'preferred' (the first matching rule), 'shifted' (an earlier candidate
+     was slow or unavailable) or 'allSlow' (the fastest of slow candidates).
+    candidates (list[dict]): The matching candidates and their recent
+     latency.
+  """
+
+  def __init__(self, requestId: str, route: str, tier: str, promptTokens: int,
+               modelId: str, reason: str, candidates: list[dict]) -> None:
+    """
+    Initialize a RoutingDecision.
+
+    Args:
+      requestId (str): The ID given to the request.
+      route (str): The route of the request.
+      tier (str): The user tier of the request.
+      promptTokens (int): The estimated size of the prompt.
+      modelId (str): The picked model ID.
+      reason (str): Why the model was picked.
+      candidates (list[dict]): The matching candidates and their latency.
+    """
+    self.requestId: str = requestId
+    self.route: str = route
+    self.tier: str = tier
+    self.promptTokens: int = promptTokens
+    self.modelId: str = modelId
+    self.reason: str = reason
+    self.candidates: list[dict] = candidates
+
+  def toDict(self) -> dict:
+    """
+    Get the decision as a dictionary, for the log.
+
+    Returns:
+      dict: The fields of the decision.
+    """
+    return dict(vars(self))
+
+
+class ModelRouter:
+  """
+  Picks a model per request from the MODEL_ROUTES of llmConfig.
+
+  The rules of a route are tried in order; a rule matches when it serves the
+  user tier and accepts the prompt size. Among the matching candidates, the
+  first one that is neither slow (median time to first chunk above
+  SLOW_FIRST_CHUNK_SECONDS or output rate below SLOW_TOKENS_PER_SECOND over
+  its recent calls) nor behind an open circuit is picked, so traffic moves
+  away from a slow model and back once its samples go stale.
+
+  Attributes:
+    routes (dict[str, list[dict]]): The candidate rules of each route.
+    stats (dict): Decisions by route, model and reason.
+  """
+
+  _instance: 'ModelRouter | None' = None
+
+  def __init__(self, routes: dict[str, list[dict]] | None = None) -> None:
+    """
+    Initialize the ModelRouter instance.
+
+    Args:
+      routes (dict[str, list[dict]], optional): The candidate rules of each
+       route. Defaults to the MODEL_ROUTES from llmConfig.
+    """
+    self.routes: dict[str, list[dict]] = (routes if routes is not None else
+                                          llm.MODEL_ROUTES)
+    self.stats: dict = {}
+
+  @classmethod
+  def getInstance(cls) -> 'ModelRouter':
+    """
+    Get the singleton instance of ModelRouter.
+
+    Returns:
+      ModelRouter: The singleton instance of ModelRouter.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  @staticmethod
+  def matches(rule: dict, tier: str, promptTokens: int) -> bool:
+    """
+    Check whether a rule accepts a request.
+
+    Args:
+      rule (dict): The candidate rule.
+      tier (str): The user tier of the request.
+      promptTokens (int): The estimated size of the prompt.
+
+    Returns:
+      bool: True if the rule serves the tier and accepts the prompt size.
+    """
+    if "tiers" in rule and tier not in rule["tiers"]:
+      return False
+    if promptTokens < rule.get("minPromptTokens", 0):
+      return False
+    return promptTokens <= rule.get("maxPromptTokens", promptTokens)
+
+  @staticmethod
+  def resolveTier(requestedTier: str | None) -> str:
+    """
+    Get the user tier of a request from the tier it sent.
+
+    The sent tier is not authenticated, so it is used only when
+    TRUST_TIER_HEADER is set and it is one of the USER_TIERS.
+
+    Args:
+      requestedTier (str | None): The tier sent with the request.
+
+    Returns:
+      str: The requested tier, or DEFAULT_TIER.
+    """
+    if not requestedTier or not llm.TRUST_TIER_HEADER:
+      return llm.DEFAULT_TIER
+    if requestedTier not in llm.USER_TIERS:
+      logging.warning(f"Unknown user tier '{requestedTier}', using "
+                      f"'{llm.DEFAULT_TIER}'")
+      return llm.DEFAULT_TIER
+    return requestedTier
+
+  @staticmethod
+  def describe(modelId: str) -> dict:
+    """
+    Get the recent latency and health of a candidate model.
+
+    Args:
+      modelId (str): The model ID.
+
+    Returns:
+      dict: The model ID, its median time to first chunk and output rate
+       (None when unknown), and whether it is slow or its circuit is open.
+    """
+    model = getResilienceController().getModel(modelId)
+    firstChunkSeconds, tokensPerSecond = model.recentLatency()
+    slow = ((firstChunkSeconds is not None and
+             firstChunkSeconds > llm.SLOW_FIRST_CHUNK_SECONDS) or
+            (tokensPerSecond is not None and
+             tokensPerSecond < llm.SLOW_TOKENS_PER_SECOND))
+    return {
+        "model": modelId,
+        "firstChunkSeconds": firstChunkSeconds,
+        "tokensPerSecond": tokensPerSecond,
+        "slow": slow,
+        "open": model.breaker.isOpen()
+    }
+
+  def route(self,
+            route: str,
+            defaultModel: str,
+            promptTokens: int,
+            tier: str | None = None) -> RoutingDecision:
+    """
+    Pick the model of a request and log the decision.
+
+    Args:
+      route (str): The route of the request, a key of MODEL_ROUTES.
+      defaultModel (str): The model used when the route has no rules or none
+       matches.
+      promptTokens (int): The estimated size of the prompt.
+      tier (str, optional): The user tier. Defaults to DEFAULT_TIER.
+
+    Returns:
+      RoutingDecision: The picked model and the reason.
+    """
+    tier = tier or llm.DEFAULT_TIER
+    rules = self.routes.get(route, [])
+    candidates = [
+        self.describe(rule["model"])
+        for rule in rules
+        if self.matches(rule, tier, promptTokens)
+    ]
+    if not rules:
+      modelId, reason = defaultModel, "default"
+    elif not candidates:
+      modelId, reason = defaultModel, "noRuleMatched"
+    else:
+      healthy = [
+          candidate for candidate in candidates
+          if not candidate["slow"] and not candidate["open"]
+      ]
+      if healthy:
+        modelId = healthy[0]["model"]
+        reason = "preferred" if healthy[0] is candidates[0] else "shifted"
+      else:
+        # Unknown latency sorts first, then the fastest first chunk
+        fastest = min(candidates,
+                      key=lambda candidate:
+                      (candidate["open"], candidate["firstChunkSeconds"] or 0))
+        modelId, reason = fastest["model"], "allSlow"
+
+    decision = RoutingDecision(uuid.uuid4().hex, route, tier, promptTokens,
+                               modelId, reason, candidates)
+    routeStats = self.stats.setdefault(route, {})
+    modelStats = routeStats.setdefault(modelId, {})
+    modelStats[reason] = modelStats.get(reason, 0) + 1
+    logging.info(f"Routing decision: {json.dumps(decision.toDict())}")
+    return decision
+
+  def getStats(self) -> dict:
+    """
+    Get the routing counters.
+
+    Returns:
+      dict: Decisions by route, then model ID, then reason.
+    """
+    return self.stats
+
+
+# Alias for ModelRouter.getInstance
+# This alias allows for easier access to the ModelRouter singleton instance.
+getModelRouter = ModelRouter.getInstance
@@ -0,0 +1,598 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: resilience.py
+Description: This module provides the ResilienceController class, which wraps
+ the streaming model calls of a worker with throttle-aware retries, hedged
+ requests and a circuit breaker per model ID.
+Author: MathTeixeira
+Date: July 29, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable
+
+from botocore import exceptions as botocoreErrors
+
+from core.config import llm
+from .admissionController import (AdmissionRejected, AdmissionSlot,
+                                  getAdmissionController)
+
+# Bedrock error codes worth another attempt
+RETRYABLE_CODES: tuple[str, ...] = (
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "InternalServerException",
+)
+
+# Marks a stream that ended before its first chunk
+END: object = object()
+
+
+class CircuitOpen(AdmissionRejected):
+  """
+  Raised when the circuit of a model is open and calls fail fast.
+  """
+
+
+class FirstChunkTimeout(Exception):
+  """
+  Raised when a call produced no chunk within FIRST_CHUNK_TIMEOUT seconds.
+  """
+
+
+def isRetryable(error: BaseException) -> bool:
+  """
+  Check whether a failed model call is worth another attempt.
+
+  Throttling, timeouts, connection errors and Bedrock server errors are;
+  validation and access errors are not. langchain_aws wraps some Bedrock
+  errors into a ValueError, so the error codes are also searched in the
+  message.
+
+  Args:
+    error (BaseException): The error raised by the call.
+
+  Returns:
+    bool: True if the call may be retried.
+  """
+  if isinstance(error,
+                (FirstChunkTimeout, asyncio.TimeoutError,
+                 botocoreErrors.ConnectionError,
+                 botocoreErrors.HTTPClientError)):
+    return True
+  message = str(error)
+  return any(code in message for code in RETRYABLE_CODES)
+
+
+class CircuitBreaker:
+  """
+  Tracks the health of a model and fails fast while it is unhealthy.
+
+  The circuit opens after `failureThreshold` consecutive failed calls. While
+  open, calls are rejected for `resetTimeout` seconds; then a single trial
+  call is let through (half-open), which closes the circuit if it succeeds
+  and opens it again if it fails.
+
+  Attributes:
+    modelId (str): The model ID.
+    failureThreshold (int): Consecutive failures that open the circuit.
+    resetTimeout (float): Seconds the circuit stays open.
+    state (str): 'closed', 'open' or 'halfOpen'.
+    failures (int): Consecutive failures.
+    openedAt (float): When the circuit last opened.
+    trialAt (float): When the last trial call was let through.
+    stats (dict): Times the circuit opened and calls rejected.
+  """
+
+  def __init__(self, modelId: str, failureThreshold: int,
+               resetTimeout: float) -> None:
+    """
+    Initialize a closed CircuitBreaker.
+
+    Args:
+      modelId (str): The model ID.
+      failureThreshold (int): Consecutive failures that open the circuit.
+      resetTimeout (float): Seconds the circuit stays open.
+    """
+    self.modelId: str = modelId
+    self.failureThreshold: int = failureThreshold
+    self.resetTimeout: float = resetTimeout
+    self.state: str = "closed"
+    self.failures: int = 0
+    self.openedAt: float = 0.0
+    self.trialAt: float = 0.0
+    self.stats: dict = {"opened": 0, "rejected": 0}
+
+  def check(self) -> None:
+    """
+    Let a call through, or reject it while the circuit is open.
+
+    A trial call that never reported back does not block the circuit for
+    more than `resetTimeout` seconds.
+
+    Raises:
+      CircuitOpen: If the circuit is open (503).
+    """
+    now = time.monotonic()
+    if self.state == "closed":
+      return
+    if self.state == "open" and now - self.openedAt >= self.resetTimeout:
+      self.state = "halfOpen"
+      self.trialAt = now
+      return
+    if self.state == "halfOpen" and now - self.trialAt >= self.resetTimeout:
+      self.trialAt = now
+      return
+    self.stats["rejected"] += 1
+    retryAfter = self.resetTimeout - (now - self.openedAt)
+    raise CircuitOpen(f"Model '{self.modelId}' is unavailable", 503,
+                      max(int(retryAfter), 1))
+
+  def isOpen(self) -> bool:
+    """
+    Check whether calls are currently failing fast.
+
+    Returns:
+      bool: True unless the circuit is closed.
+    """
+    return self.state != "closed"
+
+  def recordSuccess(self) -> None:
+    """
+    Close the circuit after a healthy call.
+    """
+    if self.state != "closed":
+      logging.warning(f"Circuit of model '{self.modelId}' closed")
+    self.state = "closed"
+    self.failures = 0
+
+  def recordFailure(self) -> None:
+    """
+    Count a failed call, opening the circuit past the threshold.
+    """
+    self.failures += 1
+    if self.state == "halfOpen" or (self.state == "closed" and
+                                    self.failures >= self.failureThreshold):
+      self.state = "open"
+      self.openedAt = time.monotonic()
+      self.stats["opened"] += 1
+      logging.warning(f"Circuit of model '{self.modelId}' opened after "
+                      f"{self.failures} failed calls")
+
+  def getStats(self) -> dict:
+    """
+    Get the breaker state and counters.
+
+    Returns:
+      dict: The state, consecutive failures, and the opened and rejected
+       counters.
+    """
+    return {"state": self.state, "failures": self.failures, **self.stats}
+
+
+class ResilientModel:
+  """
+  The streaming calls of one model ID, with retries, hedging and a breaker.
+
+  A call is retried with jittered exponential backoff only until its first
+  chunk: once a chunk has been sent to the client, an error is raised as is.
+  With hedging enabled, a call whose first chunk is later than the
+  HEDGE_PERCENTILE of the observed times to first chunk gets a second call
+  racing it, if the admission gate of the model has a free slot; the first
+  one to produce a chunk is kept and the other is cancelled.
+
+  Attributes:
+    modelId (str): The model ID.
+    breaker (CircuitBreaker): The circuit breaker of the model.
+    firstChunkSeconds (deque[float]): Recent times to first chunk.
+    tokensPerSecond (deque[float]): Recent output rates, from the first chunk
+     to the end of the stream.
+    outputTokens (deque[float]): Output tokens of recent completed calls.
+    lastCallAt (float): When the last call of the model ended, or 0.0.
+    stats (dict): Calls, retries, hedges, hedges that won, first chunk
+     timeouts, failed calls, calls cancelled by their consumer and the
+     output tokens those cancellations saved (estimated).
+  """
+
+  def __init__(self, modelId: str) -> None:
+    """
+    Initialize the ResilientModel of a model ID.
+
+    Args:
+      modelId (str): The model ID.
+    """
+    self.modelId: str = modelId
+    self.breaker: CircuitBreaker = CircuitBreaker(
+        modelId, llm.BREAKER_FAILURE_THRESHOLD, llm.BREAKER_RESET_TIMEOUT)
+    self.firstChunkSeconds: deque[float] = deque(maxlen=200)
+    self.tokensPerSecond: deque[float] = deque(maxlen=200)
+    self.outputTokens: deque[float] = deque(maxlen=200)
+    self.lastCallAt: float = 0.0
+    self.stats: dict = {
+        "calls": 0,
+        "retries": 0,
+        "hedged": 0,
+        "hedgeWins": 0,
+        "firstChunkTimeouts": 0,
+        "failures": 0,
+        "cancelled": 0,
+        "tokensSaved": 0.0
+    }
+
+  def percentile(self, percent: float) -> float | None:
+    """
+    Get a percentile of the recent times to first chunk.
+
+    Args:
+      percent (float): The percentile, between 0 and 100.
+
+    Returns:
+      float | None: The percentile in seconds, or None without samples.
+    """
+    if not self.firstChunkSeconds:
+      return None
+    ordered = sorted(self.firstChunkSeconds)
+    index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+    return ordered[index]
+
+  def recentLatency(self) -> tuple[float | None, float | None]:
+    """
+    Get the median time to first chunk and output rate of the recent calls.
+
+    Returns:
+      tuple[float | None, float | None]: The median seconds to first chunk and
+       tokens per second over the last ROUTING_SAMPLES calls, None where there
+       are no samples or the last call is older than ROUTING_STALE_SECONDS.
+    """
+    if time.monotonic() - self.lastCallAt > llm.ROUTING_STALE_SECONDS:
+      return None, None
+
+    def median(samples: deque[float]) -> float | None:
+      recent = sorted(list(samples)[-llm.ROUTING_SAMPLES:])
+      return recent[len(recent) // 2] if recent else None
+
+    return median(self.firstChunkSeconds), median(self.tokensPerSecond)
+
+  def recordCancel(self, tokens: float) -> None:
+    """
+    Count a call cancelled by its consumer before the end of the stream.
+
+    The output it did not generate is estimated as the median output of the
+    recent completed calls of the model, less what it already generated.
+
+    Args:
+      tokens (float): The tokens generated before the cancellation.
+    """
+    self.stats["cancelled"] += 1
+    if self.outputTokens:
+      ordered = sorted(self.outputTokens)
+      self.stats["tokensSaved"] += max(ordered[len(ordered) // 2] - tokens, 0)
+
+  def hedgeDelay(self) -> float | None:
+    """
+    Get the seconds after which a call is hedged.
+
+    Returns:
+      float | None: The delay, or None if hedging is disabled or there are
+       not enough samples yet.
+    """
+    if not llm.HEDGE_ENABLED or len(
+        self.firstChunkSeconds) < llm.HEDGE_MIN_SAMPLES:
+      return None
+    return max(self.percentile(llm.HEDGE_PERCENTILE), llm.HEDGE_MIN_DELAY)
+
+  @staticmethod
+  async def openStream(
+      startStream: Callable[[], AsyncIterator[Any]]
+  ) -> tuple[Any, AsyncIterator[Any]]:
+    """
+    Start a call and wait for its first chunk.
+
+    Args:
+      startStream (Callable[[], AsyncIterator[Any]]): Starts the call.
+
+    Returns:
+      tuple[Any, AsyncIterator[Any]]: The first chunk (END if the stream was
+       empty) and the stream, positioned after it.
+    """
+    stream = startStream().__aiter__()
+    try:
+      return await stream.__anext__(), stream
+    except StopAsyncIteration:
+      return END, stream
+
+  async def firstChunk(
+      self, startStream: Callable[[], AsyncIterator[Any]]
+  ) -> tuple[Any, AsyncIterator[Any], AdmissionSlot | None]:
+    """
+    Run one attempt of a call up to its first chunk, hedging it if late.
+
+    Args:
+      startStream (Callable[[], AsyncIterator[Any]]): Starts the call.
+
+    Returns:
+      tuple[Any, AsyncIterator[Any], AdmissionSlot | None]: The first chunk,
+       the winning stream, and the slot of the hedged call if it won.
+
+    Raises:
+      FirstChunkTimeout: If no call produced a chunk in time.
+      Exception: The error of the call if every call failed.
+    """
+    started = time.perf_counter()
+    deadline = started + llm.FIRST_CHUNK_TIMEOUT
+    hedgeDelay = self.hedgeDelay()
+    primary = asyncio.create_task(self.openStream(startStream))
+    startedAt = {primary: started}
+    pending = {primary}
+    hedge: asyncio.Task | None = None
+    hedgeSlot: AdmissionSlot | None = None
+    error: BaseException | None = None
+    winner: asyncio.Task | None = None
+    try:
+      while pending:
+        now = time.perf_counter()
+        timeout = deadline - now
+        if hedgeDelay is not None:
+          timeout = min(timeout, started + hedgeDelay - now)
+        done, pending = await asyncio.wait(
+            pending,
+            timeout=max(timeout, 0),
+            return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          if task.exception() is None and winner is None:
+            winner = task
+          elif task.exception() is not None:
+            error = task.exception()
+        if winner is not None:
+          self.firstChunkSeconds.append(time.perf_counter() -
+                                        startedAt[winner])
+          first, stream = winner.result()
+          if winner is hedge:
+            self.stats["hedgeWins"] += 1
+            return first, stream, hedgeSlot
+          return first, stream, None
+        if done:
+          continue
+        if time.perf_counter() >= deadline:
+          self.stats["firstChunkTimeouts"] += 1
+          raise FirstChunkTimeout(
+              f"No chunk from model '{self.modelId}' within "
+              f"{llm.FIRST_CHUNK_TIMEOUT:g}s")
+        # Hedge once, and only with a spare slot
+        hedgeDelay = None
+        hedgeSlot = getAdmissionController().getGate(
+            self.modelId).tryAcquire()
+        if hedgeSlot is not None:
+          hedge = asyncio.create_task(self.openStream(startStream))
+          startedAt[hedge] = time.perf_counter()
+          pending.add(hedge)
+          self.stats["hedged"] += 1
+      raise error
+    finally:
+      losers = [
+          task for task in startedAt if task is not winner and
+          (not task.done() or task.exception() is None)
+      ]
+      for task in losers:
+        task.cancel()
+      for task in losers:
+        try:
+          _, stream = await task
+          await stream.aclose()
+        except BaseException:
+          pass
+      if hedgeSlot is not None and winner is not hedge:
+        hedgeSlot.release()
+
+  async def stream(self,
+                   startStream: Callable[[], AsyncIterator[Any]],
+                   countTokens: Callable[[Any], float] | None = None,
+                   requestId: str | None = None) -> AsyncIterator[Any]:
+    """
+    Stream a model call with retries, hedging and the circuit breaker.
+
+    The breaker is not checked here but when the call is admitted (see
+    ResilienceController.admit), so a half-open trial is counted once. The
+    time to first chunk and the output rate of a completed call are kept for
+    hedging and routing, and logged with the request ID. Closing or
+    cancelling the stream before its end cancels the call, and is counted
+    with the output tokens it saved.
+
+    Args:
+      startStream (Callable[[], AsyncIterator[Any]]): Starts the call; called
+       again for each retry and hedge.
+      countTokens (Callable[[Any], float], optional): Estimates the tokens of
+       a chunk. Each chunk counts as one token when not provided.
+      requestId (str, optional): The ID of the request, for the log.
+
+    Yields:
+      Any: The chunks of the call.
+
+    Raises:
+      Exception: The error of the last attempt, or of the stream after its
+       first chunk.
+    """
+    self.stats["calls"] += 1
+    attempt = 0
+    while True:
+      try:
+        first, stream, hedgeSlot = await self.firstChunk(startStream)
+        break
+      except asyncio.CancelledError:
+        self.recordCancel(0)
+        raise
+      except Exception as e:
+        retryable = isRetryable(e)
+        if (not retryable or attempt >= llm.RETRY_ATTEMPTS or
+            self.breaker.isOpen()):
+          self.stats["failures"] += 1
+          if retryable:
+            self.breaker.recordFailure()
+          raise
+        delay = random.uniform(
+            0, min(llm.RETRY_MAX_DELAY, llm.RETRY_BASE_DELAY * 2**attempt))
+        attempt += 1
+        self.stats["retries"] += 1
+        logging.warning(f"Model '{self.modelId}' call failed ({e}), retry "
+                        f"{attempt} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    self.breaker.recordSuccess()
+    countTokens = countTokens or (lambda chunk: 1)
+    firstChunkSeconds = self.firstChunkSeconds[-1]
+    firstChunkAt = time.perf_counter()
+    tokens = 0.0
+    try:
+      if first is END:
+        return
+      tokens += countTokens(first)
+      yield first
+      async for chunk in stream:
+        tokens += countTokens(chunk)
+        yield chunk
+      seconds = time.perf_counter() - firstChunkAt
+      if seconds > 0:
+        self.tokensPerSecond.append(tokens / seconds)
+      self.outputTokens.append(tokens)
+      logging.info(f"Request {requestId}: model '{self.modelId}', first chunk "
+                   f"in {firstChunkSeconds:.3f}s, {tokens:.0f} tokens in "
+                   f"{seconds:.3f}s, {attempt} retries")
+    except (GeneratorExit, asyncio.CancelledError):
+      # The consumer left: the rest of the output is never generated
+      self.recordCancel(tokens)
+      raise
+    except Exception as e:
+      self.stats["failures"] += 1
+      if isRetryable(e):
+        self.breaker.recordFailure()
+      raise
+    finally:
+      self.lastCallAt = time.monotonic()
+      await stream.aclose()
+      if hedgeSlot is not None:
+        hedgeSlot.release()
+
+  def getStats(self) -> dict:
+    """
+    Get the call counters of the model.
+
+    Returns:
+      dict: The call counters, the p50 and p95 times to first chunk, the
+       recent medians used for routing and the breaker state.
+    """
+    firstChunkSeconds, tokensPerSecond = self.recentLatency()
+    return {
+        **self.stats,
+        "firstChunkP50": self.percentile(50),
+        "firstChunkP95": self.percentile(95),
+        "recentFirstChunkSeconds": firstChunkSeconds,
+        "recentTokensPerSecond": tokensPerSecond,
+        "breaker": self.breaker.getStats()
+    }
+
+
+class ResilienceController:
+  """
+  The ResilientModels of a worker, one per model ID.
+
+  Attributes:
+    models (dict[str, ResilientModel]): The ResilientModel of each model ID.
+  """
+
+  _instance: 'ResilienceController | None' = None
+
+  def __init__(self) -> None:
+    """
+    Initialize the ResilienceController with no models.
+    """
+    self.models: dict[str, ResilientModel] = {}
+
+  @classmethod
+  def getInstance(cls) -> 'ResilienceController':
+    """
+    Get the singleton instance of ResilienceController.
+
+    Returns:
+      ResilienceController: The singleton instance of ResilienceController.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  def getModel(self, modelId: str) -> ResilientModel:
+    """
+    Get the ResilientModel of a model ID, creating it on first use.
+
+    Args:
+      modelId (str): The model ID.
+
+    Returns:
+      ResilientModel: The ResilientModel of the model ID.
+    """
+    if modelId not in self.models:
+      self.models[modelId] = ResilientModel(modelId)
+    return self.models[modelId]
+
+  async def admit(self, modelId: str, priority: int) -> AdmissionSlot:
+    """
+    Check the circuit of a model, then get a slot to call it.
+
+    Args:
+      modelId (str): The model ID.
+      priority (int): Queue priority; one of the PRIORITY_* values of
+       llmConfig.
+
+    Returns:
+      AdmissionSlot: The granted slot; release it when the call ends.
+
+    Raises:
+      AdmissionRejected: If the circuit is open (CircuitOpen) or the call is
+       not admitted.
+    """
+    self.getModel(modelId).breaker.check()
+    return await getAdmissionController().acquire(modelId, priority)
+
+  def stream(self,
+             modelId: str,
+             startStream: Callable[[], AsyncIterator[Any]],
+             countTokens: Callable[[Any], float] | None = None,
+             requestId: str | None = None) -> AsyncIterator[Any]:
+    """
+    Stream a model call through the ResilientModel of its model ID.
+
+    Args:
+      modelId (str): The model ID.
+      startStream (Callable[[], AsyncIterator[Any]]): Starts the call.
+      countTokens (Callable[[Any], float], optional): Estimates the tokens of
+       a chunk.
+      requestId (str, optional): The ID of the request, for the log.
+
+    Returns:
+      AsyncIterator[Any]: The chunks of the call.
+    """
+    return self.getModel(modelId).stream(startStream, countTokens, requestId)
+
+  def getStats(self) -> dict:
+    """
+    Get the counters of every model.
+
+    Returns:
+      dict: The model counters by model ID.
+    """
+    return {modelId: model.getStats() for modelId, model in self.models.items()}
+
+
+# Alias for ResilienceController.getInstance
+# This alias allows for easier access to the ResilienceController singleton instance.
+getResilienceController = ResilienceController.getInstance
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+Package Name: streaming
+Description: This package contains the primitives shared by the streaming
+ endpoints.
+Author: MathTeixeira
+Date: July 28, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+from .eventStream import EventStream, coalesceChunks
+from .resumableStreams import ResumableStreams
+from .sharedStream import SharedStream
+from .singleFlight import SingleFlight
+
+__all__ = [
+    'EventStream', 'coalesceChunks', 'ResumableStreams', 'SharedStream',
+    'SingleFlight'
+]
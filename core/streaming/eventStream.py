@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: eventStream.py
+Description: This module provides the EventStream class, which coalesces the
+ text chunks of a model stream and frames them as plain text, Server-Sent
+ Events or NDJSON.
+Author: MathTeixeira
+Date: July 30, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import json
+import time
+import traceback
+from typing import AsyncIterator, Awaitable, Callable
+
+from core.config import llm
+
+
+class ClientDisconnected(Exception):
+  """
+  Raised by coalesceChunks when the client of the stream is gone.
+  """
+
+
+async def coalesceChunks(
+    chunks: AsyncIterator[str],
+    maxChars: int,
+    maxSeconds: float,
+    isDisconnected: Callable[[], Awaitable[bool]] | None = None,
+    pollSeconds: float = llm.DISCONNECT_POLL_SECONDS) -> AsyncIterator[str]:
+  """
+  Merge small chunks into larger ones.
+
+  A merged chunk is sent once it holds `maxChars` characters or its first
+  part has waited `maxSeconds`, whichever comes first, so a slow upstream
+  still reaches the client on time. The upstream is read ahead by a task,
+  which is cancelled if the merged stream is closed early.
+
+  With `isDisconnected`, the client is checked every `pollSeconds`, also
+  while the upstream is silent (e.g. before its first chunk); once it is
+  gone, the upstream is cancelled without waiting for its next chunk.
+
+  Args:
+    chunks (AsyncIterator[str]): The upstream chunks.
+    maxChars (int): Characters that trigger a send.
+    maxSeconds (float): Seconds the oldest buffered character may wait.
+    isDisconnected (Callable[[], Awaitable[bool]], optional): Tells whether
+     the client is gone, like `Request.is_disconnected`.
+    pollSeconds (float): Seconds between two checks of the client. Defaults
+     to the DISCONNECT_POLL_SECONDS from llmConfig.
+
+  Yields:
+    str: The merged chunks.
+
+  Raises:
+    ClientDisconnected: If `isDisconnected` reported the client gone.
+    Exception: The error of the upstream, once the text buffered before it
+     has been sent.
+  """
+  iterator = chunks.__aiter__()
+  buffer: list[str] = []
+  size = 0
+  firstAt = 0.0
+  checkedAt = time.perf_counter()
+  pending: asyncio.Future | None = None
+  try:
+    while True:
+      if pending is None:
+        pending = asyncio.ensure_future(iterator.__anext__())
+      now = time.perf_counter()
+      timeout = max(firstAt + maxSeconds - now, 0) if buffer else None
+      if isDisconnected is not None:
+        untilCheck = max(checkedAt + pollSeconds - now, 0)
+        timeout = untilCheck if timeout is None else min(timeout, untilCheck)
+      done, _ = await asyncio.wait({pending}, timeout=timeout)
+      if (isDisconnected is not None and
+          time.perf_counter() - checkedAt >= pollSeconds):
+        checkedAt = time.perf_counter()
+        if await isDisconnected():
+          raise ClientDisconnected()
+      if not done:
+        if buffer and time.perf_counter() - firstAt >= maxSeconds:
+          # The window closed before the next chunk arrived
+          yield "".join(buffer)
+          buffer, size = [], 0
+        continue
+      try:
+        chunk = pending.result()
+      except StopAsyncIteration:
+        break
+      except Exception:
+        # What arrived before the failure still goes out
+        if buffer:
+          yield "".join(buffer)
+          buffer, size = [], 0
+        raise
+      finally:
+        pending = None
+      if not chunk:
+        continue
+      if not buffer:
+        firstAt = time.perf_counter()
+      buffer.append(chunk)
+      size += len(chunk)
+      if size >= maxChars or time.perf_counter() - firstAt >= maxSeconds:
+        yield "".join(buffer)
+        buffer, size = [], 0
+    if buffer:
+      yield "".join(buffer)
+  finally:
+    if pending is not None:
+      pending.cancel()
+      try:
+        await pending
+      except (asyncio.CancelledError, Exception):
+        pass
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+      await aclose()
+
+
+class EventStream:
+  """
+  Frames the text of a streaming endpoint in one of the supported formats.
+
+  - 'text' (compatibility): the raw text; an error is written in-band as
+    `Error: ...`.
+  - 'sse': Server-Sent Events, `event: <type>` plus a JSON `data:` line.
+  - 'ndjson': one JSON object per line, with its type in `type`.
+
+  The framed formats send `token` events with the text, then a `usage` event
+  and a `done` event; a failure ends the stream with an `error` event
+  instead. Tokens are coalesced in every format. When the client disconnects,
+  the stream ends without further events and its upstream is cancelled.
+
+  Attributes:
+    format (str): The output format.
+    metadata (dict): Fields added to the `done` and `error` events, like the
+     request ID and the model.
+    maxChars (int): Characters that trigger a send.
+    maxSeconds (float): Seconds the oldest buffered character may wait.
+    isDisconnected (Callable[[], Awaitable[bool]] | None): Tells whether the
+     client is gone; without it, a disconnect is only noticed by the server.
+  """
+
+  FORMATS: tuple[str, ...] = ('text', 'sse', 'ndjson')
+  MEDIA_TYPES: dict[str, str] = {
+      'text': 'text/plain',
+      'sse': 'text/event-stream',
+      'ndjson': 'application/x-ndjson',
+  }
+
+  def __init__(self,
+               format: str = 'text',
+               metadata: dict | None = None,
+               maxChars: int = llm.STREAM_FLUSH_CHARS,
+               maxSeconds: float = llm.STREAM_FLUSH_SECONDS,
+               isDisconnected: Callable[[], Awaitable[bool]] | None = None
+              ) -> None:
+    """
+    Initialize the EventStream instance.
+
+    Args:
+      format (str): 'text', 'sse' or 'ndjson'. Defaults to 'text'.
+      metadata (dict, optional): Fields added to the `done` and `error`
+       events.
+      maxChars (int): Characters that trigger a send. Defaults to the
+       STREAM_FLUSH_CHARS from llmConfig.
+      maxSeconds (float): Seconds the oldest buffered character may wait.
+       Defaults to the STREAM_FLUSH_SECONDS from llmConfig.
+      isDisconnected (Callable[[], Awaitable[bool]], optional): Tells
+       whether the client is gone, like `Request.is_disconnected`.
+
+    Raises:
+      ValueError: If the format is unknown.
+    """
+    if format not in self.FORMATS:
+      raise ValueError(f"Unknown stream format '{format}'")
+    self.format: str = format
+    self.metadata: dict = metadata or {}
+    self.maxChars: int = maxChars
+    self.maxSeconds: float = maxSeconds
+    self.isDisconnected: Callable[[], Awaitable[bool]] | None = isDisconnected
+
+  @classmethod
+  def negotiate(cls, accept: str | None) -> str:
+    """
+    Pick the format of a request from its Accept header.
+
+    Args:
+      accept (str | None): The Accept header.
+
+    Returns:
+      str: 'sse' for text/event-stream, 'ndjson' for application/x-ndjson,
+       and 'text' otherwise.
+    """
+    accept = (accept or "").lower()
+    for format in ('sse', 'ndjson'):
+      if cls.MEDIA_TYPES[format] in accept:
+        return format
+    return 'text'
+
+  @property
+  def mediaType(self) -> str:
+    """
+    Get the media type of the response.
+
+    Returns:
+      str: The media type of the format.
+    """
+    return self.MEDIA_TYPES[self.format]
+
+  @property
+  def headers(self) -> dict[str, str]:
+    """
+    Get the extra response headers of the format.
+
+    Returns:
+      dict[str, str]: Headers keeping proxies from caching or buffering
+       event streams; empty for plain text.
+    """
+    if self.format == 'text':
+      return {}
+    return {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+  def encode(self, event: str, data: dict) -> str:
+    """
+    Frame one event.
+
+    Args:
+      event (str): The event type: token, usage, error or done.
+      data (dict): The event fields.
+
+    Returns:
+      str: The framed event.
+    """
+    if self.format == 'sse':
+      return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"type": event, **data}) + "\n"
+
+  async def frame(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Coalesce and frame a text stream.
+
+    Args:
+      chunks (AsyncIterator[str]): The text chunks.
+
+    Yields:
+      str: The framed output.
+    """
+    characters = 0
+    merged = coalesceChunks(chunks, self.maxChars, self.maxSeconds,
+                            self.isDisconnected)
+    try:
+      async for text in merged:
+        characters += len(text)
+        yield (text if self.format == 'text' else self.encode(
+            "token", {"text": text}))
+    except ClientDisconnected:
+      # Nobody is left to read the rest
+      return
+    except Exception as e:
+      print(f"Error in content generation: {str(e)}")
+      print(f"Traceback: {traceback.format_exc()}")
+      if self.format == 'text':
+        yield f"Error: {str(e)}\n"
+      else:
+        yield self.encode("error", {"message": str(e), **self.metadata})
+      return
+    finally:
+      # Closes the upstream too when the client leaves early
+      await merged.aclose()
+    if self.format != 'text':
+      # No tokenizer at hand: about four characters per token
+      yield self.encode(
+          "usage", {
+              "outputCharacters": characters,
+              "outputTokens": round(characters / 4),
+              "estimated": True
+          })
+      yield self.encode("done", self.metadata)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: resumableStreams.py
+Description: This module provides the ResumableStreams class, which keeps the
+ buffers of recent streams so a client that dropped can read the rest of a
+ generation from its last offset.
+Author: MathTeixeira
+Date: July 31, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import time
+from collections import OrderedDict
+
+from core.config import llm
+from .sharedStream import SharedStream
+
+
+class ResumableStreams:
+  """
+  Registry of recent streams by stream ID.
+
+  A stream stays resumable while it runs and for `ttl` seconds after it is
+  done. When the buffered characters of every stream exceed `maxChars`, the
+  oldest finished streams are dropped first, then the oldest running streams
+  that nobody follows, whose upstream is cancelled.
+
+  Attributes:
+    ttl (float): Seconds a finished stream stays resumable.
+    maxChars (int): Characters the buffers may hold in total.
+    streams (OrderedDict[str, tuple[SharedStream, dict]]): Each stream and
+     the metadata of its events, oldest first.
+    stats (dict): Registered, resumed and not found streams, and the streams
+     evicted by age and by memory.
+  """
+
+  def __init__(self,
+               ttl: float = llm.RESUME_TTL_SECONDS,
+               maxChars: int = llm.RESUME_MAX_CHARS) -> None:
+    """
+    Initialize an empty ResumableStreams registry.
+
+    Args:
+      ttl (float): Seconds a finished stream stays resumable. Defaults to
+       the RESUME_TTL_SECONDS from llmConfig.
+      maxChars (int): Characters the buffers may hold in total. Defaults to
+       the RESUME_MAX_CHARS from llmConfig.
+    """
+    self.ttl: float = ttl
+    self.maxChars: int = maxChars
+    self.streams: OrderedDict[str, tuple[SharedStream, dict]] = OrderedDict()
+    self.stats: dict = {
+        "registered": 0,
+        "resumed": 0,
+        "notFound": 0,
+        "evictedAge": 0,
+        "evictedMemory": 0
+    }
+
+  def characters(self) -> int:
+    """
+    Get the characters held by the buffers.
+
+    Returns:
+      int: The buffered characters of every stream.
+    """
+    return sum(stream.characters for stream, _ in self.streams.values())
+
+  def evict(self) -> None:
+    """
+    Drop the expired streams, then the oldest ones while over `maxChars`.
+    """
+    now = time.monotonic()
+    for streamId, (stream, _) in list(self.streams.items()):
+      if stream.done and now - stream.finishedAt > self.ttl:
+        del self.streams[streamId]
+        self.stats["evictedAge"] += 1
+
+    total = self.characters()
+    for idle in (lambda stream: stream.done,
+                 lambda stream: stream.subscribers == 0):
+      for streamId, (stream, _) in list(self.streams.items()):
+        if total <= self.maxChars:
+          return
+        if idle(stream):
+          stream.cancel()
+          del self.streams[streamId]
+          total -= stream.characters
+          self.stats["evictedMemory"] += 1
+
+  def add(self, stream: SharedStream, metadata: dict | None = None) -> None:
+    """
+    Make a stream resumable. Adding it again is a no-op.
+
+    Args:
+      stream (SharedStream): The stream.
+      metadata (dict, optional): Fields added to the `done` and `error`
+       events of a resumed stream, like the model.
+    """
+    if stream.id not in self.streams:
+      self.streams[stream.id] = (stream, metadata or {})
+      self.stats["registered"] += 1
+    self.evict()
+
+  def get(self, streamId: str) -> tuple[SharedStream, dict] | None:
+    """
+    Find a stream that can still be resumed.
+
+    Args:
+      streamId (str): The stream ID.
+
+    Returns:
+      tuple[SharedStream, dict] | None: The stream and its metadata, or None
+       if it is unknown, evicted or was cancelled.
+    """
+    self.evict()
+    entry = self.streams.get(streamId)
+    if entry is None or entry[0].cancelled:
+      self.stats["notFound"] += 1
+      return None
+    self.stats["resumed"] += 1
+    return entry
+
+  def getStats(self) -> dict:
+    """
+    Get the registry counters.
+
+    Returns:
+      dict: Resumable streams, running ones, buffered characters and the
+       registered, resumed, not found and evicted counters.
+    """
+    return {
+        "streams": len(self.streams),
+        "running": sum(
+            1 for stream, _ in self.streams.values() if not stream.done),
+        "characters": self.characters(),
+        **self.stats
+    }
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: sharedStream.py
+Description: This module provides the SharedStream class, one upstream text
+ stream read once and fanned out to any number of subscribers.
+Author: MathTeixeira
+Date: July 28, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Callable
+
+
+class SharedStream:
+  """
+  An upstream stream of text chunks shared by several subscribers.
+
+  The upstream is consumed by its own task, which appends every chunk to a
+  buffer. A subscriber first receives everything already buffered (as one
+  chunk) and then follows the live tail. The upstream is cancelled when its
+  last subscriber leaves before it finished, or `graceSeconds` later if no
+  subscriber joined again by then; a failure of the upstream is raised to
+  every subscriber.
+
+  Attributes:
+    id (str): The ID of the stream, for clients resuming it.
+    chunks (list[str]): The chunks produced so far.
+    characters (int): Characters produced so far.
+    createdAt (float): Monotonic time the stream started.
+    finishedAt (float | None): Monotonic time the upstream was done.
+    done (bool): Whether the upstream finished, failed or was cancelled.
+    cancelled (bool): Whether the upstream was cancelled.
+    error (Exception | None): The error the upstream failed with.
+    subscribers (int): Subscribers currently reading the stream.
+    changed (asyncio.Condition): Notified on every new chunk and at the end.
+    onClose (Callable[[SharedStream], None] | None): Called once the upstream
+     is done.
+    graceSeconds (float): Seconds the upstream keeps running without
+     subscribers.
+    task (asyncio.Task): The task consuming the upstream.
+  """
+
+  def __init__(self,
+               source: AsyncIterator[str],
+               onClose: Callable[['SharedStream'], None] | None = None,
+               graceSeconds: float = 0) -> None:
+    """
+    Initialize the SharedStream and start consuming the upstream.
+
+    Must be called from a running event loop.
+
+    Args:
+      source (AsyncIterator[str]): The upstream chunks.
+      onClose (Callable[[SharedStream], None], optional): Called once the
+       upstream is done.
+      graceSeconds (float): Seconds the upstream keeps running without
+       subscribers. Defaults to 0, cancelling it as the last one leaves.
+    """
+    self.id: str = uuid.uuid4().hex
+    self.chunks: list[str] = []
+    self.characters: int = 0
+    self.createdAt: float = time.monotonic()
+    self.finishedAt: float | None = None
+    self.done: bool = False
+    self.cancelled: bool = False
+    self.error: Exception | None = None
+    self.subscribers: int = 0
+    self.changed: asyncio.Condition = asyncio.Condition()
+    self.onClose: Callable[['SharedStream'], None] | None = onClose
+    self.graceSeconds: float = graceSeconds
+    self.task: asyncio.Task = asyncio.create_task(self.pump(source))
+
+  async def pump(self, source: AsyncIterator[str]) -> None:
+    """
+    Read the upstream into the buffer until it ends.
+
+    Args:
+      source (AsyncIterator[str]): The upstream chunks.
+    """
+    try:
+      async for chunk in source:
+        async with self.changed:
+          self.chunks.append(chunk)
+          self.characters += len(chunk)
+          self.changed.notify_all()
+    except asyncio.CancelledError:
+      self.cancelled = True
+    except Exception as e:
+      self.error = e
+    finally:
+      self.done = True
+      self.finishedAt = time.monotonic()
+      async with self.changed:
+        self.changed.notify_all()
+      if self.onClose is not None:
+        self.onClose(self)
+
+  def cancel(self) -> None:
+    """
+    Cancel the upstream if it is still running.
+    """
+    if not self.done:
+      self.task.cancel()
+
+  def cancelIfIdle(self) -> None:
+    """
+    Cancel the upstream if no subscriber joined during the grace period.
+    """
+    if self.subscribers == 0:
+      self.cancel()
+
+  async def subscribe(self, offset: int = 0) -> AsyncIterator[str]:
+    """
+    Read the stream from a chunk offset to its end.
+
+    Args:
+      offset (int): Index of the first chunk to receive. Defaults to 0.
+
+    Yields:
+      str: The buffered chunks, joined, then every new chunk.
+
+    Raises:
+      Exception: The error the upstream failed with.
+      asyncio.CancelledError: If the upstream was cancelled by the last
+       subscriber leaving while this one was still reading.
+    """
+    self.subscribers += 1
+    try:
+      position = offset
+      while True:
+        if position < len(self.chunks):
+          backlog = "".join(self.chunks[position:])
+          position = len(self.chunks)
+          yield backlog
+          continue
+        if self.done:
+          if self.error is not None:
+            raise self.error
+          if self.cancelled:
+            raise asyncio.CancelledError()
+          return
+        async with self.changed:
+          await self.changed.wait_for(
+              lambda: position < len(self.chunks) or self.done)
+    finally:
+      self.subscribers -= 1
+      if self.subscribers == 0 and not self.done:
+        if self.graceSeconds > 0:
+          # Kept running for a while, so the client can resume it
+          asyncio.get_running_loop().call_later(self.graceSeconds,
+                                                self.cancelIfIdle)
+        else:
+          self.task.cancel()
+
+  def resume(self, offset: int = 0) -> AsyncIterator[str]:
+    """
+    Read the stream from a character offset to its end.
+
+    Args:
+      offset (int): Characters the client already received. Defaults to 0.
+
+    Returns:
+      AsyncIterator[str]: The rest of the buffered text, as one chunk, then
+       every new chunk.
+    """
+    # Find the chunk holding the offset; its received part is skipped
+    position = 0
+    skipped = 0
+    while (position < len(self.chunks) and
+           skipped + len(self.chunks[position]) <= offset):
+      skipped += len(self.chunks[position])
+      position += 1
+    return self.subscribeFrom(position, offset - skipped)
+
+  async def subscribeFrom(self, position: int,
+                          skip: int) -> AsyncIterator[str]:
+    """
+    Read the stream from a chunk offset, skipping the start of that chunk.
+
+    Args:
+      position (int): Index of the first chunk to receive.
+      skip (int): Characters of the first received text to drop.
+
+    Yields:
+      str: The chunks of `subscribe(position)`, without the skipped part.
+    """
+    async for chunk in self.subscribe(position):
+      if skip:
+        chunk, skip = chunk[skip:], max(skip - len(chunk), 0)
+        if not chunk:
+          continue
+      yield chunk
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: singleFlight.py
+Description: This module provides the SingleFlight class, which coalesces
+ identical concurrent streams into one upstream call.
+Author: MathTeixeira
+Date: July 28, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+from typing import AsyncIterator, Callable
+
+from .sharedStream import SharedStream
+
+
+class SingleFlight:
+  """
+  Registry of the in-flight streams of a service, keyed by request.
+
+  The first request for a key starts the upstream; every request with the
+  same key that arrives before the upstream is done subscribes to the same
+  SharedStream instead of starting another one.
+
+  Attributes:
+    streams (dict[str, SharedStream]): The in-flight stream of each key.
+    graceSeconds (float): Seconds an upstream keeps running once every
+     subscriber left.
+    stats (dict): Upstreams started, requests coalesced into one and upstreams
+     cancelled because every subscriber left.
+  """
+
+  def __init__(self, graceSeconds: float = 0) -> None:
+    """
+    Initialize an empty SingleFlight registry.
+
+    Args:
+      graceSeconds (float): Seconds an upstream keeps running once every
+       subscriber left. Defaults to 0.
+    """
+    self.streams: dict[str, SharedStream] = {}
+    self.graceSeconds: float = graceSeconds
+    self.stats: dict = {"started": 0, "coalesced": 0, "cancelled": 0}
+
+  def closed(self, key: str, stream: SharedStream) -> None:
+    """
+    Forget a stream once its upstream is done.
+
+    Args:
+      key (str): The request key.
+      stream (SharedStream): The finished stream.
+    """
+    if self.streams.get(key) is stream:
+      del self.streams[key]
+    if stream.cancelled:
+      self.stats["cancelled"] += 1
+
+  def join(self, key: str,
+           startUpstream: Callable[[], AsyncIterator[str]]) -> SharedStream:
+    """
+    Get the in-flight stream of a key, starting it if there is none.
+
+    Must be called from a running event loop.
+
+    Args:
+      key (str): The request key.
+      startUpstream (Callable[[], AsyncIterator[str]]): Starts the upstream
+       when no stream with this key is in flight.
+
+    Returns:
+      SharedStream: The stream of the key.
+    """
+    stream = self.streams.get(key)
+    if stream is None:
+      stream = SharedStream(startUpstream(),
+                            onClose=lambda done: self.closed(key, done),
+                            graceSeconds=self.graceSeconds)
+      self.streams[key] = stream
+      self.stats["started"] += 1
+    else:
+      self.stats["coalesced"] += 1
+    return stream
+
+  def subscribe(
+      self, key: str,
+      startUpstream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+    """
+    Join the in-flight stream of a key, starting it if there is none.
+
+    Must be called from a running event loop.
+
+    Args:
+      key (str): The request key.
+      startUpstream (Callable[[], AsyncIterator[str]]): Starts the upstream
+       when no stream with this key is in flight.
+
+    Returns:
+      AsyncIterator[str]: The chunks of the stream, from its beginning.
+    """
+    return self.join(key, startUpstream).subscribe()
+
+  def getStats(self) -> dict:
+    """
+    Get the registry counters.
+
+    Returns:
+      dict: In-flight streams, subscribers, and the started, coalesced and
+       cancelled counters.
+    """
+    return {
+        "inFlight": len(self.streams),
+        "subscribers": sum(
+            stream.subscribers for stream in self.streams.values()),
+        **self.stats
+    }
@@ -13,20 +13,30 @@ Contact Information: mathteixeira55
 ### Imports ###
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from schemas import ResponseSchema
 from routers import chatHistoryRouter, ideationRouter, messageListRouter, pageBPRouter
-from core.database import getNoSqlConn
+from core.database import getAsyncNoSqlConn, getNoSqlIndexRegistry
+from core.llm import AdmissionRejected
+from services import getServiceRegistry
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
   print("Starting up...")
-  app.noSqlConn = getNoSqlConn()
+  # The services await MongoDB through the async driver, so database I/O never
+  # blocks the event loop that is streaming tokens
+  app.noSqlConn = getAsyncNoSqlConn()
+  # Every query the services run is backed by an index
+  await getNoSqlIndexRegistry().apply(app.noSqlConn)
+  app.serviceRegistry = getServiceRegistry()
+  app.serviceRegistry.startup()
   yield
   print("Shutting down...")
-  app.noSqlConn.shutdownDbClient()
+  await app.serviceRegistry.shutdown()
+  await app.noSqlConn.shutdownDbClient()
 
 
 ### Initialize FastAPI App ###
@@ -63,7 +73,26 @@ app.add_middleware(CORSMiddleware,
                    allow_origins=origins,
                    allow_credentials=True,
                    allow_methods=["*"],
-                   allow_headers=["*"])
+                   allow_headers=["*"],
+                   expose_headers=[
+                       "X-Cache", "Retry-After", "X-Model", "X-Request-Id",
+                       "X-Stream-Id", "X-Plan-Id"
+                   ])
+
+
+@app.exception_handler(AdmissionRejected)
+async def admissionRejectedHandler(request: Request,
+                                   exc: AdmissionRejected) -> JSONResponse:
+  """
+    Answer a request shed by the model admission control.
+
+    Returns:
+        JSONResponse: 429 (queue full) or 503 (queue timeout), with a
+         Retry-After header.
+    """
+  return JSONResponse(status_code=exc.statusCode,
+                      content={"detail": str(exc)},
+                      headers={"Retry-After": str(exc.retryAfter)})
 
 
 ### API Endpoints ###
@@ -81,6 +110,21 @@ def health_check() -> ResponseSchema:
   return ResponseSchema(message="Welcome to the Skills Ladder API!", code=200)
 
 
+@app.get("/stats",
+         tags=["Health Check"],
+         summary="Worker Stats",
+         response_model=ResponseSchema)
+def workerStats(request: Request) -> ResponseSchema:
+  """
+    Pool statistics of the worker that served the request.
+
+    Returns:
+        ResponseSchema: The shared client and service counters of this worker.
+    """
+  return ResponseSchema(message=request.app.serviceRegistry.getStats(),
+                        code=200)
+
+
 ### Main ###
 if __name__ == "__main__":
   import uvicorn
@@ -2,7 +2,7 @@
 """
 Package Name: models
 Description: This package contains the data models for the chat application,
- including User, ChatHistory, and Message models.
+ including User, ChatHistory, Message and BusinessPlan models.
 Author: MathTeixeira
 Date: July 11, 2024
 Version: 1.0.0
@@ -10,12 +10,14 @@ License: MIT License
 Contact Information: mathteixeira55
 
 This package defines the core data structures used in the chat application.
-It includes models for representing users, chat histories, and individual messages.
+It includes models for representing users, chat histories, individual messages
+and stored business plans.
 These models are used throughout the application for data handling and storage.
 """
 
 from .userModel import User
 from .chatHistoryModel import ChatHistory
 from .messageModel import Message
+from .businessPlanModel import BusinessPlan
 
-__all__ = ['User', 'ChatHistory', 'Message']
+__all__ = ['User', 'ChatHistory', 'Message', 'BusinessPlan']
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: businessPlanModel.py
+Description: This module defines the BusinessPlan model for representing
+ stored business plans.
+Author: MathTeixeira
+Date: August 2, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class BusinessPlan(BaseModel):
+  """
+  Represents a generated business plan.
+
+  A plan is identified by the hash of its input: the normalized
+  questionnaire, the model, its sampling settings and the prompt version.
+  Identical submissions routed to the same model therefore share one plan.
+
+  Attributes:
+    id (str): The input hash of the plan.
+    businessInfo (str): The questionnaire answers, as first submitted.
+    content (str | None): The plan markdown. None in plan lists.
+    model (str): The model that generated the plan.
+    promptVersion (str): The version of the prompt that generated the plan.
+    characters (int): Length of the plan markdown.
+    createdAt (datetime): When the plan was stored.
+
+  Config:
+    The model uses Pydantic's ConfigDict for additional configuration.
+  """
+
+  id: str = Field(..., alias="_id", description="Input hash of the plan")
+  businessInfo: str = Field(..., description="The questionnaire answers")
+  content: str | None = Field(None, description="The plan markdown")
+  model: str = Field(..., description="Model that generated the plan")
+  promptVersion: str = Field(..., description="Version of the prompt")
+  characters: int = Field(0, description="Length of the plan markdown")
+  createdAt: datetime = Field(..., description="When the plan was stored")
+
+  model_config = ConfigDict(
+      from_attributes=True,
+      json_schema_extra={
+          "example": {
+              "_id": "9f2c1e6b0d7a4c3e8b5f1a2d3c4e5f60718293a4b5c6d7e8f9a0b1c2d3e4f5a6",
+              "businessInfo": "1. Business name: Green Leaf Café ...",
+              "content": "# Green Leaf Café\n## Executive Summary\n...",
+              "model": "anthropic.claude-3-haiku-20240307-v1:0",
+              "promptVersion": "1",
+              "characters": 24873,
+              "createdAt": "2024-08-02T14:03:11Z"
+          }
+      })
@@ -27,6 +27,8 @@ class ChatHistory(BaseModel):
     id (str): The unique identifier for the chat history. Defaults to a UUID.
     sessionName (str): The name of the chat session.
     messages (list[Message]): A list of messages in the chat history.
+    summary (str): Running summary of the oldest messages of the session.
+    summarizedCount (int): Number of leading messages folded into the summary.
 
   Config:
     The model uses Pydantic's ConfigDict for additional configuration.
@@ -35,6 +37,9 @@ class ChatHistory(BaseModel):
   id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
   sessionName: str = Field(...)
   messages: list[Message] = Field(default_factory=list)
+  summary: str = Field("", description="Running summary of older messages")
+  summarizedCount: int = Field(
+      0, description="Number of leading messages folded into the summary")
 
   model_config = ConfigDict(
       from_attributes=True,
@@ -24,6 +24,8 @@ class Message(BaseModel):
   Attributes:
     type (str): The type of the message, typically "human" or "ai".
     content (str): The actual content of the message.
+    complete (bool): False for an AI answer saved while it was still being
+     generated, that can be continued.
 
   Config:
     The model uses Pydantic's ConfigDict for additional configuration.
@@ -32,6 +34,9 @@ class Message(BaseModel):
   type: str = Field(
       ..., description="The type of the message (e.g., 'human' or 'ai')")
   content: str = Field(..., description="The content of the message")
+  complete: bool = Field(
+      default=True,
+      description="False for a partial AI answer, saved while it was generated")
 
   model_config = ConfigDict(from_attributes=True,
                             json_schema_extra={
@@ -9,12 +9,14 @@ License: MIT License
 Contact Information: mathteixeira55
 """
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
 
-from services import ChatHistoryService
+from services import ChatHistoryRepository
 from models import ChatHistory
 from schemas import ResponseSchema
-from utils import collectionPath, fieldPath, valuePath
+from utils import (collectionPath, fieldPath, valuePath, limitQuery,
+                   beforeQuery, afterQuery)
 
 chatHistoryRouter = APIRouter()
 
@@ -43,7 +45,7 @@ async def createChatHistory(*,
       HTTPException: If there's an error creating the chat history.
   """
   try:
-    createdChatHistory = await ChatHistoryService.createChatHistory(
+    createdChatHistory = await ChatHistoryRepository.createChatHistory(
         collectionName, chatHistory)
     if not createdChatHistory:
       raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -55,30 +57,112 @@ async def createChatHistory(*,
                         detail=str(e))
 
 
+@chatHistoryRouter.post("/{collectionName}/bulk",
+                        summary="Create many chat histories",
+                        status_code=status.HTTP_201_CREATED,
+                        response_model=ResponseSchema)
+async def createChatHistories(*,
+                              collectionName: str = collectionPath,
+                              chatHistories: list[ChatHistory],
+                              response: Response):
+  """
+  Create many chat history entries in one request.
+
+  The chat histories are inserted in unordered batches, so one failing entry
+  (e.g. a duplicate ID) does not stop the others. The response reports the
+  result of every entry, in request order.
+
+  Args:
+      collectionName (str): The name of the collection to insert the documents into.
+      chatHistories (list[ChatHistory]): The chat histories to be created.
+      response (Response): The outgoing response, used to set a 207 status
+          when some entries failed.
+
+  Returns:
+      ResponseSchema: A response containing the created and failed counts, the
+      per-entry results and a status code.
+
+  Raises:
+      HTTPException: If there's an error creating the chat histories.
+  """
+  try:
+    results = await ChatHistoryRepository.createChatHistories(
+        collectionName, chatHistories)
+    created = sum(result["created"] for result in results)
+    response.status_code = (status.HTTP_201_CREATED if created == len(results)
+                            else status.HTTP_207_MULTI_STATUS)
+    return ResponseSchema(message={
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    },
+                          code=response.status_code)
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e))
+
+
 # Retrieve
+@chatHistoryRouter.get("/{collectionName}/export",
+                       summary="Export chat histories as NDJSON",
+                       response_class=StreamingResponse)
+async def exportChatHistories(collectionName: str = collectionPath):
+  """
+  Stream every chat history of a collection as NDJSON.
+
+  Each line is a complete chat history with all of its messages. The
+  collection is read in batches, so the export never holds more than one batch
+  in memory.
+
+  Args:
+      collectionName (str): The name of the collection to export.
+
+  Returns:
+      StreamingResponse: The NDJSON chat histories.
+  """
+  return StreamingResponse(
+      ChatHistoryRepository.exportChatHistories(collectionName),
+      media_type="application/x-ndjson",
+      headers={
+          "Content-Disposition":
+              f'attachment; filename="{collectionName}.ndjson"'
+      })
+
+
 @chatHistoryRouter.get("/{collectionName}/{field}/{value}",
                        summary="Get History",
                        response_model=ResponseSchema)
 async def getChatHistoryByField(collectionName: str = collectionPath,
                                 field: str = fieldPath,
-                                value: str = valuePath):
+                                value: str = valuePath,
+                                limit: int | None = limitQuery,
+                                before: int | None = beforeQuery,
+                                after: int | None = afterQuery):
   """
   Retrieve a chat history session by a specified field and its value.
 
+  Messages can be paginated by position: `limit` alone returns the last
+  `limit` messages, `before` pages back to older messages and `after` pages
+  forward to newer ones. The response carries the position of the first
+  returned message (`offset`) and the size of the session (`totalMessages`).
+
   Args:
       collectionName (str): The name of the collection to search in.
       field (str): The field to search by.
       value (str): The value of the field to search for.
+      limit (int | None): Maximum number of messages to return.
+      before (int | None): Only return messages before this position.
+      after (int | None): Only return messages after this position.
 
   Returns:
-      ResponseSchema: A response containing the chat history and a status code.
+      ResponseSchema: A response containing the chat history page and a status code.
 
   Raises:
       HTTPException: If there's an error retrieving the chat history.
   """
   try:
-    chatHistory = await ChatHistoryService.getChatHistoryByField(
-        collectionName, field, value)
+    chatHistory = await ChatHistoryRepository.getChatHistoryPage(
+        collectionName, field, value, limit, before, after)
     if chatHistory:
       return ResponseSchema(message=chatHistory, code=status.HTTP_200_OK)
     else:
@@ -89,6 +173,36 @@ async def getChatHistoryByField(collectionName: str = collectionPath,
                         detail=str(e))
 
 
+@chatHistoryRouter.post("/{collectionName}/import",
+                        summary="Import chat histories from NDJSON",
+                        response_model=ResponseSchema)
+async def importChatHistories(request: Request,
+                              collectionName: str = collectionPath):
+  """
+  Import chat histories from an NDJSON request body.
+
+  The body is read as a stream, one chat history per line, and written in
+  batches. Existing IDs are reported as failed and left untouched.
+
+  Args:
+      request (Request): The incoming request with the NDJSON body.
+      collectionName (str): The name of the collection to import into.
+
+  Returns:
+      ResponseSchema: A response containing the import statistics and a status code.
+
+  Raises:
+      HTTPException: If there's an error importing the chat histories.
+  """
+  try:
+    stats = await ChatHistoryRepository.importChatHistories(
+        collectionName, request.stream())
+    return ResponseSchema(message=stats, code=status.HTTP_200_OK)
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e))
+
+
 # Update
 @chatHistoryRouter.put("/{collectionName}/{field}/{value}",
                        summary="Update History",
@@ -111,7 +225,7 @@ async def updateChatHistory(collectionName: str, field: str, value: str,
       HTTPException: If there's an error updating the chat history.
   """
   try:
-    updateResult = await ChatHistoryService.updateChatHistory(
+    updateResult = await ChatHistoryRepository.updateChatHistory(
         collectionName, field, value, chatHistory)
     if updateResult:
       return ResponseSchema(message="Chat history updated successfully",
@@ -144,7 +258,7 @@ async def deleteChatHistory(collectionName: str, field: str, value: str):
       HTTPException: If there's an error deleting the chat history.
   """
   try:
-    deleteResult = await ChatHistoryService.deleteChatHistory(
+    deleteResult = await ChatHistoryRepository.deleteChatHistory(
         collectionName, field, value)
     if deleteResult:
       return ResponseSchema(message="Chat history deleted successfully",
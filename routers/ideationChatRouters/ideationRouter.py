@@ -9,54 +9,178 @@ License: MIT License
 Contact Information: mathteixeira55
 """
 
-import traceback
-from fastapi import APIRouter
+from fastapi import (APIRouter, Depends, Header, Request, WebSocket,
+                     WebSocketDisconnect)
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
 
+from core.llm import AdmissionRejected, ModelRouter
+from core.streaming import EventStream
 from schemas import ChatRequestSchema
-from services import IdeationService
+from services import IdeationService, getIdeationService
 
 ideationRouter = APIRouter()
 
 
 @ideationRouter.post("/", summary="Run Ideation Chatbot")
-async def runIdeationChatbot(chatRequest: ChatRequestSchema):
+async def runIdeationChatbot(
+    chatRequest: ChatRequestSchema,
+    request: Request,
+    ideationService: IdeationService = Depends(getIdeationService),
+    userTier: str | None = Header(default=None, alias="X-User-Tier")):
   """
   Endpoint to run the ideation chatbot.
 
   This function handles POST requests to the ideation chatbot. It takes a chat request,
   processes it through the IdeationService, and returns a streaming response of the chatbot's output.
+  The model is picked by the model router from the size of the prompt (the
+  trimmed history with the new message, and the summary) and the user tier,
+  and returned with the request ID in the `X-Model` and `X-Request-Id`
+  headers. The request waits for a model slot before the response starts, and
+  is rejected with 429 or 503 when the model is overloaded.
+
+  The response format follows the Accept header: `text/event-stream` for
+  Server-Sent Events, `application/x-ndjson` for NDJSON (token, usage, error
+  and done events), and plain text otherwise.
+
+  When the client disconnects, the model call is cancelled and the answer
+  generated so far is saved as incomplete.
+
+  Long answers are saved while they are generated. With `continueResponse`,
+  an answer that was interrupted (its message has `complete: false`) is
+  continued; only the rest of it is streamed.
 
   Args:
     chatRequest (ChatRequestSchema): The chat request containing the user's message.
+    request (Request): The HTTP request, for its Accept header and to
+     notice a disconnect.
+    ideationService (IdeationService): The worker's shared ideation service.
+    userTier (str, optional): The user tier, from the `X-User-Tier` header.
+     It is trusted only when TRUST_TIER_HEADER is set, behind a gateway that
+     sets it, and must be one of the USER_TIERS (see ModelRouter.resolveTier).
 
   Returns:
     StreamingResponse: A streaming response containing the chatbot's generated content.
 
   Raises:
-    Exception: Any exception that occurs during content generation is caught and its message is yielded.
+    AdmissionRejected: If no model slot is available (429 or 503).
+    Exception: Any exception that occurs during content generation is caught
+     and sent as an error event (`Error: ...` in plain text).
   """
   message = chatRequest.message
-  ideationService = IdeationService()
-
-  async def content_generator():
-    """
-    Generator function to stream the chatbot's response content.
-
-    Yields:
-      str: Chunks of the AI's response.
-
-    Raises:
-      Exception: If there's an error during content generation.
-    """
-    try:
-      async for content in ideationService.runChat(message):
-        yield f"{content}"
-      await ideationService.close()
-    except Exception as e:
-      print(f"Error in content generation: {str(e)}")
-      print(f"Traceback: {traceback.format_exc()}")
-      yield f"Error: {str(e)}\n"
-      await ideationService.close()
-
-  return StreamingResponse(content_generator(), media_type="text/plain")
+  # The model is routed on the history the turn sends, so it is loaded first
+  state = await ideationService.openSession()
+  decision = ideationService.routeChat(state, message,
+                                       ModelRouter.resolveTier(userTier),
+                                       chatRequest.continueResponse)
+  slot = await ideationService.admit(decision.modelId)
+
+  eventStream = EventStream(
+      EventStream.negotiate(request.headers.get("accept")), {
+          "requestId": decision.requestId,
+          "model": decision.modelId
+      },
+      isDisconnected=request.is_disconnected)
+  chunks = ideationService.runChat(
+      message,
+      slot=slot,
+      decision=decision,
+      continueResponse=chatRequest.continueResponse,
+      state=state)
+
+  # Frees the slot if the stream never reached the model call
+  return StreamingResponse(eventStream.frame(chunks),
+                           media_type=eventStream.mediaType,
+                           headers={
+                               "X-Model": decision.modelId,
+                               "X-Request-Id": decision.requestId,
+                               **eventStream.headers
+                           },
+                           background=BackgroundTask(slot.release))
+
+
+@ideationRouter.websocket("/ws/{sessionName}")
+async def ideationSocket(
+    websocket: WebSocket,
+    sessionName: str,
+    ideationService: IdeationService = Depends(getIdeationService)):
+  """
+  WebSocket endpoint bound to one ideation session.
+
+  The session is loaded once, when the connection opens, and its history is
+  kept in memory until the connection closes; every turn only writes its two
+  new messages. The client sends one ChatRequestSchema JSON per turn and gets
+  the NDJSON events of the POST endpoint back, one per message: token, usage
+  and done, or error. A turn rejected by the admission control gets an error
+  event with its `status` and `retryAfter`, and the connection stays open.
+  A turn with `continueResponse` continues the interrupted last answer.
+  The user tier comes from the `X-User-Tier` header or the `tier` query
+  parameter, since browsers cannot set WebSocket headers. Like on the POST
+  endpoint, it is trusted only when TRUST_TIER_HEADER is set.
+
+  Args:
+    websocket (WebSocket): The WebSocket connection.
+    sessionName (str): The value of the field that identifies the session.
+    ideationService (IdeationService): The worker's shared ideation service.
+  """
+  await websocket.accept()
+  userTier = ModelRouter.resolveTier(
+      websocket.headers.get("x-user-tier") or
+      websocket.query_params.get("tier"))
+  state = await ideationService.openSession(sessionName)
+  if state.session is None:
+    await websocket.send_json({
+        "type": "error",
+        "message": "Chat session could not be loaded"
+    })
+    await websocket.close(code=1011)
+    return
+
+  ideationService.socketStats["connections"] += 1
+  ideationService.socketStats["open"] += 1
+  try:
+    while True:
+      try:
+        chatRequest = ChatRequestSchema.model_validate_json(
+            await websocket.receive_text())
+      except ValidationError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        continue
+      if state.stale:
+        state = await ideationService.openSession(sessionName)
+
+      decision = ideationService.routeChat(state, chatRequest.message,
+                                           userTier,
+                                           chatRequest.continueResponse)
+      metadata = {"requestId": decision.requestId, "model": decision.modelId}
+      try:
+        slot = await ideationService.admit(decision.modelId)
+      except AdmissionRejected as e:
+        await websocket.send_json({
+            "type": "error",
+            "message": str(e),
+            "status": e.statusCode,
+            "retryAfter": e.retryAfter,
+            **metadata
+        })
+        continue
+
+      events = EventStream("ndjson", metadata).frame(
+          ideationService.runTurn(
+              state,
+              chatRequest.message,
+              slot=slot,
+              decision=decision,
+              continueResponse=chatRequest.continueResponse))
+      try:
+        async for event in events:
+          await websocket.send_text(event.rstrip("\n"))
+      finally:
+        await events.aclose()
+        slot.release()
+      ideationService.socketStats["turns"] += 1
+  except WebSocketDisconnect:
+    pass
+  finally:
+    ideationService.socketStats["open"] -= 1
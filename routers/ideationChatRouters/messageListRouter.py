@@ -11,10 +11,10 @@ Contact Information: mathteixeira55
 
 from fastapi import APIRouter, HTTPException, status
 
-from services import MessageListService
+from services import ChatHistoryRepository
 from models import Message
 from schemas import ResponseSchema
-from utils import collectionPath, sessionPath
+from utils import collectionPath, sessionPath, countPath, indexPath
 
 messageListRouter = APIRouter()
 
@@ -44,13 +44,15 @@ async def pushMessages(*,
       HTTPException: If there's an error pushing the message.
   """
   try:
-    success = await MessageListService.pushMessages(collectionName, sessionId,
-                                                   newMessage)
+    success = await ChatHistoryRepository.pushMessages(
+        collectionName, sessionId, newMessage)
     if not success:
       raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                           detail="Failed to push messages")
     return ResponseSchema(message="Messages pushed successfully",
                           code=status.HTTP_201_CREATED)
+  except HTTPException:
+    raise
   except Exception as e:
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         detail=str(e))
@@ -77,12 +79,122 @@ async def popMessage(collectionName: str, sessionId: str) -> ResponseSchema:
       HTTPException: If there's an error popping the message.
   """
   try:
-    removedMessage = await MessageListService.popMessage(
+    removedMessage = await ChatHistoryRepository.popMessage(
         collectionName, sessionId)
     if not removedMessage:
       raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                           detail="Failed to pop message")
     return ResponseSchema(message=removedMessage, code=status.HTTP_200_OK)
+  except HTTPException:
+    raise
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e))
+
+
+@messageListRouter.delete(
+    "/pop/{collectionName}/{sessionId}/{count}",
+    summary="Pop the last messages from chat session",
+    response_model=ResponseSchema)
+async def popMessages(collectionName: str = collectionPath,
+                      sessionId: str = sessionPath,
+                      count: int = countPath) -> ResponseSchema:
+  """
+  Pop the last `count` messages from the messages list in a chat session.
+
+  Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      count (int): The number of messages to pop.
+
+  Returns:
+      ResponseSchema: A response containing the removed messages, oldest first, and a status code.
+       The list is shorter than `count`, or empty, when the session runs out of messages.
+
+  Raises:
+      HTTPException: If there's an error popping the messages.
+  """
+  try:
+    removedMessages = await ChatHistoryRepository.popMessages(
+        collectionName, sessionId, count)
+    # An empty list is an empty (or unknown) session, not a failure
+    if removedMessages is None:
+      raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                          detail="Failed to pop messages")
+    return ResponseSchema(message=removedMessages, code=status.HTTP_200_OK)
+  except HTTPException:
+    raise
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e))
+
+
+@messageListRouter.delete(
+    "/truncate/{collectionName}/{sessionId}/{index}",
+    summary="Truncate chat session at a message",
+    response_model=ResponseSchema)
+async def truncateMessages(collectionName: str = collectionPath,
+                           sessionId: str = sessionPath,
+                           index: int = indexPath) -> ResponseSchema:
+  """
+  Remove every message of a chat session from position `index` on.
+
+  Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      index (int): Position of the first message to remove.
+
+  Returns:
+      ResponseSchema: A response containing the number of removed messages and a status code.
+
+  Raises:
+      HTTPException: If there's an error truncating the messages.
+  """
+  try:
+    removedCount = await ChatHistoryRepository.truncateMessages(
+        collectionName, sessionId, index)
+    if removedCount is None:
+      raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                          detail="Failed to truncate messages")
+    return ResponseSchema(message=f"{removedCount} messages removed",
+                          code=status.HTTP_200_OK)
+  except HTTPException:
+    raise
+  except Exception as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e))
+
+
+@messageListRouter.put("/last/{collectionName}/{sessionId}",
+                       summary="Replace last message of chat session",
+                       response_model=ResponseSchema)
+async def replaceLastMessage(*,
+                             collectionName: str = collectionPath,
+                             sessionId: str = sessionPath,
+                             newMessage: Message) -> ResponseSchema:
+  """
+  Replace the last message of a chat session.
+
+  Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      newMessage (Message): The message that replaces the last one.
+
+  Returns:
+      ResponseSchema: A response containing the replaced message and a status code.
+
+  Raises:
+      HTTPException: If there's an error replacing the message.
+  """
+  try:
+    replacedMessage = await ChatHistoryRepository.replaceLastMessage(
+        collectionName, sessionId, newMessage)
+    if not replacedMessage:
+      raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                          detail="Failed to replace message")
+    return ResponseSchema(message=replacedMessage, code=status.HTTP_200_OK)
+  except HTTPException:
+    raise
   except Exception as e:
     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                         detail=str(e))
@@ -9,35 +9,65 @@ License: MIT License
 Contact Information: mathteixeira55
 """
 
-import traceback
-from fastapi import APIRouter, HTTPException
+from fastapi import (APIRouter, Depends, Header, HTTPException, Query, Request,
+                     status)
 from fastapi.responses import StreamingResponse
+from pymongo import errors
 
-from schemas import PageBPRequestSchema
-from services import PageBPService
+from core.llm import ModelRouter
+from core.streaming import EventStream
+from schemas import BusinessPlanPageSchema, PageBPRequestSchema, ResponseSchema
+from services import (PageBPService, getBusinessPlanCache,
+                      getBusinessPlanStore, getPageBPService)
 
 pageBPRouter = APIRouter()
 
 # --- POST / ---
 @pageBPRouter.post('/', summary='Generate Business Plan markdown')
-def businessPlan(pageBPRequest: PageBPRequestSchema):
+async def businessPlan(
+    pageBPRequest: PageBPRequestSchema,
+    request: Request,
+    pageBPService: PageBPService = Depends(getPageBPService),
+    userTier: str | None = Header(default=None, alias="X-User-Tier")):
   """
   Endpoint to generate a business plan markdown.
 
   This function handles POST requests to generate a business plan markdown based on the user's input.
+  The model is picked by the model router from the questionnaire size and the
+  user tier, and returned with the request ID in the `X-Model` and
+  `X-Request-Id` headers.
+  A plan still in the cache, or stored for a questionnaire submitted before
+  and routed to the same model, is replayed in chunks without calling the
+  model. The `X-Cache` header is HIT, STORED or MISS, and the `X-Plan-Id`
+  header (and the `done` event) carries the ID of the plan, readable from
+  `GET /plans/{planId}` once it is finished. A request for a plan
+  that is still being generated joins that generation. A new generation
+  waits for a model slot first and is rejected with 429 or 503 when the
+  model is overloaded. A new or joined generation is returned with its stream
+  ID in the `X-Stream-Id` header (and its `done` event); a client that drops
+  can read the rest from `GET /streams/{streamId}`; the generation is
+  cancelled once no client followed it for RESUME_GRACE_SECONDS.
+  The response format follows the Accept header: `text/event-stream` for
+  Server-Sent Events, `application/x-ndjson` for NDJSON (token, usage, error
+  and done events), and plain text otherwise.
 
   Args:
     pageBPRequest (PageBPRequestSchema): The business plan request containing the user's input.
+    request (Request): The HTTP request, for its Accept header and to
+     notice a disconnect.
+    pageBPService (PageBPService): The worker's shared business plan service.
+    userTier (str, optional): The user tier, from the `X-User-Tier` header.
+     It is trusted only when TRUST_TIER_HEADER is set, behind a gateway that
+     sets it, and must be one of the USER_TIERS (see ModelRouter.resolveTier).
 
   Returns:
     StreamingResponse: A streaming response containing the business plan markdown.
 
   Raises:
     HTTPException: If there's an error during content generation
+    AdmissionRejected: If no model slot is available (429 or 503)
   """
 
-  pageBPService = PageBPService()
-
   businessInfo = pageBPRequest.businessInfo
   # print(f"businessInfo: {businessInfo}")
 
@@ -45,22 +75,171 @@ def businessPlan(pageBPRequest: PageBPRequestSchema):
     raise HTTPException(status_code=400,
                         detail="Missing 'businessInfo' in request data")
 
-  async def content_generator():
-    """
-    Generator function to stream the chatbot's response content.
-
-    Yields:
-      str: Chunks of the AI's response.
-
-    Raises:
-      Exception: If there's an error during content generation.
-    """
-    try:
-      async for content in pageBPService.businessPlanQuery(businessInfo):
-        yield f"{content}"
-    except Exception as e:
-      print(f"Error in content generation: {str(e)}")
-      print(f"Traceback: {traceback.format_exc()}")
-      yield f"Error: {str(e)}\n"
-
-  return StreamingResponse(content_generator(), media_type="text/plain")
+  decision = pageBPService.routeBusinessPlan(businessInfo,
+                                             ModelRouter.resolveTier(userTier))
+  # Both lookups are keyed by the routed model and its settings
+  planId = pageBPService.planId(businessInfo, decision.modelId)
+  cached = await pageBPService.cachedBusinessPlan(businessInfo,
+                                                  decision.modelId)
+  stored = None
+  if cached is None:
+    stored = await pageBPService.storedBusinessPlan(businessInfo,
+                                                    decision.modelId)
+  streamHeaders = {}
+  if cached is not None:
+    chunks = getBusinessPlanCache().replay(cached)
+    cacheStatus = "HIT"
+  elif stored is not None:
+    chunks = getBusinessPlanCache().replay(stored.content)
+    cacheStatus = "STORED"
+  else:
+    # Raises AdmissionRejected before the response starts
+    slot = await pageBPService.admitBusinessPlan(businessInfo,
+                                                 decision.modelId)
+    stream = pageBPService.businessPlanStream(businessInfo, slot, decision)
+    chunks = stream.subscribe()
+    streamHeaders["X-Stream-Id"] = stream.id
+    cacheStatus = "MISS"
+
+  eventStream = EventStream(
+      EventStream.negotiate(request.headers.get("accept")), {
+          "requestId": decision.requestId,
+          "model": decision.modelId,
+          "cache": cacheStatus,
+          "planId": planId,
+          **({"streamId": streamHeaders["X-Stream-Id"]} if streamHeaders else {})
+      },
+      isDisconnected=request.is_disconnected)
+
+  return StreamingResponse(eventStream.frame(chunks),
+                           media_type=eventStream.mediaType,
+                           headers={
+                               "X-Cache": cacheStatus,
+                               "X-Model": decision.modelId,
+                               "X-Plan-Id": planId,
+                               "X-Request-Id": decision.requestId,
+                               **streamHeaders,
+                               **eventStream.headers
+                           })
+
+
+# --- GET /streams/{streamId} ---
+@pageBPRouter.get('/streams/{streamId}',
+                  summary='Resume a Business Plan generation')
+async def resumeBusinessPlan(
+    streamId: str,
+    request: Request,
+    offset: int = Query(default=0, ge=0),
+    pageBPService: PageBPService = Depends(getPageBPService)):
+  """
+  Endpoint to read the rest of a business plan generation.
+
+  A client that lost the connection passes the stream ID it got from the
+  POST and the number of plan characters it already received; it gets the
+  remaining text, followed by the live tail if the plan is still being
+  generated, without a new model call. Generations stay resumable for
+  RESUME_TTL_SECONDS after they finish, or less when the buffers of the
+  worker grow past RESUME_MAX_CHARS. The response format follows the Accept
+  header, like the POST.
+
+  Args:
+    streamId (str): The stream ID from the `X-Stream-Id` header.
+    request (Request): The HTTP request, for its Accept header and to
+     notice a disconnect.
+    offset (int): Characters of the plan already received. Defaults to 0.
+    pageBPService (PageBPService): The worker's shared business plan service.
+
+  Returns:
+    StreamingResponse: A streaming response with the rest of the plan.
+
+  Raises:
+    HTTPException: 404 if the stream is unknown, expired or cancelled (post
+     the request again), 416 if the offset is past the generated text.
+  """
+  try:
+    resumed = pageBPService.resumeBusinessPlan(streamId, offset)
+  except ValueError as e:
+    raise HTTPException(status_code=416, detail=str(e))
+  if resumed is None:
+    raise HTTPException(status_code=404,
+                        detail=f"Stream '{streamId}' cannot be resumed")
+  chunks, metadata = resumed
+
+  eventStream = EventStream(
+      EventStream.negotiate(request.headers.get("accept")), {
+          **metadata,
+          "streamId": streamId,
+          "offset": offset
+      },
+      isDisconnected=request.is_disconnected)
+
+  return StreamingResponse(eventStream.frame(chunks),
+                           media_type=eventStream.mediaType,
+                           headers={
+                               "X-Stream-Id": streamId,
+                               **eventStream.headers
+                           })
+
+
+# --- GET /plans ---
+@pageBPRouter.get('/plans',
+                  summary='List stored Business Plans',
+                  response_model=ResponseSchema)
+async def listBusinessPlans(
+    limit: int = Query(default=20, ge=1, le=100),
+    before: str | None = Query(
+        default=None, description="The `next` ID of the previous page")):
+  """
+  Endpoint to list the stored business plans, newest first.
+
+  Plans are listed without their content; read one with
+  `GET /plans/{planId}`. Pass the `next` ID of a page as `before` to get the
+  following one.
+
+  Args:
+    limit (int): Maximum number of plans to return. Defaults to 20.
+    before (str, optional): The `next` ID of the previous page.
+
+  Returns:
+    ResponseSchema: A response containing the page of plans and a status
+     code.
+
+  Raises:
+    HTTPException: 400 if `before` is not a stored plan, 500 if the plans
+     cannot be read.
+  """
+  try:
+    plans, nextId = await getBusinessPlanStore().list(limit, before)
+  except ValueError as e:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e))
+  except errors.PyMongoError as e:
+    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                        detail=str(e))
+  return ResponseSchema(message=BusinessPlanPageSchema(plans=plans,
+                                                       next=nextId),
+                        code=status.HTTP_200_OK)
+
+
+# --- GET /plans/{planId} ---
+@pageBPRouter.get('/plans/{planId}',
+                  summary='Get a stored Business Plan',
+                  response_model=ResponseSchema)
+async def getBusinessPlan(planId: str):
+  """
+  Endpoint to read a stored business plan, without calling the model.
+
+  Args:
+    planId (str): The plan ID from the `X-Plan-Id` header or a plan list.
+
+  Returns:
+    ResponseSchema: A response containing the plan and a status code.
+
+  Raises:
+    HTTPException: 404 if no finished plan has this ID.
+  """
+  plan = await getBusinessPlanStore().get(planId)
+  if plan is None:
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                        detail=f"Business plan '{planId}' not found")
+  return ResponseSchema(message=plan, code=status.HTTP_200_OK)
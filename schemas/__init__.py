@@ -14,6 +14,8 @@ This package includes the following schemas:
 - UserSchema: Defines the structure for user data.
 - UserProtectedSchema: A version of UserSchema with protected fields.
 - ChatRequestSchema: Structures incoming chat requests.
+- ChatHistoryPageSchema: A chat history holding one page of its messages.
+- BusinessPlanPageSchema: One page of the stored business plans.
 
 These schemas are used throughout the application to ensure data consistency
 and to provide clear interfaces for API requests and responses.
@@ -24,7 +26,9 @@ from .userSchema import UserSchema
 from .userProtectedSchema import UserProtectedSchema
 from .chatRequestSchema import ChatRequestSchema
 from .pageBPRequestSchema import PageBPRequestSchema
+from .chatHistoryPageSchema import ChatHistoryPageSchema
+from .businessPlanPageSchema import BusinessPlanPageSchema
 
 __all__ = [
     'ResponseSchema', 'UserSchema', 'UserProtectedSchema', 'ChatRequestSchema',
-    'PageBPRequestSchema']
+    'PageBPRequestSchema', 'ChatHistoryPageSchema', 'BusinessPlanPageSchema']
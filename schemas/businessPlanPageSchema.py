@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: businessPlanPageSchema.py
+Description: This module defines the schema for a page of stored business
+ plans.
+Author: MathTeixeira
+Date: August 2, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+from pydantic import BaseModel, Field
+
+from models.businessPlanModel import BusinessPlan
+
+
+class BusinessPlanPageSchema(BaseModel):
+  """
+  One page of the stored business plans, newest first.
+
+  The plans are listed without their content; `next` is passed as `before`
+  to get the following page.
+
+  Attributes:
+    plans (list[BusinessPlan]): The plans of the page, without content.
+    next (str | None): ID of the last plan of the page, None on the last page.
+  """
+  plans: list[BusinessPlan] = Field(..., description="The plans of the page")
+  next: str | None = Field(
+      None, description="ID to pass as `before` for the next page")
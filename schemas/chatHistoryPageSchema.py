@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: chatHistoryPageSchema.py
+Description: This module defines the schema for a page of a chat history.
+Author: MathTeixeira
+Date: July 25, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+from pydantic import Field
+
+from models.chatHistoryModel import ChatHistory
+
+
+class ChatHistoryPageSchema(ChatHistory):
+  """
+  A chat history holding one page of its messages.
+
+  `messages` only holds the requested window; `offset` is the position of its
+  first message in the whole session and `totalMessages` the size of the
+  whole session.
+
+  Attributes:
+    offset (int): Position of the first returned message in the session.
+    totalMessages (int): Total number of messages in the session.
+  """
+  offset: int = Field(
+      0, description="Position of the first returned message in the session")
+  totalMessages: int = Field(
+      0, description="Total number of messages in the session")
@@ -9,7 +9,7 @@ License: MIT License
 Contact Information: mathteixeira55
 """
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
 
 
 class ChatRequestSchema(BaseModel):
@@ -17,12 +17,34 @@ class ChatRequestSchema(BaseModel):
   ChatRequestSchema for structuring API requests.
 
   This schema defines the structure of chat requests sent to the API.
-  It ensures that incoming requests contain the necessary message field.
+  It ensures that incoming requests contain the necessary message field,
+  unless they continue an interrupted answer.
 
   Attributes:
     message (str): The message to be sent in the chat.
+    continueResponse (bool): Continue the interrupted answer that ends the
+     session instead of sending a message.
   """
-  message: str = Field(..., description="The message to be sent in the chat")
+  message: str = Field(default="",
+                       description="The message to be sent in the chat")
+  continueResponse: bool = Field(
+      default=False,
+      description="Continue the interrupted last answer of the session")
+
+  @model_validator(mode="after")
+  def checkMessage(self) -> 'ChatRequestSchema':
+    """
+    Require a message unless the request continues an answer.
+
+    Returns:
+      ChatRequestSchema: The validated request.
+
+    Raises:
+      ValueError: If the message is empty and no answer is continued.
+    """
+    if not self.message and not self.continueResponse:
+      raise ValueError("A message is required")
+    return self
 
   model_config = ConfigDict(json_schema_extra={
       "example": {
@@ -14,8 +14,12 @@ Contact Information: mathteixeira55
 from pydantic import BaseModel, ConfigDict
 from typing import Union
 
+from models.businessPlanModel import BusinessPlan
 from models.chatHistoryModel import ChatHistory
+from models.messageModel import Message
 from .userProtectedSchema import UserProtectedSchema
+from .chatHistoryPageSchema import ChatHistoryPageSchema
+from .businessPlanPageSchema import BusinessPlanPageSchema
 
 
 class ResponseSchema(BaseModel):
@@ -26,11 +30,17 @@ class ResponseSchema(BaseModel):
     It can accommodate different types of messages and includes a status code.
 
     Attributes:
-        message (Union[str, ChatHistory, UserProtectedSchema]): The message returned in the response.
-            It can be a string, a ChatHistory object, or a UserProtectedSchema object.
+        message (Union[str, ChatHistoryPageSchema, ChatHistory, Message, list[Message],
+            BusinessPlanPageSchema, BusinessPlan, UserProtectedSchema, dict]): The message
+            returned in the response. It can be a string, a page of a chat history, a
+            ChatHistory object, one or more chat messages, a page of business plans, a
+            business plan, a UserProtectedSchema object, or a plain dictionary (e.g. worker
+            statistics).
         code (int): The status code of the response.
     """
-  message: Union[str, ChatHistory, UserProtectedSchema]
+  message: Union[str, ChatHistoryPageSchema, ChatHistory, Message,
+                list[Message], BusinessPlanPageSchema, BusinessPlan,
+                UserProtectedSchema, dict]
   code: int
 
   model_config = ConfigDict(json_schema_extra={
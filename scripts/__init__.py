@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Package Name: scripts
+Description: This package contains maintenance command line tools for the
+ Skills Ladder API.
+Author: MathTeixeira
+Date: July 24, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Each module is run from the project root with `python -m scripts.<module>`.
+"""
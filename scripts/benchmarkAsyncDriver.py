@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: benchmarkAsyncDriver.py
+Description: This script compares token streaming under concurrent chat
+ turns when the history is read with the blocking PyMongo driver and with
+ the async one.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.benchmarkAsyncDriver [--turns 50] [--messages 40]
+   [--tokens 50] [--token-seconds 0.01] [--read-delay-ms 0]
+
+Each of the `--turns` concurrent turns reads a session (header and message
+buckets) from MongoDB, then streams the answer of a fake model, on one event
+loop as in a worker. A blocking read stalls every stream of the loop; an
+awaited one does not. `--read-delay-ms` makes every header read that much
+slower with a server-side `$where` sleep, which needs JavaScript enabled on
+the server. The session is named `benchmark-<run>` and is deleted again once
+the timings are printed.
+"""
+
+### Imports ###
+import argparse
+import asyncio
+import time
+import uuid
+
+from core.config import ideation
+from core.database import getAsyncNoSqlConn, getNoSqlConn
+from models import Message
+from services import ChatHistoryRepository, MessageListService
+from .fakeChatModel import FakeChatChain
+
+
+class TurnTimings:
+  """
+  The token timings of the concurrent turns of one run.
+
+  Attributes:
+    tokens (int): Tokens streamed by every turn.
+    maxGap (float): Longest wait between two tokens of a stream.
+  """
+
+  def __init__(self) -> None:
+    self.tokens: int = 0
+    self.maxGap: float = 0.0
+
+
+async def readSession(driver: str, collectionName: str, sessionName: str,
+                      readDelayMs: int) -> int:
+  """
+  Read a session header and its message buckets.
+
+  Args:
+    driver (str): 'sync' for the blocking driver, 'async' for the async one.
+    collectionName (str): The chat history collection.
+    sessionName (str): The name of the session.
+    readDelayMs (int): Server-side milliseconds added to the header read.
+
+  Returns:
+    int: The number of messages read.
+  """
+  query = {ideation.CHATHISTORY_SEARCH_FIELD: sessionName}
+  if readDelayMs:
+    query["$where"] = f"sleep({readDelayMs}) || true"
+  bucketName = MessageListService.bucketCollectionName(collectionName)
+  if driver == "sync":
+    database = getNoSqlConn().database
+    header = database[collectionName].find_one(query, {"_id": 1})
+    buckets = list(database[bucketName].find(
+        MessageListService.bucketRange(header["_id"])))
+  else:
+    database = getAsyncNoSqlConn().database
+    header = await database[collectionName].find_one(query, {"_id": 1})
+    buckets = [
+        bucket async for bucket in database[bucketName].find(
+            MessageListService.bucketRange(header["_id"]))
+    ]
+  return sum(bucket["count"] for bucket in buckets)
+
+
+async def runTurn(driver: str, chain: FakeChatChain, args: argparse.Namespace,
+                  sessionName: str, timings: TurnTimings) -> None:
+  """
+  Read the session, then stream an answer, recording the token gaps.
+
+  Args:
+    driver (str): 'sync' or 'async'.
+    chain (FakeChatChain): The fake model.
+    args (argparse.Namespace): The parsed command line.
+    sessionName (str): The name of the session.
+    timings (TurnTimings): Where the token timings are recorded.
+  """
+  await readSession(driver, args.collection, sessionName, args.read_delay_ms)
+  last = time.perf_counter()
+  async for _ in chain.astream({}):
+    now = time.perf_counter()
+    timings.maxGap = max(timings.maxGap, now - last)
+    timings.tokens += 1
+    last = now
+
+
+async def benchmark(args: argparse.Namespace) -> None:
+  """
+  Seed the session, run the turns with each driver and print the timings.
+
+  Args:
+    args (argparse.Namespace): The parsed command line.
+  """
+  sessionName = f"benchmark-{uuid.uuid4().hex[:8]}"
+  session = await ChatHistoryRepository.getOrCreateSession(
+      args.collection, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+  await ChatHistoryRepository.pushMessages(args.collection, session.id, [
+      Message(type="human" if i % 2 == 0 else "ai",
+              content=f"Benchmark message {i}") for i in range(args.messages)
+  ])
+  chain = FakeChatChain(args.tokens, args.token_seconds)
+  idealSeconds = args.tokens * args.token_seconds
+  try:
+    # Connect both drivers before timing them
+    for driver in ("sync", "async"):
+      await readSession(driver, args.collection, sessionName, 0)
+    for driver in ("sync", "async"):
+      timings = TurnTimings()
+      started = time.perf_counter()
+      await asyncio.gather(*[
+          runTurn(driver, chain, args, sessionName, timings)
+          for _ in range(args.turns)
+      ])
+      seconds = time.perf_counter() - started
+      print(f"{driver.capitalize() + ':':<7} {args.turns} turns in "
+            f"{seconds:.2f}s ({args.turns / seconds:.1f} turns/s, "
+            f"{timings.tokens / seconds:.0f} tokens/s, longest token gap "
+            f"{timings.maxGap * 1000:.0f} ms; a lone stream takes "
+            f"{idealSeconds:.2f}s)")
+  finally:
+    await ChatHistoryRepository.deleteChatHistory(
+        args.collection, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+    getNoSqlConn().shutdownDbClient()
+    await getAsyncNoSqlConn().shutdownDbClient()
+
+
+def main() -> None:
+  """
+  Parse the command line and run the benchmark.
+  """
+  parser = argparse.ArgumentParser(
+      description="Compare token streaming with blocking and async history "
+      "reads.")
+  parser.add_argument("--collection",
+                      default=ideation.CHATHISTORY_COLLECTION_NAME,
+                      help="Chat history collection to write to.")
+  parser.add_argument("--turns",
+                      type=int,
+                      default=50,
+                      help="Number of concurrent turns per driver.")
+  parser.add_argument("--messages",
+                      type=int,
+                      default=40,
+                      help="Number of messages in the session.")
+  parser.add_argument("--tokens",
+                      type=int,
+                      default=50,
+                      help="Tokens streamed per answer.")
+  parser.add_argument("--token-seconds",
+                      type=float,
+                      default=0.01,
+                      help="Seconds between two tokens of an answer.")
+  parser.add_argument("--read-delay-ms",
+                      type=int,
+                      default=0,
+                      help="Milliseconds added to each header read on the "
+                      "server.")
+  asyncio.run(benchmark(parser.parse_args()))
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: benchmarkBulkCreate.py
+Description: This script compares the throughput of creating chat histories
+ one request at a time with the bulk creation endpoint.
+Author: MathTeixeira
+Date: July 25, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.benchmarkBulkCreate [--url http://localhost:8000]
+   [--sessions 500] [--messages 4] [--batch-size 100]
+
+The API must be running. Every session created by the benchmark is named
+`benchmark-<run>-<n>` and is deleted again once the timings are printed.
+"""
+
+### Imports ###
+import argparse
+import json
+import time
+import urllib.request
+import uuid
+
+from core.config import ideation
+
+
+def request(method: str, url: str, body=None) -> dict:
+  """
+  Send a JSON request and decode the JSON response.
+
+  Args:
+    method (str): The HTTP method.
+    url (str): The full URL.
+    body (dict | list, optional): The JSON body.
+
+  Returns:
+    dict: The decoded response.
+  """
+  data = json.dumps(body).encode() if body is not None else None
+  httpRequest = urllib.request.Request(
+      url, data=data, method=method, headers={"Content-Type": "application/json"})
+  with urllib.request.urlopen(httpRequest) as response:
+    return json.loads(response.read())
+
+
+def makeSessions(prefix: str, count: int, messages: int) -> list[dict]:
+  """
+  Build the chat histories to create.
+
+  Args:
+    prefix (str): Prefix of the session names.
+    count (int): Number of sessions.
+    messages (int): Number of messages per session.
+
+  Returns:
+    list[dict]: The chat history request bodies.
+  """
+  return [{
+      "sessionName": f"{prefix}-{n}",
+      "messages": [{
+          "type": "human" if i % 2 == 0 else "ai",
+          "content": f"Benchmark message {i}"
+      } for i in range(messages)]
+  } for n in range(count)]
+
+
+def main() -> None:
+  """
+  Parse the command line, run both benchmarks and print their throughput.
+  """
+  parser = argparse.ArgumentParser(
+      description="Compare single and bulk chat history creation.")
+  parser.add_argument("--url",
+                      default="http://localhost:8000",
+                      help="Base URL of the running API.")
+  parser.add_argument("--collection",
+                      default=ideation.CHATHISTORY_COLLECTION_NAME,
+                      help="Chat history collection to write to.")
+  parser.add_argument("--sessions",
+                      type=int,
+                      default=500,
+                      help="Number of sessions created by each benchmark.")
+  parser.add_argument("--messages",
+                      type=int,
+                      default=4,
+                      help="Number of messages per session.")
+  parser.add_argument("--batch-size",
+                      type=int,
+                      default=100,
+                      help="Sessions per bulk request.")
+  args = parser.parse_args()
+
+  baseUrl = f"{args.url}/api/chathistory/{args.collection}"
+  run = uuid.uuid4().hex[:8]
+  single = makeSessions(f"benchmark-{run}-single", args.sessions,
+                        args.messages)
+  bulk = makeSessions(f"benchmark-{run}-bulk", args.sessions, args.messages)
+
+  started = time.perf_counter()
+  for session in single:
+    request("POST", baseUrl, session)
+  singleSeconds = time.perf_counter() - started
+
+  started = time.perf_counter()
+  failed = 0
+  for start in range(0, len(bulk), args.batch_size):
+    response = request("POST", f"{baseUrl}/bulk",
+                       bulk[start:start + args.batch_size])
+    failed += response["message"]["failed"]
+  bulkSeconds = time.perf_counter() - started
+
+  print(f"Single: {args.sessions} sessions in {singleSeconds:.2f}s "
+        f"({args.sessions / singleSeconds:.0f} sessions/s)")
+  print(f"Bulk:   {args.sessions} sessions in {bulkSeconds:.2f}s "
+        f"({args.sessions / bulkSeconds:.0f} sessions/s, "
+        f"batches of {args.batch_size}, {failed} failed)")
+  print(f"Speedup: {singleSeconds / bulkSeconds:.1f}x")
+
+  for session in single + bulk:
+    request("DELETE", f"{baseUrl}/sessionName/{session['sessionName']}")
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: benchmarkTurnLatency.py
+Description: This script measures the chat history reads and writes of an
+ ideation turn done in-process, through ChatHistoryRepository, against the
+ same work done over an HTTP loopback to the API, as IdeationService did
+ before.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.benchmarkTurnLatency [--url http://localhost:8000]
+   [--turns 200] [--messages 20]
+
+The API must be running against the same database as this script. A turn
+loads the session with its messages and pushes the two new messages; the
+model call is the same on both paths and is left out. Turns alternate between
+the two paths, each on its own session named `benchmark-<run>-<path>`, and
+both sessions are deleted again once the timings are printed.
+"""
+
+### Imports ###
+import argparse
+import asyncio
+import http.client
+import json
+import statistics
+import time
+import urllib.parse
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+
+from core.config import ideation
+from core.database import getAsyncNoSqlConn
+from models import Message
+from services import ChatHistoryRepository
+
+
+def request(connection: http.client.HTTPConnection,
+            method: str,
+            path: str,
+            body=None) -> dict:
+  """
+  Send a JSON request on a kept-alive connection and decode the response.
+
+  Args:
+    connection (http.client.HTTPConnection): The connection to the API.
+    method (str): The HTTP method.
+    path (str): The path of the URL.
+    body (dict | list, optional): The JSON body.
+
+  Returns:
+    dict: The decoded response.
+  """
+  data = json.dumps(body).encode() if body is not None else None
+  connection.request(method, path, body=data,
+                     headers={"Content-Type": "application/json"})
+  response = connection.getresponse()
+  return json.loads(response.read())
+
+
+async def inProcessTurn(collectionName: str, sessionName: str,
+                        newMessages: list[Message]) -> float:
+  """
+  Run the history work of one turn in-process.
+
+  Args:
+    collectionName (str): The chat history collection.
+    sessionName (str): The name of the session.
+    newMessages (list[Message]): The two messages of the turn.
+
+  Returns:
+    float: The seconds the turn took.
+  """
+  started = time.perf_counter()
+  session = await ChatHistoryRepository.getOrCreateSession(
+      collectionName, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+  await ChatHistoryRepository.getMessages(collectionName, session.id)
+  await ChatHistoryRepository.pushMessages(collectionName, session.id,
+                                           newMessages)
+  return time.perf_counter() - started
+
+
+def loopbackTurn(connection: http.client.HTTPConnection, collectionName: str,
+                 sessionName: str, newMessages: list[Message]) -> float:
+  """
+  Run the history work of one turn through the HTTP API.
+
+  Args:
+    connection (http.client.HTTPConnection): The connection to the API.
+    collectionName (str): The chat history collection.
+    sessionName (str): The name of the session.
+    newMessages (list[Message]): The two messages of the turn.
+
+  Returns:
+    float: The seconds the turn took.
+  """
+  started = time.perf_counter()
+  session = request(
+      connection, "GET", f"/api/chathistory/{collectionName}/"
+      f"{ideation.CHATHISTORY_SEARCH_FIELD}/{sessionName}")["message"]
+  # The client decoded every message, as IdeationService did
+  [Message.model_validate(message) for message in session["messages"]]
+  request(connection, "POST",
+          f"/api/messages/push/{collectionName}/{session['_id']}",
+          jsonable_encoder(newMessages))
+  return time.perf_counter() - started
+
+
+def describe(name: str, seconds: list[float]) -> str:
+  """
+  Format the latency of a path.
+
+  Args:
+    name (str): The name of the path.
+    seconds (list[float]): The seconds of each turn.
+
+  Returns:
+    str: The turns and their mean, p50 and p95 latency.
+  """
+  ordered = sorted(seconds)
+  p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+  return (f"{name} {len(seconds)} turns, "
+          f"mean {statistics.mean(seconds) * 1000:.2f} ms, "
+          f"p50 {statistics.median(seconds) * 1000:.2f} ms, "
+          f"p95 {p95 * 1000:.2f} ms")
+
+
+async def benchmark(args: argparse.Namespace) -> None:
+  """
+  Seed both sessions, run the turns and print the latencies.
+
+  Args:
+    args (argparse.Namespace): The parsed command line.
+  """
+  url = urllib.parse.urlsplit(args.url)
+  connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+  run = uuid.uuid4().hex[:8]
+  sessionNames = {
+      path: f"benchmark-{run}-{path}" for path in ("inprocess", "loopback")
+  }
+  seed = [
+      Message(type="human" if i % 2 == 0 else "ai",
+              content=f"Benchmark message {i}") for i in range(args.messages)
+  ]
+  for sessionName in sessionNames.values():
+    session = await ChatHistoryRepository.getOrCreateSession(
+        args.collection, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+    await ChatHistoryRepository.pushMessages(args.collection, session.id, seed)
+
+  inProcess, loopback = [], []
+  try:
+    for turn in range(args.turns):
+      newMessages = [
+          Message(type="human", content=f"Benchmark question {turn}"),
+          Message(type="ai", content=f"Benchmark answer {turn}")
+      ]
+      inProcess.append(await inProcessTurn(args.collection,
+                                           sessionNames["inprocess"],
+                                           newMessages))
+      loopback.append(
+          loopbackTurn(connection, args.collection, sessionNames["loopback"],
+                       newMessages))
+
+    print(describe("In-process:", inProcess))
+    print(describe("Loopback:  ", loopback))
+    saved = statistics.mean(loopback) - statistics.mean(inProcess)
+    print(f"Saved per turn: {saved * 1000:.2f} ms (mean), "
+          f"{statistics.mean(loopback) / statistics.mean(inProcess):.1f}x")
+  finally:
+    connection.close()
+    for sessionName in sessionNames.values():
+      await ChatHistoryRepository.deleteChatHistory(
+          args.collection, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+    await getAsyncNoSqlConn().shutdownDbClient()
+
+
+def main() -> None:
+  """
+  Parse the command line and run the benchmark.
+  """
+  parser = argparse.ArgumentParser(
+      description="Compare in-process and HTTP loopback chat history turns.")
+  parser.add_argument("--url",
+                      default="http://localhost:8000",
+                      help="Base URL of the running API.")
+  parser.add_argument("--collection",
+                      default=ideation.CHATHISTORY_COLLECTION_NAME,
+                      help="Chat history collection to write to.")
+  parser.add_argument("--turns",
+                      type=int,
+                      default=200,
+                      help="Number of turns run on each path.")
+  parser.add_argument("--messages",
+                      type=int,
+                      default=20,
+                      help="Number of messages in each session before the "
+                      "first turn.")
+  asyncio.run(benchmark(parser.parse_args()))
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
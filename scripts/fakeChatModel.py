@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: fakeChatModel.py
+Description: This module provides a fake streaming chat model for the load
+ tests, so they measure the service and the database instead of Bedrock.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+It is imported by the scripts, not run on its own.
+"""
+
+### Imports ###
+import asyncio
+
+from langchain_core.messages import AIMessageChunk
+
+from services import IdeationService
+
+
+class FakeChatChain:
+  """
+  A stand-in for the `prompt | model` chain of IdeationService.
+
+  Every call streams the same number of chunks at a fixed pace, whatever the
+  prompt.
+
+  Attributes:
+    tokens (int): Chunks streamed per call.
+    tokenSeconds (float): Seconds before each chunk.
+    calls (int): Calls started.
+  """
+
+  def __init__(self, tokens: int, tokenSeconds: float) -> None:
+    """
+    Initialize the FakeChatChain instance.
+
+    Args:
+      tokens (int): Chunks streamed per call.
+      tokenSeconds (float): Seconds before each chunk.
+    """
+    self.tokens: int = tokens
+    self.tokenSeconds: float = tokenSeconds
+    self.calls: int = 0
+
+  async def astream(self, inputDict: dict):
+    """
+    Stream an answer.
+
+    Args:
+      inputDict (dict): The prompt variables, ignored.
+
+    Yields:
+      AIMessageChunk: The chunks of the answer.
+    """
+    self.calls += 1
+    for index in range(self.tokens):
+      await asyncio.sleep(self.tokenSeconds)
+      yield AIMessageChunk(content=f"token{index} ")
+
+
+def useFakeModel(tokens: int, tokenSeconds: float) -> FakeChatChain:
+  """
+  Make every IdeationService answer with a FakeChatChain.
+
+  Args:
+    tokens (int): Chunks streamed per answer.
+    tokenSeconds (float): Seconds before each chunk.
+
+  Returns:
+    FakeChatChain: The chain every model ID now resolves to.
+  """
+  chain = FakeChatChain(tokens, tokenSeconds)
+  IdeationService.getChain = lambda self, modelId: chain
+  return chain
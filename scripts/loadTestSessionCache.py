@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: loadTestSessionCache.py
+Description: This script counts the MongoDB reads of each ideation turn with
+ the session cache enabled and disabled.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.loadTestSessionCache [--sessions 20] [--turns 10]
+   [--messages 20] [--tokens 20]
+
+Every session runs its turns one after the other, as a user would, and the
+sessions run concurrently. Each turn goes through IdeationService.runChat, as
+a POST to the ideation endpoint does, with a fake model answering. The reads
+are the find, aggregate and getMore commands the driver sends, counted by a
+PyMongo command listener. The sessions are named `loadtest-<run>-<n>` and are
+deleted again once the counts are printed.
+"""
+
+### Imports ###
+import argparse
+import asyncio
+import collections
+import time
+import uuid
+
+from pymongo import monitoring
+
+from core.cache import MemoryCacheBackend
+from core.config import ideation
+from core.database import getAsyncNoSqlConn
+from models import Message
+from services import ChatHistoryRepository, IdeationService, MessageListService
+from services.ideationChatServices.sessionCache import SessionCache
+from .fakeChatModel import useFakeModel
+
+READ_COMMANDS = ("find", "aggregate", "getMore")
+
+
+class CommandCounter(monitoring.CommandListener):
+  """
+  Counts the commands the MongoDB driver sends, by name.
+
+  Attributes:
+    commands (collections.Counter): The commands started, by name.
+  """
+
+  def __init__(self) -> None:
+    self.commands: collections.Counter = collections.Counter()
+
+  def reads(self) -> int:
+    """
+    Get the number of read commands sent.
+
+    Returns:
+      int: The find, aggregate and getMore commands.
+    """
+    return sum(self.commands[name] for name in READ_COMMANDS)
+
+  def started(self, event: monitoring.CommandStartedEvent) -> None:
+    self.commands[event.command_name] += 1
+
+  def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+    pass
+
+  def failed(self, event: monitoring.CommandFailedEvent) -> None:
+    pass
+
+
+async def runSession(service: IdeationService, sessionName: str,
+                     turns: int) -> None:
+  """
+  Run the turns of one session, one after the other.
+
+  Args:
+    service (IdeationService): The ideation service.
+    sessionName (str): The name of the session.
+    turns (int): Number of turns.
+  """
+  for turn in range(turns):
+    async for _ in service.runChat(f"Load test question {turn}",
+                                   fieldValue=sessionName):
+      pass
+
+
+async def loadTest(args: argparse.Namespace, counter: CommandCounter) -> None:
+  """
+  Run the sessions with the cache enabled, then disabled, and print the
+  reads per turn.
+
+  Args:
+    args (argparse.Namespace): The parsed command line.
+    counter (CommandCounter): The registered command listener.
+  """
+  useFakeModel(args.tokens, 0.0)
+  service = IdeationService(CHATHISTORY_COLLECTION_NAME=args.collection)
+  run = uuid.uuid4().hex[:8]
+  seed = [
+      Message(type="human" if i % 2 == 0 else "ai",
+              content=f"Load test message {i}") for i in range(args.messages)
+  ]
+  sessionNames = []
+  try:
+    for mode, cacheSize in (("enabled", ideation.SESSION_CACHE_SIZE),
+                            ("disabled", 0)):
+      SessionCache._instance = SessionCache(
+          MemoryCacheBackend(cacheSize, ideation.SESSION_CACHE_TTL))
+      names = [f"loadtest-{run}-{mode}-{n}" for n in range(args.sessions)]
+      sessionNames += names
+      for sessionName in names:
+        session = await ChatHistoryRepository.getOrCreateSession(
+            args.collection, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+        await ChatHistoryRepository.pushMessages(args.collection, session.id,
+                                                 seed)
+
+      readsBefore = counter.reads()
+      started = time.perf_counter()
+      await asyncio.gather(*[
+          runSession(service, sessionName, args.turns) for sessionName in names
+      ])
+      await MessageListService.flushWriteQueues()
+      seconds = time.perf_counter() - started
+      turns = args.sessions * args.turns
+      reads = counter.reads() - readsBefore
+      stats = SessionCache._instance.getStats()
+      print(f"Cache {mode + ':':<9} {turns} turns in {seconds:.2f}s, "
+            f"{reads} reads ({reads / turns:.2f} per turn), "
+            f"{stats['hits']} hits, {stats['misses']} misses")
+  finally:
+    for sessionName in sessionNames:
+      await ChatHistoryRepository.deleteChatHistory(
+          args.collection, ideation.CHATHISTORY_SEARCH_FIELD, sessionName)
+    await getAsyncNoSqlConn().shutdownDbClient()
+
+
+def main() -> None:
+  """
+  Parse the command line, register the command listener and run the load
+  test.
+  """
+  parser = argparse.ArgumentParser(
+      description="Count the MongoDB reads per turn with and without the "
+      "session cache.")
+  parser.add_argument("--collection",
+                      default=ideation.CHATHISTORY_COLLECTION_NAME,
+                      help="Chat history collection to write to.")
+  parser.add_argument("--sessions",
+                      type=int,
+                      default=20,
+                      help="Number of concurrent sessions per run.")
+  parser.add_argument("--turns",
+                      type=int,
+                      default=10,
+                      help="Number of turns per session.")
+  parser.add_argument("--messages",
+                      type=int,
+                      default=20,
+                      help="Number of messages in each session before its "
+                      "first turn.")
+  parser.add_argument("--tokens",
+                      type=int,
+                      default=20,
+                      help="Tokens streamed per answer.")
+  args = parser.parse_args()
+  # Listeners only apply to clients created after they are registered
+  counter = CommandCounter()
+  monitoring.register(counter)
+  asyncio.run(loadTest(args, counter))
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
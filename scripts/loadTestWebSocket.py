@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: loadTestWebSocket.py
+Description: This script compares the ideation turns per second of the
+ WebSocket endpoint, which keeps the session in memory, with the POST
+ endpoint, which reloads it every turn.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.loadTestWebSocket [--clients 20] [--turns 10]
+   [--messages 40] [--tokens 20] [--token-seconds 0.0] [--port 8765]
+
+The script serves the API itself, on 127.0.0.1:<port>, with a fake model
+answering, so the model's time and cost are left out. It needs the
+`websockets` package, which uvicorn also needs to serve WebSockets. Each
+client runs its turns one after the other, on a kept-alive HTTP connection
+or on one WebSocket, and the clients run concurrently. The POST endpoint
+always runs on the `Test` session, so both paths run on a `Test` session of
+`--messages` messages, each in its own `loadtest-<run>-<path>` collection;
+the collections are dropped once the results are printed.
+"""
+
+### Imports ###
+import argparse
+import concurrent.futures
+import http.client
+import json
+import statistics
+import threading
+import time
+import uuid
+
+import uvicorn
+from websockets.sync.client import connect
+
+from core.config import ideation
+from core.database import getNoSqlConn, getNoSqlIndexRegistry
+from main import app
+from services import MessageListService
+from .fakeChatModel import useFakeModel
+
+# The session the POST endpoint runs on (see IdeationService.runChat)
+SESSION_NAME = "Test"
+
+
+def request(connection: http.client.HTTPConnection,
+            method: str,
+            path: str,
+            body=None) -> bytes:
+  """
+  Send a JSON request on a kept-alive connection and read the whole response.
+
+  Args:
+    connection (http.client.HTTPConnection): The connection to the API.
+    method (str): The HTTP method.
+    path (str): The path of the URL.
+    body (dict | list, optional): The JSON body.
+
+  Returns:
+    bytes: The response body.
+  """
+  data = json.dumps(body).encode() if body is not None else None
+  connection.request(method,
+                     path,
+                     body=data,
+                     headers={
+                         "Content-Type": "application/json",
+                         "Accept": "application/x-ndjson"
+                     })
+  return connection.getresponse().read()
+
+
+def checkEvent(event: dict) -> bool:
+  """
+  Check whether an NDJSON event ends a turn.
+
+  Args:
+    event (dict): The decoded event.
+
+  Returns:
+    bool: True for the done event.
+
+  Raises:
+    RuntimeError: On an error event, so a failing run is not reported.
+  """
+  if event.get("type") == "error" or "detail" in event:
+    raise RuntimeError(f"Turn failed: {event}")
+  return event.get("type") == "done"
+
+
+def postClient(port: int, turns: int) -> list[float]:
+  """
+  Run turns through the POST endpoint.
+
+  Args:
+    port (int): The port of the API.
+    turns (int): Number of turns.
+
+  Returns:
+    list[float]: The seconds of each turn.
+  """
+  connection = http.client.HTTPConnection("127.0.0.1", port)
+  seconds = []
+  try:
+    for turn in range(turns):
+      started = time.perf_counter()
+      events = request(connection, "POST", "/api/ideation/",
+                       {"message": f"Load test question {turn}"})
+      checkEvent(json.loads(events.splitlines()[-1]))
+      seconds.append(time.perf_counter() - started)
+  finally:
+    connection.close()
+  return seconds
+
+
+def socketClient(port: int, turns: int) -> list[float]:
+  """
+  Run turns on one WebSocket connection.
+
+  Args:
+    port (int): The port of the API.
+    turns (int): Number of turns.
+
+  Returns:
+    list[float]: The seconds of each turn.
+  """
+  seconds = []
+  with connect(f"ws://127.0.0.1:{port}/api/ideation/ws/{SESSION_NAME}") as ws:
+    for turn in range(turns):
+      started = time.perf_counter()
+      ws.send(json.dumps({"message": f"Load test question {turn}"}))
+      while not checkEvent(json.loads(ws.recv())):
+        pass
+      seconds.append(time.perf_counter() - started)
+  return seconds
+
+
+def runClients(client, args: argparse.Namespace) -> tuple[float, list[float]]:
+  """
+  Run the clients of one path concurrently.
+
+  Args:
+    client (Callable[[int, int], list[float]]): postClient or socketClient.
+    args (argparse.Namespace): The parsed command line.
+
+  Returns:
+    tuple[float, list[float]]: The total seconds and the seconds of every
+     turn.
+  """
+  started = time.perf_counter()
+  with concurrent.futures.ThreadPoolExecutor(args.clients) as pool:
+    results = list(
+        pool.map(lambda _: client(args.port, args.turns), range(args.clients)))
+  return time.perf_counter() - started, [
+      seconds for clientSeconds in results for seconds in clientSeconds
+  ]
+
+
+def main() -> None:
+  """
+  Parse the command line, serve the API, run both paths and print their
+  throughput.
+  """
+  parser = argparse.ArgumentParser(
+      description="Compare ideation turns/s over WebSocket and POST.")
+  parser.add_argument("--clients",
+                      type=int,
+                      default=20,
+                      help="Number of concurrent clients per path.")
+  parser.add_argument("--turns",
+                      type=int,
+                      default=10,
+                      help="Number of turns per client.")
+  parser.add_argument("--messages",
+                      type=int,
+                      default=40,
+                      help="Number of messages in the session before the "
+                      "first turn.")
+  parser.add_argument("--tokens",
+                      type=int,
+                      default=20,
+                      help="Tokens streamed per answer.")
+  parser.add_argument("--token-seconds",
+                      type=float,
+                      default=0.0,
+                      help="Seconds between two tokens of an answer.")
+  parser.add_argument("--port",
+                      type=int,
+                      default=8765,
+                      help="Port the API is served on.")
+  args = parser.parse_args()
+
+  run = uuid.uuid4().hex[:8]
+  collections = {path: f"loadtest-{run}-{path}" for path in ("post", "ws")}
+  # Created by the lifespan, like the indexes of the real collection
+  registry = getNoSqlIndexRegistry()
+  for collectionName in collections.values():
+    registry.register(collectionName,
+                      *registry.indexes[ideation.CHATHISTORY_COLLECTION_NAME])
+  useFakeModel(args.tokens, args.token_seconds)
+
+  server = uvicorn.Server(
+      uvicorn.Config(app, host="127.0.0.1", port=args.port,
+                     log_level="warning"))
+  thread = threading.Thread(target=server.run)
+  thread.start()
+  while not server.started:
+    time.sleep(0.05)
+
+  try:
+    connection = http.client.HTTPConnection("127.0.0.1", args.port)
+    for collectionName in collections.values():
+      request(
+          connection, "POST", f"/api/chathistory/{collectionName}", {
+              "sessionName":
+                  SESSION_NAME,
+              "messages": [{
+                  "type": "human" if i % 2 == 0 else "ai",
+                  "content": f"Load test message {i}"
+              } for i in range(args.messages)]
+          })
+    connection.close()
+
+    results = {}
+    for path, client in (("post", postClient), ("ws", socketClient)):
+      app.serviceRegistry.ideationService.CHATHISTORY_COLLECTION_NAME = (
+          collections[path])
+      results[path] = runClients(client, args)
+
+    turns = args.clients * args.turns
+    for path, name in (("post", "POST:     "), ("ws", "WebSocket:")):
+      seconds, turnSeconds = results[path]
+      print(f"{name} {turns} turns in {seconds:.2f}s "
+            f"({turns / seconds:.1f} turns/s, p50 "
+            f"{statistics.median(turnSeconds) * 1000:.1f} ms per turn)")
+    print(f"Speedup: {results['post'][0] / results['ws'][0]:.1f}x")
+  finally:
+    server.should_exit = True
+    thread.join()
+    database = getNoSqlConn().database
+    for collectionName in collections.values():
+      database.drop_collection(collectionName)
+      database.drop_collection(
+          MessageListService.bucketCollectionName(collectionName))
+    getNoSqlConn().shutdownDbClient()
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: migrateMessageBuckets.py
+Description: This script converts chat histories with an embedded `messages`
+ array into the session header + message bucket layout.
+Author: MathTeixeira
+Date: July 24, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.migrateMessageBuckets [--collection chatHistories] [--dry-run]
+
+Each session is converted in its own transaction: its embedded messages are
+written to bucket documents, followed by any buckets the new code already
+wrote for it, and the `messages` field is removed from the header. The script
+is idempotent and can be stopped and re-run at any time.
+"""
+
+### Imports ###
+import argparse
+import time
+
+from core.config import ideation
+from core.database import getNoSqlConn
+from services.ideationChatServices.messageListService import MessageListService
+
+
+def migrateSession(conn, collectionName: str, header: dict,
+                   bucketSize: int) -> int:
+  """
+  Move the embedded messages of one session into bucket documents.
+
+  Args:
+    conn (NoSqlConnection): The NoSql connection.
+    collectionName (str): The name of the chat history collection.
+    header (dict): The session document, including its `messages` array.
+    bucketSize (int): Maximum number of messages per bucket.
+
+  Returns:
+    int: The number of buckets written.
+  """
+  sessionId = header["_id"]
+  headers = conn.database[collectionName]
+  buckets = conn.database[MessageListService.bucketCollectionName(
+      collectionName)]
+  bucketRange = MessageListService.bucketRange(sessionId)
+
+  with conn.NoSqlClient.start_session() as session:
+    with session.start_transaction():
+      # Buckets already written by the new code come after the old messages
+      messages = list(header["messages"])
+      for bucket in buckets.find(bucketRange, session=session).sort("_id", 1):
+        messages.extend(bucket["messages"])
+      buckets.delete_many(bucketRange, session=session)
+
+      newBuckets = MessageListService.bucketDocuments(sessionId, messages,
+                                                      bucketSize)
+      if newBuckets:
+        buckets.insert_many(newBuckets, session=session)
+      headers.update_one({"_id": sessionId}, {"$unset": {
+          "messages": ""
+      }},
+                         session=session)
+  return len(newBuckets)
+
+
+def main() -> None:
+  """
+  Parse the command line and migrate every embedded session.
+  """
+  parser = argparse.ArgumentParser(
+      description="Move embedded chat messages into message buckets.")
+  parser.add_argument("--collection",
+                      default=ideation.CHATHISTORY_COLLECTION_NAME,
+                      help="Chat history collection to migrate.")
+  parser.add_argument("--bucket-size",
+                      type=int,
+                      default=ideation.MESSAGE_BUCKET_SIZE,
+                      help="Maximum number of messages per bucket.")
+  parser.add_argument("--dry-run",
+                      action="store_true",
+                      help="Only count the sessions that need migrating.")
+  args = parser.parse_args()
+
+  conn = getNoSqlConn()
+  headers = conn.database[args.collection]
+  pending = {"messages": {"$exists": True}}
+  print(f"{headers.count_documents(pending)} sessions to migrate in "
+        f"'{args.collection}'.")
+  if args.dry_run:
+    conn.shutdownDbClient()
+    return
+
+  sessions = 0
+  bucketsWritten = 0
+  started = time.time()
+  try:
+    for header in headers.find(pending, batch_size=100):
+      bucketsWritten += migrateSession(conn, args.collection, header,
+                                       args.bucket_size)
+      sessions += 1
+      if sessions % 1000 == 0:
+        print(f"{sessions} sessions migrated...")
+  finally:
+    print(f"Migrated {sessions} sessions into {bucketsWritten} buckets in "
+          f"{time.time() - started:.1f}s.")
+    conn.shutdownDbClient()
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: replayMemoryModes.py
+Description: This script replays exported chat sessions through the 'window'
+ and 'summary' memory modes and reports the prompt tokens of every turn.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.replayMemoryModes backup.ndjson [--summary-tokens 0]
+   [--trim-size 500] [--trim-strategy last]
+
+The file is an export of scripts.transferChatHistories ('-' reads stdin).
+Every human message of a session is replayed as a turn, followed by its
+recorded answer, and the prompt IdeationService would send is built for both
+modes: trimmed to the token budget, counted with the service's token counter
+and including the system prompt. In 'summary' mode, the summary is updated
+after every turn the summarizer would update it on, and is assumed to be
+written before the next turn. The summaries are written by the configured
+model, which needs Bedrock; `--summary-tokens N` uses a placeholder summary of
+N tokens instead, for an estimate without model calls.
+"""
+
+### Imports ###
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from core.config import ideation
+from models import ChatHistory, Message
+from services import IdeationService
+
+
+def readSessions(path: str):
+  """
+  Read the sessions of an NDJSON export.
+
+  Args:
+    path (str): The input file, or '-' for stdin.
+
+  Yields:
+    ChatHistory: The sessions, one per line.
+  """
+  source = sys.stdin if path == "-" else open(path, encoding="utf-8")
+  try:
+    for line in source:
+      if line.strip():
+        yield ChatHistory.model_validate(json.loads(line))
+  finally:
+    if source is not sys.stdin:
+      source.close()
+
+
+def promptTokens(service: IdeationService, history: list[BaseMessage],
+                 summary: str) -> int:
+  """
+  Count the tokens of the prompt a turn sends to the model.
+
+  Args:
+    service (IdeationService): The ideation service.
+    history (list[BaseMessage]): The history, ending with the new message.
+    summary (str): The session summary, empty in 'window' mode.
+
+  Returns:
+    int: The tokens of the system prompt and the trimmed history.
+  """
+  messages, _ = service.trimmer.trim(history)
+  prompt = service.prompt.format_messages(
+      messages=messages,
+      language="English",
+      summary=service.summaryPrompt(summary))
+  return sum(service.trimmer.tokenCounter(message) for message in prompt)
+
+
+async def writeSummary(service: IdeationService, args: argparse.Namespace,
+                       summary: str, messages: list[Message]) -> str:
+  """
+  Fold messages into a summary, as SessionSummarizer.summarize does.
+
+  Args:
+    service (IdeationService): The ideation service.
+    args (argparse.Namespace): The parsed command line.
+    summary (str): The current summary.
+    messages (list[Message]): The messages to fold.
+
+  Returns:
+    str: The updated summary.
+  """
+  if args.summary_tokens:
+    # The approximate counter takes four characters per token
+    return "x" * (args.summary_tokens * 4)
+  response = await service.summarizer.chain.ainvoke({
+      "summary": summary or "(empty)",
+      "lines": service.summarizer.formatLines(messages)
+  })
+  return response.content
+
+
+async def replaySession(service: IdeationService, args: argparse.Namespace,
+                        messages: list[Message]) -> list[tuple[int, int]]:
+  """
+  Replay the turns of a session in both memory modes.
+
+  Args:
+    service (IdeationService): The ideation service.
+    args (argparse.Namespace): The parsed command line.
+    messages (list[Message]): The messages of the session.
+
+  Returns:
+    list[tuple[int, int]]: The prompt tokens of every turn, in 'window' and
+     in 'summary' mode.
+  """
+  summarizer = service.summarizer
+  summary, summarizedCount = "", 0
+  turns = []
+  for index, message in enumerate(messages):
+    if message.type != "human":
+      continue
+    newMessage = HumanMessage(content=message.content)
+    window = messages[:index]
+    # See IdeationService.loadSession
+    if service.trimmer.strategy == "last":
+      window = window[-service.HISTORY_WINDOW_MESSAGES:]
+    pending = messages[summarizedCount:index]
+    turns.append((
+        promptTokens(service,
+                     service.toMessageHistory(window).messages + [newMessage],
+                     ""),
+        promptTokens(service,
+                     service.toMessageHistory(pending).messages + [newMessage],
+                     summary),
+    ))
+
+    # The summary is updated once the turn and its answer are saved
+    total = index + 1
+    if total < len(messages) and messages[total].type == "ai":
+      total += 1
+    if summarizer.isDue(total, summarizedCount):
+      end = summarizer.foldEnd(summarizedCount, total)
+      if end - summarizedCount >= summarizer.batchMessages:
+        summary = await writeSummary(service, args, summary,
+                                     messages[summarizedCount:end])
+        summarizedCount = end
+  return turns
+
+
+def describe(name: str, tokens: list[int]) -> str:
+  """
+  Format the prompt tokens of a memory mode.
+
+  Args:
+    name (str): The name of the mode.
+    tokens (list[int]): The prompt tokens of every turn.
+
+  Returns:
+    str: The mean, p95, maximum and total prompt tokens.
+  """
+  ordered = sorted(tokens)
+  p95 = ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+  return (f"{name} mean {statistics.mean(tokens):.0f}, p95 {p95}, "
+          f"max {ordered[-1]}, total {sum(tokens)} prompt tokens")
+
+
+async def replay(args: argparse.Namespace) -> None:
+  """
+  Replay every session of the export and print the prompt tokens per turn.
+
+  Args:
+    args (argparse.Namespace): The parsed command line.
+  """
+  service = IdeationService(TRIM_SIZE=args.trim_size,
+                            TRIM_STRATEGY=args.trim_strategy)
+  # Prompt tokens of the n-th turn of every session, per mode
+  byTurn: list[tuple[list[int], list[int]]] = []
+  sessions = 0
+  for session in readSessions(args.path):
+    sessions += 1
+    turns = await replaySession(service, args, session.messages)
+    for number, (window, summary) in enumerate(turns):
+      if number == len(byTurn):
+        byTurn.append(([], []))
+      byTurn[number][0].append(window)
+      byTurn[number][1].append(summary)
+  if not byTurn:
+    print("No turns to replay.")
+    return
+
+  print(f"{'Turn':>5} {'Sessions':>8} {'Window':>8} {'Summary':>8}")
+  for number, (window, summary) in enumerate(byTurn):
+    print(f"{number + 1:>5} {len(window):>8} {statistics.mean(window):>8.0f} "
+          f"{statistics.mean(summary):>8.0f}")
+  window = [tokens for turn in byTurn for tokens in turn[0]]
+  summary = [tokens for turn in byTurn for tokens in turn[1]]
+  print(f"{sessions} sessions, {len(window)} turns")
+  print(describe("Window: ", window))
+  print(describe("Summary:", summary))
+  print(f"Summary vs window: {sum(summary) / sum(window) - 1:+.1%} prompt "
+        "tokens")
+
+
+def main() -> None:
+  """
+  Parse the command line and run the replay.
+  """
+  parser = argparse.ArgumentParser(
+      description="Compare the prompt tokens of the memory modes on exported "
+      "sessions.")
+  parser.add_argument("path",
+                      help="NDJSON export of chat histories, '-' for stdin.")
+  parser.add_argument("--summary-tokens",
+                      type=int,
+                      default=0,
+                      help="Use a placeholder summary of this many tokens "
+                      "instead of calling the model.")
+  parser.add_argument("--trim-size",
+                      type=int,
+                      default=ideation.TRIM_SIZE,
+                      help="Token budget of the history sent to the model.")
+  parser.add_argument("--trim-strategy",
+                      default=ideation.TRIM_STRATEGY,
+                      choices=("last", "keepFirst"),
+                      help="Trimming strategy.")
+  asyncio.run(replay(parser.parse_args()))
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: transferChatHistories.py
+Description: This script exports chat histories to an NDJSON file and imports
+ them back, e.g. for backups or to copy them to another collection.
+Author: MathTeixeira
+Date: July 25, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+
+Usage:
+  python -m scripts.transferChatHistories export backup.ndjson [--collection chatHistories]
+  python -m scripts.transferChatHistories import backup.ndjson [--collection chatHistories]
+
+A file name of '-' reads from stdin or writes to stdout.
+"""
+
+### Imports ###
+import argparse
+import asyncio
+import contextlib
+import sys
+import time
+
+from core.config import ideation
+from core.database import getAsyncNoSqlConn
+from services import ChatHistoryRepository
+
+CHUNK_SIZE = 1 << 16
+
+
+async def exportToFile(collectionName: str, path: str) -> None:
+  """
+  Export a chat history collection to an NDJSON file.
+
+  Args:
+    collectionName (str): The name of the collection to export.
+    path (str): The output file, or '-' for stdout.
+  """
+  output = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+  exported = 0
+  started = time.perf_counter()
+  try:
+    async for lines in ChatHistoryRepository.exportChatHistories(
+        collectionName):
+      output.write(lines)
+      exported += lines.count("\n")
+  finally:
+    if output is not sys.stdout:
+      output.close()
+  seconds = time.perf_counter() - started
+  print(f"Exported {exported} chat histories in {seconds:.2f}s "
+        f"({exported / max(seconds, 1e-9):.0f} documents/s).",
+        file=sys.stderr)
+
+
+async def readChunks(path: str):
+  """
+  Read a file in fixed-size chunks.
+
+  Args:
+    path (str): The input file, or '-' for stdin.
+
+  Yields:
+    bytes: The next chunk of the file.
+  """
+  source = sys.stdin.buffer if path == "-" else open(path, "rb")
+  try:
+    while chunk := source.read(CHUNK_SIZE):
+      yield chunk
+  finally:
+    if source is not sys.stdin.buffer:
+      source.close()
+
+
+async def importFromFile(collectionName: str, path: str) -> None:
+  """
+  Import an NDJSON file into a chat history collection.
+
+  Args:
+    collectionName (str): The name of the collection to import into.
+    path (str): The input file, or '-' for stdin.
+  """
+  stats = await ChatHistoryRepository.importChatHistories(
+      collectionName, readChunks(path))
+  print(f"Imported {stats['imported']} chat histories in "
+        f"{stats['seconds']:.2f}s ({stats['documentsPerSecond']:.0f} "
+        f"documents/s); {stats['failed']} failed, {stats['invalid']} invalid.",
+        file=sys.stderr)
+  for error in stats["errors"]:
+    print(f"  line {error['line']}: {error['error']}", file=sys.stderr)
+
+
+async def run(args: argparse.Namespace) -> None:
+  """
+  Run the selected transfer and close the database connection.
+
+  Args:
+    args (argparse.Namespace): The parsed command line.
+  """
+  # Keep the connection banner out of an export written to stdout
+  with contextlib.redirect_stdout(sys.stderr):
+    getAsyncNoSqlConn()
+  try:
+    if args.command == "export":
+      await exportToFile(args.collection, args.file)
+    else:
+      await importFromFile(args.collection, args.file)
+  finally:
+    with contextlib.redirect_stdout(sys.stderr):
+      await getAsyncNoSqlConn().shutdownDbClient()
+
+
+def main() -> None:
+  """
+  Parse the command line and run the transfer.
+  """
+  parser = argparse.ArgumentParser(
+      description="Export or import chat histories as NDJSON.")
+  parser.add_argument("command", choices=["export", "import"])
+  parser.add_argument("file", help="NDJSON file, or '-' for stdin/stdout.")
+  parser.add_argument("--collection",
+                      default=ideation.CHATHISTORY_COLLECTION_NAME,
+                      help="Chat history collection to read or write.")
+  asyncio.run(run(parser.parse_args()))
+
+
+### Main ###
+if __name__ == "__main__":
+  main()
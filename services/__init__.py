@@ -12,14 +12,26 @@ This package includes the following service:
 - IdeationService: Manages chat-based ideation sessions using AWS Bedrock and LangChain.
 - ChatHistoryService: Manages chat history data storage and retrieval.
 - MessageListService: Manages messages in a FILO (stack) style.
+- ChatHistoryRepository: In-process entry point for chat history reads and writes.
+- PageBPService: Generates 1-page business plans using AWS Bedrock.
+- BusinessPlanCache: Replays business plans generated for the same questionnaire.
+- BusinessPlanStore: Keeps every finished business plan, one per questionnaire.
+- ServiceRegistry: Owns the app-scoped clients and services shared by a worker.
 
 
 These services provide the core functionality for the chat application,
 handling interactions with external APIs and processing chat messages.
 """
 
-from .ideationChatServices import IdeationService, ChatHistoryService, MessageListService
-from .pageBPServices import PageBPService
+from .ideationChatServices import (IdeationService, ChatHistoryService,
+                                   MessageListService, ChatHistoryRepository)
+from .pageBPServices import (PageBPService, getBusinessPlanCache,
+                             getBusinessPlanStore)
+from .serviceRegistry import (ServiceRegistry, getServiceRegistry,
+                              getIdeationService, getPageBPService)
 
 __all__ = ['IdeationService', 'ChatHistoryService', 'MessageListService',
-           'PageBPService']
+           'ChatHistoryRepository', 'PageBPService', 'getBusinessPlanCache',
+           'getBusinessPlanStore',
+           'ServiceRegistry', 'getServiceRegistry', 'getIdeationService',
+           'getPageBPService']
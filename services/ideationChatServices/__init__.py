@@ -8,7 +8,12 @@ License: MIT License
 Contact Information: mathteixeira55
 """
 from .chatHistoryService import ChatHistoryService
-from .ideationService import IdeationService
+from .sessionCache import SessionCache, getSessionCache
 from .messageListService import MessageListService
+from .chatHistoryTransferService import ChatHistoryTransferService
+from .chatHistoryRepository import ChatHistoryRepository
+from .ideationService import IdeationService
 
-__all__ = ['ChatHistoryService', 'IdeationService', 'MessageListService']
\ No newline at end of file
+__all__ = ['ChatHistoryService', 'IdeationService', 'MessageListService',
+           'ChatHistoryRepository', 'ChatHistoryTransferService',
+           'SessionCache', 'getSessionCache']
\ No newline at end of file
@@ -0,0 +1,379 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: chatHistoryRepository.py
+Description: This module provides the in-process repository used to read and
+ write chat histories.
+Author: MathTeixeira
+Date: July 22, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+from typing import AsyncIterable, AsyncIterator
+
+from models import ChatHistory, Message
+from schemas import ChatHistoryPageSchema
+from .chatHistoryService import ChatHistoryService
+from .messageListService import MessageListService
+from .chatHistoryTransferService import ChatHistoryTransferService
+
+
+class ChatHistoryRepository:
+  """
+  In-process entry point for every chat history read and write.
+
+  IdeationService calls this repository directly instead of looping back
+  through the HTTP API, and the chat history and message list routers are thin
+  adapters over it, so both paths share the same storage logic.
+  """
+
+  @staticmethod
+  async def createChatHistory(collectionName: str,
+                              chatHistory: ChatHistory) -> ChatHistory:
+    """
+    Create a new chat history document.
+
+    Args:
+      collectionName (str): The name of the collection to insert the document into.
+      chatHistory (ChatHistory): The chat history data to be inserted.
+
+    Returns:
+      ChatHistory: The created chat history document or None on error.
+    """
+    return await ChatHistoryService.createChatHistory(collectionName,
+                                                      chatHistory)
+
+  @staticmethod
+  async def createChatHistories(collectionName: str,
+                                chatHistories: list[ChatHistory]) -> list[dict]:
+    """
+    Create several chat history documents in one batch.
+
+    Args:
+      collectionName (str): The name of the collection to insert the documents into.
+      chatHistories (list[ChatHistory]): The chat histories to be inserted.
+
+    Returns:
+      list[dict]: One result per chat history, in order, with its `_id`, a
+       `created` flag and the `error` message of failed ones.
+    """
+    return await ChatHistoryService.createChatHistories(collectionName,
+                                                        chatHistories)
+
+  @staticmethod
+  async def getChatHistoryByField(collectionName: str, field: str,
+                                  value: str) -> ChatHistory:
+    """
+    Retrieve a chat history document by a specified field and its value.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      ChatHistory: The retrieved chat history document or None if not found.
+    """
+    return await ChatHistoryService.getChatHistoryByField(
+        collectionName, field, value)
+
+  @staticmethod
+  async def getChatHistoryPage(collectionName: str,
+                               field: str,
+                               value: str,
+                               limit: int | None = None,
+                               before: int | None = None,
+                               after: int | None = None) -> ChatHistoryPageSchema:
+    """
+    Retrieve a chat history document with one page of its messages.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+      limit (int | None): Maximum number of messages to return.
+      before (int | None): Only return messages before this position.
+      after (int | None): Only return messages after this position.
+
+    Returns:
+      ChatHistoryPageSchema: The chat history with the requested page of
+       messages or None if not found.
+    """
+    return await ChatHistoryService.getChatHistoryPage(collectionName, field,
+                                                       value, limit, before,
+                                                       after)
+
+  @staticmethod
+  async def getSessionHeader(collectionName: str, field: str,
+                             value: str) -> ChatHistory:
+    """
+    Retrieve a chat session without loading its messages.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      ChatHistory: The session header or None if not found.
+    """
+    return await ChatHistoryService.getSessionHeader(collectionName, field,
+                                                     value)
+
+  @staticmethod
+  async def getOrCreateSession(collectionName: str, field: str,
+                               value: str) -> ChatHistory:
+    """
+    Retrieve a chat session header, creating an empty session when it does not
+    exist. Messages are not loaded; use getMessages for them.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for. It is used as the
+       session name of a new session.
+
+    Returns:
+      ChatHistory: The existing or newly created session header, or None on
+       error.
+    """
+    chatHistory = await ChatHistoryService.getSessionHeader(
+        collectionName, field, value)
+    if chatHistory is None:
+      chatHistory = await ChatHistoryService.createChatHistory(
+          collectionName, ChatHistory(sessionName=value))
+    if chatHistory is None:
+      # A concurrent request created it first (unique session index)
+      chatHistory = await ChatHistoryService.getSessionHeader(
+          collectionName, field, value)
+    return chatHistory
+
+  @staticmethod
+  async def updateChatHistory(collectionName: str, field: str, value: str,
+                              chatHistory: ChatHistory) -> bool:
+    """
+    Update an existing chat history document by a specified field and its value.
+
+    Args:
+      collectionName (str): The name of the collection to update the document in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+      chatHistory (ChatHistory): The updated chat history data.
+
+    Returns:
+      bool: True if the chat history was successfully updated, False otherwise.
+    """
+    return await ChatHistoryService.updateChatHistory(collectionName, field,
+                                                      value, chatHistory)
+
+  @staticmethod
+  async def updateSummary(collectionName: str, sessionId: str, summary: str,
+                          summarizedCount: int,
+                          expectedSummarizedCount: int) -> bool:
+    """
+    Store a new rolling summary if nobody updated it in the meantime.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session.
+      summary (str): The new summary.
+      summarizedCount (int): Number of leading messages the summary covers.
+      expectedSummarizedCount (int): The summarizedCount the summary was built
+       from.
+
+    Returns:
+      bool: True if the summary was stored, False otherwise.
+    """
+    return await ChatHistoryService.updateSummary(collectionName, sessionId,
+                                                  summary, summarizedCount,
+                                                  expectedSummarizedCount)
+
+  @staticmethod
+  async def deleteChatHistory(collectionName: str, field: str,
+                              value: str) -> bool:
+    """
+    Delete a chat history document by a specified field and its value.
+
+    Args:
+      collectionName (str): The name of the collection to delete the document from.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      bool: True if the document was deleted, False otherwise.
+    """
+    return await ChatHistoryService.deleteChatHistory(collectionName, field,
+                                                      value)
+
+  @staticmethod
+  def exportChatHistories(collectionName: str) -> AsyncIterator[str]:
+    """
+    Stream every chat history of a collection as NDJSON.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+
+    Returns:
+      AsyncIterator[str]: The NDJSON lines, one batch of sessions at a time.
+    """
+    return ChatHistoryTransferService.exportChatHistories(collectionName)
+
+  @staticmethod
+  async def importChatHistories(collectionName: str,
+                                chunks: AsyncIterable[bytes]) -> dict:
+    """
+    Import NDJSON chat histories into a collection.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      chunks (AsyncIterable[bytes]): The NDJSON input, in chunks of any size.
+
+    Returns:
+      dict: The import statistics (imported, failed and invalid lines,
+       documents per second and the first errors).
+    """
+    return await ChatHistoryTransferService.importChatHistories(
+        collectionName, chunks)
+
+  @staticmethod
+  async def getMessages(collectionName: str,
+                        sessionId: str,
+                        start: int = 0) -> tuple[list[Message], int]:
+    """
+    Read the messages of a session from a given position to the end.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      start (int): Position of the first message to return. Defaults to 0.
+
+    Returns:
+      tuple[list[Message], int]: The messages from `start` on and the total
+       number of messages in the session.
+    """
+    return await MessageListService.getMessages(collectionName, sessionId,
+                                                start)
+
+  @staticmethod
+  async def getMessagePage(
+      collectionName: str,
+      sessionId: str,
+      limit: int | None = None,
+      before: int | None = None,
+      after: int | None = None) -> tuple[list[Message], int, int]:
+    """
+    Read one page of the messages of a session.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      limit (int | None): Maximum number of messages to return.
+      before (int | None): Only return messages before this position.
+      after (int | None): Only return messages after this position.
+
+    Returns:
+      tuple[list[Message], int, int]: The messages of the page, the position of
+       its first message and the total number of messages in the session.
+    """
+    return await MessageListService.getMessagePage(collectionName, sessionId,
+                                                   limit, before, after)
+
+  @staticmethod
+  async def pushMessages(collectionName: str, sessionId: str,
+                         newMessages: list[Message]) -> bool:
+    """
+    Push a list of new messages to the end of a chat session.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      newMessages (list[Message]): The list of messages to be added.
+
+    Returns:
+      bool: True if the messages were successfully pushed, False otherwise.
+    """
+    return await MessageListService.pushMessages(collectionName, sessionId,
+                                                 newMessages)
+
+  @staticmethod
+  async def queueMessages(collectionName: str, sessionId: str,
+                          newMessages: list[Message]) -> bool:
+    """
+    Queue new messages to be pushed to a chat session in the background.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      newMessages (list[Message]): The list of messages to be added.
+
+    Returns:
+      bool: True if the messages were queued, False otherwise.
+    """
+    return await MessageListService.queueMessages(collectionName, sessionId,
+                                                  newMessages)
+
+  @staticmethod
+  async def popMessage(collectionName: str, sessionId: str) -> Message:
+    """
+    Pop the last message from a chat session.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+
+    Returns:
+      Message: The removed message or None if no message was removed.
+    """
+    return await MessageListService.popMessage(collectionName, sessionId)
+
+  @staticmethod
+  async def popMessages(collectionName: str, sessionId: str,
+                        count: int) -> list[Message]:
+    """
+    Pop the last `count` messages from a chat session.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      count (int): The number of messages to pop.
+
+    Returns:
+      list[Message]: The removed messages, oldest first, or None on error.
+    """
+    return await MessageListService.popMessages(collectionName, sessionId,
+                                                count)
+
+  @staticmethod
+  async def truncateMessages(collectionName: str, sessionId: str,
+                             index: int) -> int:
+    """
+    Remove every message of a chat session from position `index` on.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      index (int): Position of the first message to remove.
+
+    Returns:
+      int: The number of messages removed, or None on error.
+    """
+    return await MessageListService.truncateMessages(collectionName, sessionId,
+                                                     index)
+
+  @staticmethod
+  async def replaceLastMessage(collectionName: str, sessionId: str,
+                               newMessage: Message) -> Message:
+    """
+    Replace the last message of a chat session.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      newMessage (Message): The message that replaces the last one.
+
+    Returns:
+      Message: The replaced message or None if the session has no messages.
+    """
+    return await MessageListService.replaceLastMessage(
+        collectionName, sessionId, newMessage)
@@ -4,22 +4,69 @@ File Name: chatHistoryService.py
 Description: This module contains the business logic for managing chat history.
 Author: MathTeixeira
 Date: July 11, 2024
-Version: 1.2.0
+Version: 2.0.0
 License: MIT License
 Contact Information: mathteixeira55
 """
 
 from fastapi.encoders import jsonable_encoder
 import logging
-from core.database import getNoSqlConn
+from core.database import getAsyncNoSqlConn
 from models import ChatHistory
+from schemas import ChatHistoryPageSchema
+from .messageListService import MessageListService
+from .sessionCache import getSessionCache
 
 
 class ChatHistoryService:
   """
   A service class for managing chat history business logic.
+
+  A chat history is stored as a slim session header (ID, name, summary) in
+  `collectionName` plus its messages in bucket documents managed by
+  MessageListService. The methods below assemble and split the two so callers
+  still see a single ChatHistory.
+
+  Session headers are read through the SessionCache, and every write below
+  updates or drops the cached session.
   """
 
+  @staticmethod
+  async def findHeader(collectionName: str, field: str, value: str) -> dict:
+    """
+    Read a session header through the session cache.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      dict: The session header without messages, or None if not found.
+    """
+    cache = getSessionCache()
+    sessionId = value if field == "_id" else await cache.findSessionId(
+        collectionName, field, value)
+    version = None
+    if sessionId is not None:
+      version = await cache.getVersion(collectionName, sessionId)
+      header = await cache.getHeader(collectionName, sessionId, version)
+      # A lookup can outlive a rename of the session
+      if header is not None and header.get(field) == value:
+        return header
+
+    header = await getAsyncNoSqlConn().findDocumentByField(
+        collectionName, field, value)
+    if header is None:
+      return None
+    header.pop("messages", None)
+    if header["_id"] == sessionId:
+      await cache.storeHeader(collectionName, header, version)
+    else:
+      # The version was not read before this read, so only the ID is cached
+      await cache.storeLookup(collectionName, field, value, header["_id"])
+    return header
+
   @staticmethod
   async def createChatHistory(collectionName: str,
                               chatHistory: ChatHistory) -> ChatHistory:
@@ -35,14 +82,83 @@ class ChatHistoryService:
     """
     try:
       chatHistory = jsonable_encoder(chatHistory)
-      createdChatHistory = getNoSqlConn().insertDocument(
+      messages = chatHistory.pop("messages", [])
+      createdChatHistory = await getAsyncNoSqlConn().insertDocument(
           collectionName, chatHistory)
+      if createdChatHistory is None:
+        return None
+      # A new session has no buckets yet, so they are written in one batch
+      if messages:
+        bucketErrors = await getAsyncNoSqlConn().insertDocuments(
+            MessageListService.bucketCollectionName(collectionName),
+            MessageListService.bucketDocuments(createdChatHistory["_id"],
+                                               messages))
+        if bucketErrors != {}:
+          return None
+      createdChatHistory["messages"] = messages
       createdChatHistory = ChatHistory.model_validate(createdChatHistory)
       return createdChatHistory
     except Exception as e:
       logging.error(f"Error creating chat history: {e}")
       return None
 
+  @staticmethod
+  async def createChatHistories(collectionName: str,
+                                chatHistories: list[ChatHistory]) -> list[dict]:
+    """
+    Create several chat history documents in two unordered batches.
+
+    Every session header is inserted with one insert_many, then the message
+    buckets of every created session with another. A session that fails does
+    not stop the others; if its buckets fail, its header is removed again.
+
+    Args:
+      collectionName (str): The name of the collection to insert the documents into.
+      chatHistories (list[ChatHistory]): The chat histories to be inserted.
+
+    Returns:
+      list[dict]: One result per chat history, in order, with its `_id`, a
+       `created` flag and the `error` message of failed ones.
+    """
+    conn = getAsyncNoSqlConn()
+    headers = [jsonable_encoder(chatHistory) for chatHistory in chatHistories]
+    messages = [header.pop("messages", []) for header in headers]
+    results = [{
+        "_id": header["_id"],
+        "created": True,
+        "error": None
+    } for header in headers]
+
+    headerErrors = await conn.insertDocuments(collectionName, headers)
+    if headerErrors is None:
+      headerErrors = dict.fromkeys(range(len(headers)),
+                                   "Failed to insert chat history")
+    for index, error in headerErrors.items():
+      results[index].update(created=False, error=error)
+
+    # Remember which session each bucket belongs to
+    buckets = []
+    owners = []
+    for index, header in enumerate(headers):
+      if results[index]["created"] and messages[index]:
+        sessionBuckets = MessageListService.bucketDocuments(
+            header["_id"], messages[index])
+        buckets.extend(sessionBuckets)
+        owners.extend([index] * len(sessionBuckets))
+    if buckets:
+      bucketErrors = await conn.insertDocuments(
+          MessageListService.bucketCollectionName(collectionName), buckets)
+      if bucketErrors is None:
+        bucketErrors = dict.fromkeys(range(len(buckets)),
+                                     "Failed to insert messages")
+      for bucketIndex, error in bucketErrors.items():
+        index = owners[bucketIndex]
+        if results[index]["created"]:
+          results[index].update(created=False, error=error)
+          await ChatHistoryService.deleteChatHistory(collectionName, "_id",
+                                                     headers[index]["_id"])
+    return results
+
   @staticmethod
   async def getChatHistoryByField(collectionName: str, field: str,
                                   value: str) -> ChatHistory:
@@ -58,14 +174,78 @@ class ChatHistoryService:
       ChatHistory: The retrieved chat history document or None if not found.
     """
     try:
-      chatHistory = getNoSqlConn().findDocumentByField(collectionName, field,
-                                                       value)
+      chatHistory = await ChatHistoryService.findHeader(
+          collectionName, field, value)
+      if chatHistory is None:
+        return None
+      chatHistory["messages"], _ = await MessageListService.getMessages(
+          collectionName, chatHistory["_id"])
       chatHistory = ChatHistory.model_validate(chatHistory)
       return chatHistory
     except Exception as e:
       logging.error(f"Error retrieving chat history by {field}: {e}")
       return None
 
+  @staticmethod
+  async def getChatHistoryPage(collectionName: str,
+                               field: str,
+                               value: str,
+                               limit: int | None = None,
+                               before: int | None = None,
+                               after: int | None = None) -> ChatHistoryPageSchema:
+    """
+    Retrieve a chat history document with one page of its messages.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+      limit (int | None): Maximum number of messages to return.
+      before (int | None): Only return messages before this position.
+      after (int | None): Only return messages after this position.
+
+    Returns:
+      ChatHistoryPageSchema: The chat history with the requested page of
+       messages or None if not found.
+    """
+    try:
+      chatHistory = await ChatHistoryService.findHeader(
+          collectionName, field, value)
+      if chatHistory is None:
+        return None
+      (chatHistory["messages"], chatHistory["offset"],
+       chatHistory["totalMessages"]) = await MessageListService.getMessagePage(
+           collectionName, chatHistory["_id"], limit, before, after)
+      return ChatHistoryPageSchema.model_validate(chatHistory)
+    except Exception as e:
+      logging.error(f"Error retrieving chat history page by {field}: {e}")
+      return None
+
+  @staticmethod
+  async def getSessionHeader(collectionName: str, field: str,
+                             value: str) -> ChatHistory:
+    """
+    Retrieve a chat session without loading its messages.
+
+    Args:
+      collectionName (str): The name of the collection to search in.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      ChatHistory: The session header (with an empty messages list) or None if
+       not found.
+    """
+    try:
+      chatHistory = await ChatHistoryService.findHeader(
+          collectionName, field, value)
+      if chatHistory is None:
+        return None
+      return ChatHistory.model_validate(chatHistory)
+    except Exception as e:
+      logging.error(f"Error retrieving chat session by {field}: {e}")
+      return None
+
   @staticmethod
   async def updateChatHistory(collectionName: str, field: str, value: str,
                               chatHistory: ChatHistory) -> bool:
@@ -83,13 +263,70 @@ class ChatHistoryService:
     """
     try:
       chatHistory = jsonable_encoder(chatHistory)
-      updateResult = getNoSqlConn().updateDocument(collectionName,
-                                                   {field: value}, chatHistory)
-      return updateResult is not None
+      # The session keeps its original ID
+      chatHistory.pop("_id", None)
+      messages = chatHistory.pop("messages", [])
+      header = await getAsyncNoSqlConn().findDocumentByField(
+          collectionName, field, value)
+      if header is None:
+        return False
+      # The cached session is dropped, not patched
+      async with getSessionCache().write(collectionName, header["_id"]):
+        updateResult = await getAsyncNoSqlConn().updateDocument(
+            collectionName, {"_id": header["_id"]}, chatHistory)
+        if updateResult is None:
+          return False
+        # The new message list replaces the stored buckets
+        await MessageListService.deleteMessages(collectionName, header["_id"])
+        if messages:
+          return await MessageListService.pushMessages(
+              collectionName, header["_id"], messages)
+        return True
     except Exception as e:
       logging.error(f"Error updating chat history by {field}: {e}")
       return False
 
+  @staticmethod
+  async def updateSummary(collectionName: str, sessionId: str, summary: str,
+                          summarizedCount: int,
+                          expectedSummarizedCount: int) -> bool:
+    """
+    Store a new rolling summary if nobody updated it in the meantime.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session.
+      summary (str): The new summary.
+      summarizedCount (int): Number of leading messages the summary covers.
+      expectedSummarizedCount (int): The summarizedCount the summary was built
+       from; the update is skipped if the stored value differs.
+
+    Returns:
+      bool: True if the summary was stored, False otherwise.
+    """
+    try:
+      # Sessions created before summaries existed have no summarizedCount
+      expected = ({
+          "$in": [0, None]
+      } if expectedSummarizedCount == 0 else expectedSummarizedCount)
+      async with getSessionCache().write(collectionName, sessionId) as write:
+        updateResult = await getAsyncNoSqlConn().updateDocument(
+            collectionName, {
+                "_id": sessionId,
+                "summarizedCount": expected
+            }, {
+                "summary": summary,
+                "summarizedCount": summarizedCount
+            })
+        if updateResult is None or updateResult.modified_count == 0:
+          return False
+        write.commit(updateHeader=lambda header: header.update(
+            summary=summary, summarizedCount=summarizedCount))
+        return True
+    except Exception as e:
+      logging.error(f"Error updating summary of session {sessionId}: {e}")
+      return False
+
   @staticmethod
   async def deleteChatHistory(collectionName: str, field: str,
                               value: str) -> bool:
@@ -105,9 +342,16 @@ class ChatHistoryService:
       bool: True if the document was deleted, False otherwise.
     """
     try:
-      deleteResult = getNoSqlConn().deleteDocument(collectionName,
-                                                   {field: value})
-      return deleteResult
+      header = await getAsyncNoSqlConn().findDocumentByField(
+          collectionName, field, value)
+      if header is None:
+        return False
+      # The cached session is dropped
+      async with getSessionCache().write(collectionName, header["_id"]):
+        deleteResult = await getAsyncNoSqlConn().deleteDocument(
+            collectionName, {"_id": header["_id"]})
+        await MessageListService.deleteMessages(collectionName, header["_id"])
+        return deleteResult
     except Exception as e:
       logging.error(f"Error deleting chat history by {field}: {e}")
       return False
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: chatHistoryTransferService.py
+Description: This module contains the business logic for exporting and
+ importing whole chat history collections as NDJSON.
+Author: MathTeixeira
+Date: July 25, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import logging
+import time
+from collections import defaultdict
+from typing import AsyncIterable, AsyncIterator
+
+from pydantic import ValidationError
+
+from core.config import ideation
+from core.database import getAsyncNoSqlConn
+from models import ChatHistory
+from .chatHistoryService import ChatHistoryService
+from .messageListService import MessageListService
+
+
+class ChatHistoryTransferService:
+  """
+  A service class for moving whole chat history collections in and out.
+
+  The transfer format is NDJSON: one complete ChatHistory (session header plus
+  all of its messages) per line, so a file can be imported into any
+  collection regardless of its bucket size. Both directions work in batches
+  of TRANSFER_BATCH_SIZE sessions, so memory stays bounded by the batch and
+  not by the size of the collection.
+  """
+
+  @staticmethod
+  async def assembleBatch(collectionName: str, headers: list[dict]) -> str:
+    """
+    Turn a batch of session headers into NDJSON lines.
+
+    The buckets of the whole batch are read with a single query over the
+    `_id` ranges of its sessions, once their queued messages are written.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      headers (list[dict]): The session headers of the batch.
+
+    Returns:
+      str: One NDJSON line per session.
+    """
+    for header in headers:
+      await MessageListService.settle(collectionName, header["_id"])
+    buckets = getAsyncNoSqlConn().database[
+        MessageListService.bucketCollectionName(collectionName)]
+    messages = defaultdict(list)
+    query = {
+        "$or": [
+            MessageListService.bucketRange(header["_id"]) for header in headers
+        ]
+    }
+    async for bucket in buckets.find(query).sort("_id", 1):
+      messages[bucket["sessionId"]].extend(bucket["messages"])
+
+    lines = []
+    for header in headers:
+      # Sessions not migrated yet still embed their messages
+      header["messages"] = header.get("messages", []) + messages[header["_id"]]
+      lines.append(
+          ChatHistory.model_validate(header).model_dump_json(by_alias=True) +
+          "\n")
+    return "".join(lines)
+
+  @staticmethod
+  async def exportChatHistories(
+      collectionName: str,
+      batchSize: int = ideation.TRANSFER_BATCH_SIZE) -> AsyncIterator[str]:
+    """
+    Stream every chat history of a collection as NDJSON.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      batchSize (int): Sessions read per batch. Defaults to the
+       TRANSFER_BATCH_SIZE from ideationConfig.
+
+    Yields:
+      str: The NDJSON lines of one batch of sessions.
+    """
+    headers = getAsyncNoSqlConn().database[collectionName]
+    exported = 0
+    started = time.perf_counter()
+    batch = []
+    async for header in headers.find({}, batch_size=batchSize):
+      batch.append(header)
+      if len(batch) == batchSize:
+        yield await ChatHistoryTransferService.assembleBatch(
+            collectionName, batch)
+        exported += len(batch)
+        batch = []
+    if batch:
+      yield await ChatHistoryTransferService.assembleBatch(
+          collectionName, batch)
+      exported += len(batch)
+
+    seconds = time.perf_counter() - started
+    logging.info(f"Exported {exported} chat histories from '{collectionName}' "
+                 f"in {seconds:.2f}s ({exported / max(seconds, 1e-9):.0f} "
+                 f"documents/s)")
+
+  @staticmethod
+  async def importChatHistories(
+      collectionName: str,
+      chunks: AsyncIterable[bytes],
+      batchSize: int = ideation.TRANSFER_BATCH_SIZE) -> dict:
+    """
+    Import NDJSON chat histories into a collection.
+
+    The input is read chunk by chunk and split into lines; every batch of
+    sessions is written with the unordered bulk inserts of
+    ChatHistoryService.createChatHistories. Sessions whose ID already exists
+    are reported as failed and left untouched.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      chunks (AsyncIterable[bytes]): The NDJSON input, in chunks of any size.
+      batchSize (int): Sessions written per batch. Defaults to the
+       TRANSFER_BATCH_SIZE from ideationConfig.
+
+    Returns:
+      dict: The number of imported, failed and invalid lines, the elapsed
+       seconds, the documents per second and the first errors by line number.
+    """
+    stats = {"imported": 0, "failed": 0, "invalid": 0, "errors": []}
+    started = time.perf_counter()
+    batch = []
+    batchLines = []
+
+    def addError(lineNumber: int, error: str) -> None:
+      if len(stats["errors"]) < ideation.TRANSFER_MAX_ERRORS:
+        stats["errors"].append({"line": lineNumber, "error": error})
+
+    async def flush() -> None:
+      results = await ChatHistoryService.createChatHistories(
+          collectionName, batch)
+      for lineNumber, result in zip(batchLines, results):
+        if result["created"]:
+          stats["imported"] += 1
+        else:
+          stats["failed"] += 1
+          addError(lineNumber, result["error"])
+      batch.clear()
+      batchLines.clear()
+
+    async def addLine(lineNumber: int, line: bytes) -> None:
+      if not line.strip():
+        return
+      try:
+        batch.append(ChatHistory.model_validate_json(line))
+        batchLines.append(lineNumber)
+      except ValidationError as e:
+        stats["invalid"] += 1
+        addError(lineNumber, str(e))
+      if len(batch) == batchSize:
+        await flush()
+
+    lineNumber = 0
+    pending = b""
+    async for chunk in chunks:
+      *lines, pending = (pending + chunk).split(b"\n")
+      for line in lines:
+        lineNumber += 1
+        await addLine(lineNumber, line)
+    await addLine(lineNumber + 1, pending)
+    if batch:
+      await flush()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["documentsPerSecond"] = round(
+        stats["imported"] / max(stats["seconds"], 1e-3), 1)
+    logging.info(f"Imported {stats['imported']} chat histories into "
+                 f"'{collectionName}' ({stats['documentsPerSecond']} "
+                 f"documents/s)")
+    return stats
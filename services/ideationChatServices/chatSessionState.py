@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: chatSessionState.py
+Description: This module provides the ChatSessionState class, the state of a
+ chat session kept in memory between the turns of a connection.
+Author: MathTeixeira
+Date: July 30, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+from langchain_community.chat_message_histories import ChatMessageHistory
+
+from models import ChatHistory
+
+
+class ChatSessionState:
+  """
+  The loaded state of a chat session.
+
+  A POST turn loads it and drops it at the end; a WebSocket connection keeps
+  it for its lifetime, so each turn only writes its new messages instead of
+  reloading the history.
+
+  Attributes:
+    fieldValue (str): The value of the field that identifies the session.
+    session (ChatHistory | None): The session header, None if it could not be
+     loaded.
+    chatHistory (ChatMessageHistory): The messages sent to the model with the
+     next input (the unsummarized ones in 'summary' memory mode).
+    messageCount (int): Total number of messages in the session.
+    stale (bool): Whether the state must be reloaded before the next turn,
+     because a summary update is folding its messages.
+    partialResponse (str | None): The text of the last AI answer if it was
+     interrupted while being generated, None otherwise.
+  """
+
+  def __init__(self,
+               fieldValue: str,
+               session: ChatHistory | None,
+               chatHistory: ChatMessageHistory,
+               messageCount: int,
+               partialResponse: str | None = None) -> None:
+    """
+    Initialize the ChatSessionState instance.
+
+    Args:
+      fieldValue (str): The value of the field that identifies the session.
+      session (ChatHistory | None): The session header.
+      chatHistory (ChatMessageHistory): The messages sent to the model.
+      messageCount (int): Total number of messages in the session.
+      partialResponse (str, optional): The text of the last AI answer if it
+       is incomplete.
+    """
+    self.fieldValue: str = fieldValue
+    self.session: ChatHistory | None = session
+    self.chatHistory: ChatMessageHistory = chatHistory
+    self.messageCount: int = messageCount
+    self.stale: bool = False
+    self.partialResponse: str | None = partialResponse
+
+  @property
+  def sessionId(self) -> str | None:
+    """
+    Get the ID of the session.
+
+    Returns:
+      str | None: The session ID, None if the session could not be loaded.
+    """
+    return self.session.id if self.session else None
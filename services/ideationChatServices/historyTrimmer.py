@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: historyTrimmer.py
+Description: This module provides the HistoryTrimmer class, which fits the chat
+ history sent to the model into a token budget.
+Author: MathTeixeira
+Date: July 23, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+from typing import Callable
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from core.config import ideation
+
+
+def approximateTokenCounter(message: BaseMessage) -> int:
+  """
+  Estimate the number of tokens of a message without a tokenizer.
+
+  Uses the usual ~4 characters per token ratio plus a small per-message
+  overhead for the role markers.
+
+  Args:
+    message (BaseMessage): The message to measure.
+
+  Returns:
+    int: The estimated number of tokens.
+  """
+  return len(str(message.content)) // 4 + 4
+
+
+class HistoryTrimmer:
+  """
+  Trims a chat history to a token budget before it is sent to the model.
+
+  Leading system messages are always kept. The newest message (the user's
+  current input) is always kept, even when it alone exceeds the budget. Kept
+  history always starts with a human message so roles keep alternating.
+
+  Strategies:
+    'last': keep the most recent messages that fit in the budget.
+    'keepFirst': always keep the first turn (first human message and the AI
+     reply to it), then fill the rest of the budget with the most recent
+     messages.
+
+  Attributes:
+    tokenBudget (int): Maximum number of history tokens to send.
+    strategy (str): The trimming strategy, 'last' or 'keepFirst'.
+    tokenCounter (Callable[[BaseMessage], int]): Counts the tokens of a message.
+  """
+
+  STRATEGIES: tuple[str, ...] = ('last', 'keepFirst')
+
+  def __init__(self,
+               tokenBudget: int = ideation.TRIM_SIZE,
+               strategy: str = ideation.TRIM_STRATEGY,
+               tokenCounter: Callable[[BaseMessage],
+                                      int] = approximateTokenCounter) -> None:
+    """
+    Initialize the HistoryTrimmer instance.
+
+    Args:
+      tokenBudget (int): Maximum number of history tokens to send. Defaults to
+       the TRIM_SIZE from ideationConfig.
+      strategy (str): The trimming strategy. Defaults to the TRIM_STRATEGY from
+       ideationConfig.
+      tokenCounter (Callable[[BaseMessage], int]): Counts the tokens of a
+       message. Defaults to approximateTokenCounter.
+
+    Raises:
+      ValueError: If the strategy is unknown.
+    """
+    if strategy not in self.STRATEGIES:
+      raise ValueError(f"Unknown trim strategy '{strategy}'")
+    self.tokenBudget: int = tokenBudget
+    self.strategy: str = strategy
+    self.tokenCounter: Callable[[BaseMessage], int] = tokenCounter
+
+  def trim(self,
+           messages: list[BaseMessage]) -> tuple[list[BaseMessage], dict]:
+    """
+    Trim a list of messages to the token budget.
+
+    Args:
+      messages (list[BaseMessage]): The full chat history, newest message last.
+
+    Returns:
+      tuple[list[BaseMessage], dict]: The kept messages, in order, and the trim
+       statistics (kept/dropped messages and tokens).
+    """
+    counts = [self.tokenCounter(message) for message in messages]
+
+    # Pinned: leading system messages and, for 'keepFirst', the first turn
+    pinned = 0
+    while pinned < len(messages) and isinstance(messages[pinned],
+                                                SystemMessage):
+      pinned += 1
+    if self.strategy == 'keepFirst' and pinned < len(messages) - 1:
+      pinned = min(pinned + 2, len(messages) - 1)
+
+    budget = self.tokenBudget - sum(counts[:pinned])
+
+    # Walk back from the newest message; the newest one is always kept
+    start = len(messages)
+    while start > pinned:
+      if start < len(messages) and counts[start - 1] > budget:
+        break
+      budget -= counts[start - 1]
+      start -= 1
+    # The kept tail must open with a human message
+    while start < len(messages) - 1 and not isinstance(
+        messages[start], HumanMessage):
+      start += 1
+
+    kept = messages[:pinned] + messages[start:]
+    keptTokens = sum(counts[:pinned]) + sum(counts[start:])
+    stats = {
+        "keptMessages": len(kept),
+        "droppedMessages": len(messages) - len(kept),
+        "keptTokens": keptTokens,
+        "droppedTokens": sum(counts) - keptTokens,
+    }
+    return kept, stats
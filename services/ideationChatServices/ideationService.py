@@ -11,18 +11,27 @@ Contact Information: mathteixeira55
 """
 
 ### imports ###
+import asyncio
+import logging
 from time import time
-from fastapi.encoders import jsonable_encoder
-from httpx import AsyncClient, Response
 from langchain_aws import ChatBedrock
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import (AIMessage, BaseMessage, HumanMessage,
+                                     SystemMessage)
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import boto3
 
 from core.config import ideation
 from core.config import aws
-from models import Message
+from core.config import llm
+from core.llm import (AdmissionSlot, RoutingDecision, getModelRouter,
+                      getResilienceController)
+from models import ChatHistory, Message
+from .chatHistoryRepository import ChatHistoryRepository
+from .chatSessionState import ChatSessionState
+from .historyTrimmer import HistoryTrimmer, approximateTokenCounter
+from .responseCheckpointer import ResponseCheckpointer
+from .sessionSummarizer import SessionSummarizer
 
 
 class IdeationService:
@@ -35,10 +44,30 @@ class IdeationService:
     Attributes:
         client (boto3.client): AWS Bedrock client.
         model (ChatBedrock): LangChain chat model for AWS Bedrock.
+        modelId (str): ID of the default model, used when no routing rule
+         matches.
+        modelKwargs (dict): Output token limit and temperature of every model.
+        chains (dict[str, Runnable]): The chain of each routed model ID.
         prompt (ChatPromptTemplate): Template for structuring chat prompts.
         chain (Runnable): LangChain runnable chain for processing chat messages.
-        asyncHttpClient (AsyncClient): Async HTTP client for database interactions.
-        CHATHISTORY_DB_URL (str): URL for the chat history database.
+        CHATHISTORY_COLLECTION_NAME (str): Name of the chat history collection.
+        CHATHISTORY_SEARCH_FIELD (str): Field that identifies a chat session.
+        trimmer (HistoryTrimmer): Fits the history sent to the model into a token budget.
+        trimStats (dict): Messages and tokens dropped by trimming, summed over requests.
+        MEMORY_MODE (str): 'window' or 'summary' (rolling summary plus recent turns).
+        HISTORY_WINDOW_MESSAGES (int): Most recent messages read for the 'last'
+         strategy in 'window' mode.
+        summarizer (SessionSummarizer): Keeps the rolling summaries in 'summary' mode.
+        activeStreams (int): Number of chat streams currently in flight.
+        totalStreams (int): Number of chat streams started by this instance.
+        socketStats (dict): WebSocket connections opened and open, and the
+         turns they ran.
+        checkpointStats (dict): Partial answers saved, answers completed over
+         a checkpoint, answers saved after their client left, answers
+         continued and failed checkpoint writes.
+
+    A single instance is meant to be shared by every request of a worker (see
+    ServiceRegistry); it holds no per-request state.
     """
 
   def __init__(
@@ -48,10 +77,14 @@ class IdeationService:
       MODEL: str = ideation.MODEL,
       MAX_TOKENS: int = ideation.MAX_TOKENS,
       TEMPERATURE: int = ideation.TEMPERATURE,
-      CHATHISTORY_DB_URL: str = ideation.CHATHISTORY_DB_URL,
+      TRIM_SIZE: int = ideation.TRIM_SIZE,
+      TRIM_STRATEGY: str = ideation.TRIM_STRATEGY,
+      MEMORY_MODE: str = ideation.MEMORY_MODE,
+      HISTORY_WINDOW_MESSAGES: int = ideation.HISTORY_WINDOW_MESSAGES,
       CHATHISTORY_COLLECTION_NAME: str = ideation.CHATHISTORY_COLLECTION_NAME,
       CHATHISTORY_SEARCH_FIELD: str = ideation.CHATHISTORY_SEARCH_FIELD,
-      MESSAGE_LIST_URL: str = ideation.MESSAGE_LIST_URL):
+      client=None,
+      tokenCounter=None):
     """
     Initialize the IdeationService with configuration parameters.
 
@@ -61,12 +94,19 @@ class IdeationService:
         MODEL (str): ID of the model to use.
         MAX_TOKENS (int): Maximum number of tokens for model output.
         TEMPERATURE (int): Temperature setting for model output.
-        CHATHISTORY_DB_URL (str): URL for the chat history database.
+        TRIM_SIZE (int): Token budget of the history sent to the model.
+        TRIM_STRATEGY (str): Trimming strategy, 'last' or 'keepFirst'.
+        MEMORY_MODE (str): 'window' or 'summary'.
+        HISTORY_WINDOW_MESSAGES (int): Most recent messages read for the 'last'
+         strategy in 'window' mode.
         CHATHISTORY_COLLECTION_NAME (str): Name of the chat history collection.
         CHATHISTORY_SEARCH_FIELD (str): Field to search for chat history.
-        MESSAGE_LIST_URL (str): URL for the message list operations.
+        client (boto3.client, optional): A shared Bedrock client. A new one is
+         created when not provided.
+        tokenCounter (Callable[[BaseMessage], int], optional): Counts the tokens
+         of a message for trimming. Defaults to a character-based estimate.
     """
-    self.client = boto3.client(
+    self.client = client or boto3.client(
         service_name=AWS_SERVICE_NAME,
         region_name=AWS_REGION,
         aws_access_key_id=aws.AWS_ACCESS_KEY_ID,
@@ -78,10 +118,17 @@ class IdeationService:
                                  'max_tokens': MAX_TOKENS,
                                  'temperature': TEMPERATURE
                              })
+    self.modelId: str = MODEL
+    self.modelKwargs: dict = {
+        'max_tokens': MAX_TOKENS,
+        'temperature': TEMPERATURE
+    }
     self.prompt = ChatPromptTemplate.from_messages([
-        SystemMessage(
-            content=
+        (
+            "system",
+            # {summary} is empty unless MEMORY_MODE is 'summary'
             'Answer to the best of your ability. Use Markdown for formating.'
+            '{summary}'
             # """You should answer in {language}.
             # Your task is act as an advisor and moderator, and guide the user through the process of generating ideas for a new business or project.
             # You can ask questions, give suggestions, and provide feedback.
@@ -101,99 +148,282 @@ class IdeationService:
     ])
 
     self.chain = self.prompt | self.model
-    # Initialize HTTP client for interacting with the chat history database
-    # It must be closed when the service is done
-    # It must be asynchroneous to avoid interlocking the main event loop
-    # For example, the engoing chat POST request
-    self.asyncHttpClient: AsyncClient = AsyncClient()
-    self.CHATHISTORY_DB_URL = CHATHISTORY_DB_URL
+    self.chains: dict = {MODEL: self.chain}
+    # Chat history is read and written in-process through the repository,
+    # not by calling this same server over HTTP
     self.CHATHISTORY_COLLECTION_NAME = CHATHISTORY_COLLECTION_NAME
     self.CHATHISTORY_SEARCH_FIELD = CHATHISTORY_SEARCH_FIELD
-    self.MESSAGE_LIST_URL = MESSAGE_LIST_URL
+    self.trimmer = HistoryTrimmer(TRIM_SIZE, TRIM_STRATEGY, tokenCounter or
+                                  approximateTokenCounter)
+    self.trimStats: dict = {
+        "requests": 0,
+        "droppedMessages": 0,
+        "droppedTokens": 0
+    }
+    self.MEMORY_MODE = MEMORY_MODE
+    self.HISTORY_WINDOW_MESSAGES = HISTORY_WINDOW_MESSAGES
+    self.summarizer = SessionSummarizer(self.model, MODEL)
+    self.activeStreams: int = 0
+    self.totalStreams: int = 0
+    self.socketStats: dict = {"connections": 0, "open": 0, "turns": 0}
+    self.checkpointStats: dict = {
+        "checkpoints": 0,
+        "completed": 0,
+        "interrupted": 0,
+        "continued": 0,
+        "failures": 0
+    }
+
+  async def loadSession(
+      self, fieldValue: str) -> tuple[ChatHistory | None, list[Message], int]:
+    """
+    Load a chat session and the messages the prompt needs.
+
+    The session is created when it does not exist yet. In 'summary' memory
+    mode, only the messages not covered by the summary are read. In 'window'
+    mode with the 'last' strategy, only the HISTORY_WINDOW_MESSAGES most recent
+    messages are read, since trimming would drop the older ones anyway.
+
+    Args:
+        fieldValue (str): The value of the field to search for.
+
+    Returns:
+        tuple[ChatHistory | None, list[Message], int]: The session header (None
+         if it could not be loaded), the messages to send to the model and the
+         total number of messages in the session.
+    """
+    try:
+      session = await ChatHistoryRepository.getOrCreateSession(
+          self.CHATHISTORY_COLLECTION_NAME, self.CHATHISTORY_SEARCH_FIELD,
+          fieldValue)
+      if session is None:
+        return None, [], 0
+      if self.MEMORY_MODE == "window" and self.trimmer.strategy == "last":
+        messages, _, messageCount = await ChatHistoryRepository.getMessagePage(
+            self.CHATHISTORY_COLLECTION_NAME, session.id,
+            self.HISTORY_WINDOW_MESSAGES)
+        return session, messages, messageCount
+      # Summarized messages are replaced by their summary in the prompt
+      start = session.summarizedCount if self.MEMORY_MODE == "summary" else 0
+      messages, messageCount = await ChatHistoryRepository.getMessages(
+          self.CHATHISTORY_COLLECTION_NAME, session.id, start)
+      return session, messages, messageCount
+    except Exception as e:
+      print(f"Error getting chat history: {str(e)}")
+      return None, [], 0
+
+  @staticmethod
+  def summaryPrompt(summary: str) -> str:
+    """
+    Format a session summary for the {summary} slot of the system prompt.
+
+    Args:
+        summary (str): The running summary of the session.
+
+    Returns:
+        str: The text appended to the system prompt, empty without a summary.
+    """
+    if not summary:
+      return ""
+    return "\n\nSummary of the earlier conversation:\n" + summary
+
+  @staticmethod
+  def toMessageHistory(messages: list[Message]) -> ChatMessageHistory:
+    """
+    Convert stored messages into a LangChain chat history.
+
+    Args:
+        messages (list[Message]): The stored messages.
+
+    Returns:
+        ChatMessageHistory: The equivalent LangChain chat history.
+    """
+    chatHistory: ChatMessageHistory = ChatMessageHistory()
+    for msg in messages:
+      if msg.type == "ai":
+        chatHistory.add_message(AIMessage(content=msg.content))
+      else:
+        chatHistory.add_message(HumanMessage(content=msg.content))
+    return chatHistory
 
   async def getSessionHistory(
       self, fieldValue: str) -> tuple[ChatMessageHistory, str]:
     """
     Retrieve the chat history for a given session from the database.
 
+    The session is created when it does not exist yet.
+
     Args:
         fieldValue (str): The value of the field to search for.
 
     Returns:
-        ChatMessageHistory: The chat history for the specified session.
-
-    Raises:
-        Exception: If there's an error retrieving the chat history.
+        tuple[ChatMessageHistory, str]: The chat history for the specified
+         session and the session ID (None if the session could not be loaded).
     """
-    try:
-      # Retrieve chat history from database
-      # before = time()
-      response: Response = await self.asyncHttpClient.get(
-          f"{self.CHATHISTORY_DB_URL}/{self.CHATHISTORY_COLLECTION_NAME}/{self.CHATHISTORY_SEARCH_FIELD}/{fieldValue}",
-          timeout=10)
-      # after = time()
-      # print(f"Time to get chat history: {after - before}")
-
-      # Check if response is successful
-      response.raise_for_status()
-
-      # Parse response (expected to be JSON with message and code keys)
-      data: dict = response.json()
-      result: dict = data["message"]
-
-      chatHistory: ChatMessageHistory = ChatMessageHistory()
-      if isinstance(result, dict) and "messages" in result:
-        for msg in result["messages"]:
-          if msg["type"] == "ai":
-            chatHistory.add_message(AIMessage(content=msg["content"]))
-          else:
-            chatHistory.add_message(HumanMessage(content=msg["content"]))
-      else:
-        print(f"Unexpected response format: {data}")
-        print(f"Returning empty chat history.")
-
-      return chatHistory, result["_id"]
-    except Exception as e:
-      print(f"Error getting chat history: {str(e)}")
+    session, messages, _ = await self.loadSession(fieldValue)
+    if session is None:
       print(f"Returning empty chat history.")
-      # Return empty history on error
-      return ChatMessageHistory()
+      return ChatMessageHistory(), None
+    return self.toMessageHistory(messages), session.id
 
   async def messageOperation(self, sessionID: str, operation: str,
                              newMessages: list[Message] | None) -> bool:
     """
-    Push a new message to the chat history for a given session in the database.
+    Run a message list operation (push, queue or pop) on a chat session.
 
     Args:
         sessionID (str): The ID of the chat session to update.
-        newMessages (list[Message]): The new message to be added.
+        operation (str): The operation to run: "push", "queue" (push from the
+         background write queue) or "pop".
+        newMessages (list[Message]): The new messages to be added on push or
+         queue.
 
     Returns:
-        ChatMessageHistory: The updated chat history for the specified session.
+        bool: True if the operation succeeded, False otherwise.
 
     Raises:
         Exception: If there's an error updating the chat history.
     """
     try:
-      # Do the required operation (push or pop) on the chat history
-      payload = jsonable_encoder(newMessages) if newMessages else None
-      response: Response = await self.asyncHttpClient.post(
-          f"{self.MESSAGE_LIST_URL}/{operation}/{self.CHATHISTORY_COLLECTION_NAME}/{sessionID}",
-          json=payload,
-          timeout=10)
-
-      # Check if response is successful
-      response.raise_for_status()
-
-      return True
+      if sessionID is None:
+        return False
+      if operation == "push":
+        return await ChatHistoryRepository.pushMessages(
+            self.CHATHISTORY_COLLECTION_NAME, sessionID, newMessages)
+      if operation == "queue":
+        return await ChatHistoryRepository.queueMessages(
+            self.CHATHISTORY_COLLECTION_NAME, sessionID, newMessages)
+      if operation == "pop":
+        return await ChatHistoryRepository.popMessage(
+            self.CHATHISTORY_COLLECTION_NAME, sessionID) is not None
+      raise ValueError(f"Unknown message operation '{operation}'")
     except Exception as e:
       print(f"Error updating chat history: {str(e)}")
       return False
 
+  def getChain(self, modelId: str):
+    """
+    Get the chat chain of a model, building it on first use.
+
+    Args:
+        modelId (str): The model ID.
+
+    Returns:
+        Runnable: The `prompt | model` chain of the model.
+    """
+    if modelId not in self.chains:
+      self.chains[modelId] = self.prompt | ChatBedrock(
+          model_id=modelId, client=self.client, model_kwargs=self.modelKwargs)
+    return self.chains[modelId]
+
+  def buildPrompt(
+      self,
+      state: ChatSessionState,
+      inputMessage: str,
+      continueResponse: bool = False) -> tuple[list[BaseMessage], dict, str]:
+    """
+    Build the history and the summary a turn sends to the model.
+
+    Args:
+        state (ChatSessionState): The loaded session.
+        inputMessage (str): The user's input message.
+        continueResponse (bool, optional): Continue the interrupted answer
+         that ends the session instead of answering `inputMessage`.
+
+    Returns:
+        tuple[list[BaseMessage], dict, str]: The history trimmed to the token
+         budget, the trimming stats and the summary for the system prompt.
+    """
+    summary = ""
+    if state.session and self.MEMORY_MODE == "summary":
+      summary = self.summaryPrompt(state.session.summary)
+    if continueResponse and state.partialResponse is not None:
+      # The model resumes its own last message, which must not end with
+      # whitespace
+      history = state.chatHistory.messages[:-1] + [
+          AIMessage(content=state.partialResponse.rstrip())
+      ]
+    else:
+      history = state.chatHistory.messages + [
+          HumanMessage(content=inputMessage)
+      ]
+    messages, trimStats = self.trimmer.trim(history)
+    return messages, trimStats, summary
+
+  def routeChat(self,
+                state: ChatSessionState,
+                inputMessage: str,
+                tier: str | None = None,
+                continueResponse: bool = False) -> RoutingDecision:
+    """
+    Pick the model of a chat turn.
+
+    The prompt size is that of the trimmed history the turn sends, the new
+    message included, plus the summary in 'summary' memory mode.
+
+    Args:
+        state (ChatSessionState): The loaded session.
+        inputMessage (str): The user's input message.
+        tier (str, optional): The user tier. Defaults to the DEFAULT_TIER
+         from llmConfig.
+        continueResponse (bool, optional): Whether the turn continues the
+         interrupted last answer.
+
+    Returns:
+        RoutingDecision: The picked model and the request ID.
+    """
+    _, trimStats, summary = self.buildPrompt(state, inputMessage,
+                                             continueResponse)
+    promptTokens = trimStats["keptTokens"]
+    if summary:
+      promptTokens += self.trimmer.tokenCounter(SystemMessage(content=summary))
+    return getModelRouter().route("ideation", self.modelId, promptTokens, tier)
+
+  async def admit(self, modelId: str | None = None) -> AdmissionSlot:
+    """
+    Get a slot to call the chat model, at interactive priority.
+
+    Args:
+        modelId (str, optional): The model to call. Defaults to the default
+         model.
+
+    Returns:
+        AdmissionSlot: The granted slot.
+
+    Raises:
+        AdmissionRejected: If the model is overloaded or its circuit is open.
+    """
+    return await getResilienceController().admit(modelId or self.modelId,
+                                                 llm.PRIORITY_INTERACTIVE)
+
+  async def openSession(self, fieldValue: str = "Test") -> ChatSessionState:
+    """
+    Load the state of a chat session, creating the session if needed.
+
+    Args:
+        fieldValue (str, optional): The value of the field to search for.
+         Defaults to "Test", the session of `runChat`.
+
+    Returns:
+        ChatSessionState: The loaded state. Its session is None if the session
+         could not be loaded.
+    """
+    session, messages, messageCount = await self.loadSession(fieldValue)
+    partialResponse = None
+    if messages and messages[-1].type == "ai" and not messages[-1].complete:
+      partialResponse = messages[-1].content
+    return ChatSessionState(fieldValue, session,
+                            self.toMessageHistory(messages), messageCount,
+                            partialResponse)
+
   async def runChat(self,
                     inputMessage: str,
                     language: str = "English",
-                    fieldValue: str = "Test"):
+                    fieldValue: str = "Test",
+                    slot: AdmissionSlot | None = None,
+                    decision: RoutingDecision | None = None,
+                    continueResponse: bool = False,
+                    state: ChatSessionState | None = None):
     """
     Run a chat session with the given input message.
 
@@ -201,6 +431,16 @@ class IdeationService:
         inputMessage (str): The user's input message.
         language (str, optional): The language to use for the response. Defaults to "English".
         fieldValue (str, optional): The value of the field that will identify the session. Defaults to "Test".
+        slot (AdmissionSlot, optional): A slot already granted by `admit`.
+         One is acquired before the model call when not provided. The slot
+         is released as soon as the model stream ends.
+        decision (RoutingDecision, optional): The model picked by `routeChat`.
+         The default model is used when not provided.
+        continueResponse (bool, optional): Continue the interrupted answer
+         that ends the session instead of answering `inputMessage`.
+        state (ChatSessionState, optional): The session, already loaded by
+         `openSession` to route the turn. Loaded from `fieldValue` when not
+         provided.
 
     Yields:
         str: Chunks of the AI's response.
@@ -209,37 +449,151 @@ class IdeationService:
         Exception: If there's an error during the chat process.
     """
     # Get chat history from database
-    # print("Getting chat history...")
-    # before = time()
-    chatHistory: ChatMessageHistory
-    chatId: str
-    chatHistory, chatId = await self.getSessionHistory(fieldValue)
-    # after = time()
-    # print(f"Time to get chat history: {after - before}")
+    if state is None:
+      state = await self.openSession(fieldValue)
+    async for content in self.runTurn(state, inputMessage, language, slot,
+                                      decision, continueResponse):
+      yield content
+
+  async def runTurn(self,
+                    state: ChatSessionState,
+                    inputMessage: str,
+                    language: str = "English",
+                    slot: AdmissionSlot | None = None,
+                    decision: RoutingDecision | None = None,
+                    continueResponse: bool = False):
+    """
+    Run one chat turn on a loaded session.
+
+    Only the two new messages are written to the database, by the background
+    write queue, so the response ends without waiting for the database; the
+    next read of the session waits for them. Once they are queued, they are
+    also added to the state, so a caller holding the state (see the WebSocket
+    endpoint) can run the next turn without reloading it.
+
+    A long answer is checkpointed while it is generated (see
+    ResponseCheckpointer): the turn is saved with a partial answer every
+    CHECKPOINT_TOKENS tokens or CHECKPOINT_SECONDS seconds, then with the
+    complete one. If the stream is closed or cancelled before the end (the
+    client left), the model call is cancelled and the answer generated so
+    far is saved as incomplete. With `continueResponse`, the interrupted
+    answer that ends the session is sent back to the model as the start of
+    its reply, and only the rest is generated and streamed.
+
+    Args:
+        state (ChatSessionState): The state of the session, from `openSession`.
+        inputMessage (str): The user's input message.
+        language (str, optional): The language to use for the response. Defaults to "English".
+        slot (AdmissionSlot, optional): A slot already granted by `admit`.
+         One is acquired before the model call when not provided. The slot
+         is released as soon as the model stream ends.
+        decision (RoutingDecision, optional): The model picked by `routeChat`.
+         The default model is used when not provided.
+        continueResponse (bool, optional): Continue the interrupted answer
+         that ends the session instead of answering `inputMessage`.
+
+    Yields:
+        str: Chunks of the AI's response.
+
+    Raises:
+        ValueError: If `continueResponse` is set and the last answer of the
+         session is complete.
+        Exception: If there's an error during the chat process.
+    """
+    if continueResponse and state.partialResponse is None:
+      raise ValueError("The last answer of the session is complete; there "
+                       "is nothing to continue")
+    session: ChatHistory | None = state.session
+    chatId: str | None = state.sessionId
+    messageCount: int = state.messageCount
 
     # Add user new input to the chat history (in Memory)
     # print("Adding user input to chat history...")
     # before = time()
-    chatHistory.add_message(HumanMessage(content=inputMessage))
+    humanMessage = HumanMessage(content=inputMessage)
     # after = time()
     # print(f"Time to add user input to chat history: {after - before}")
-
-    # Input dict with all messages
+    partialResponse = (state.partialResponse.rstrip()
+                       if continueResponse else "")
+
+    # Trim the history to the token budget before sending it to the model
+    messages, trimStats, summary = self.buildPrompt(state, inputMessage,
+                                                    continueResponse)
+    self.trimStats["requests"] += 1
+    self.trimStats["droppedMessages"] += trimStats["droppedMessages"]
+    self.trimStats["droppedTokens"] += trimStats["droppedTokens"]
+    logging.info(
+        f"Session '{state.fieldValue}': {len(state.chatHistory.messages)} of {messageCount} "
+        f"stored messages not summarized; dropped {trimStats['droppedMessages']} messages "
+        f"({trimStats['droppedTokens']} tokens), kept "
+        f"{trimStats['keptMessages']} ({trimStats['keptTokens']} tokens)")
+
+    # Input dict with the kept messages
     # print("Creating input dict...")
     # before = time()
-    inputDict = {"messages": chatHistory.messages, "language": language}
+    inputDict = {
+        "messages": messages,
+        "language": language,
+        "summary": summary
+    }
     # after = time()
     # print(f"Time to create input dict: {after - before}")
     # print("Input Dict: \n", inputDict)
 
     # return the response, using plain text, in a streaming fashion
-    full_response = ""
+    full_response = partialResponse
+    checkpointer = ResponseCheckpointer(
+        self.CHATHISTORY_COLLECTION_NAME,
+        chatId,
+        None if continueResponse else inputMessage,
+        partialResponse,
+        stats=self.checkpointStats)
     # print("executing chain...")
     # before = time()
-    async for chunk in self.chain.astream(inputDict):
-      full_response += chunk.content
-      yield chunk.content
-      # print("Chunk (repr): ", repr(chunk.content))
+    modelId = decision.modelId if decision else self.modelId
+    chain = self.getChain(modelId)
+    if slot is None:
+      slot = await self.admit(modelId)
+    self.activeStreams += 1
+    self.totalStreams += 1
+    streamed = False
+    interrupted = False
+    # Retried while throttled, until the first chunk only
+    modelStream = getResilienceController().stream(
+        modelId,
+        lambda: chain.astream(inputDict),
+        # About four characters per token
+        countTokens=lambda chunk: len(chunk.content) / 4,
+        requestId=decision.requestId if decision else None)
+    try:
+      async for chunk in modelStream:
+        full_response += chunk.content
+        checkpointer.update(full_response)
+        yield chunk.content
+        # print("Chunk (repr): ", repr(chunk.content))
+      streamed = True
+    except (GeneratorExit, asyncio.CancelledError):
+      interrupted = True
+      raise
+    finally:
+      # The slot only covers the model call, not the write below
+      slot.release()
+      self.activeStreams -= 1
+      # Cancels the model call if it is still running
+      await modelStream.aclose()
+      if interrupted:
+        # The saved turn no longer matches the state
+        state.stale = True
+        # The client left: keep what it was sent, shielded from a repeated
+        # cancellation of the request
+        await asyncio.shield(
+            asyncio.ensure_future(checkpointer.interrupt(full_response)))
+      else:
+        # A failed answer keeps its last checkpoint
+        await checkpointer.settle()
+        if not streamed and checkpointer.saved:
+          # The saved turn no longer matches the state
+          state.stale = True
     # after = time()
     # print("time to execute chain: ", after - before)
     # print(f"Generated chunk: {repr(full_response)}")
@@ -249,17 +603,30 @@ class IdeationService:
     ]
     # print("Pushing new content to chat history...")
     # before = time()
-    newContentSaved: bool = await self.messageOperation(chatId, "push", messagesToPush)
+    if checkpointer.saved:
+      # The turn is saved already; its answer is completed in place
+      newContentSaved = await checkpointer.finish(full_response)
+    else:
+      newContentSaved: bool = await self.messageOperation(chatId, "queue", messagesToPush)
     # after = time()
     # print(f"Time to push new content to chat history: {after - before}")
     if not newContentSaved:
       print("Failed to save new content to chat history.")
-
-  async def close(self):
-    """
-    Close the async HTTP client.
-
-    This method should be called when the IdeationService is no longer needed
-    to ensure proper cleanup of resources.
-    """
-    await self.asyncHttpClient.aclose()
+      return
+    if continueResponse:
+      self.checkpointStats["continued"] += 1
+      state.chatHistory.messages[-1] = AIMessage(content=full_response)
+      state.partialResponse = None
+      return
+    state.chatHistory.add_messages(
+        [humanMessage, AIMessage(content=full_response)])
+    state.messageCount += len(messagesToPush)
+    if self.MEMORY_MODE == "window" and self.trimmer.strategy == "last":
+      # Same window loadSession would read
+      state.chatHistory.messages = (
+          state.chatHistory.messages[-self.HISTORY_WINDOW_MESSAGES:])
+    if self.MEMORY_MODE == "summary" and self.summarizer.isDue(
+        messageCount + len(messagesToPush), session.summarizedCount):
+      # Runs in the background, after the response has been streamed
+      self.summarizer.schedule(self.CHATHISTORY_COLLECTION_NAME, chatId)
+      state.stale = True
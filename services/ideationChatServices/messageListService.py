@@ -4,27 +4,388 @@ File Name: messageListService.py
 Description: This module contains the business logic for managing messages in a FILO (stack) style.
 Author: MathTeixeira
 Date: July 11, 2024
-Version: 1.0.0
+Version: 2.0.0
 License: MIT License
 Contact Information: mathteixeira55
 """
 
+from contextlib import AsyncExitStack
 from fastapi.encoders import jsonable_encoder
 import logging
-from core.database import getNoSqlConn
+import uuid
+from pymongo import InsertOne, ReturnDocument, UpdateOne, errors
+from core.config import ideation
+from core.database import WriteBehindQueue, getAsyncNoSqlConn
 from models import Message
+from .sessionCache import getSessionCache
 
 
 class MessageListService:
   """
   A service class for managing messages in a chat session.
+
+  Messages are not embedded in the session document. They are stored in
+  fixed-size bucket documents in the `<collectionName><MESSAGE_BUCKET_SUFFIX>`
+  collection:
+
+    {"_id": "<sessionId>:<index>", "sessionId": str, "index": int,
+     "count": int, "messages": [Message, ...], "writeId": str}
+
+  (`writeId` is only set by batched writes, see `pushMessageBatch`.)
+
+  The zero-padded index in `_id` keeps the buckets of a session contiguous and
+  ordered in the default `_id` index, so every bucket query is an index range
+  scan. Appends go to the tail bucket; a new bucket is opened when it is full.
+  The messages of a session are the concatenation of its buckets by index.
+
+  Chat turns can be queued instead of pushed inline (`queueMessages`): a
+  background WriteBehindQueue per collection writes the queued turns of many
+  sessions in one bulk_write. Every read or write of a session first waits
+  for its queued turns, so a session always sees its own writes.
+
+  Attributes:
+    writeQueues (dict[str, WriteBehindQueue]): The write queue of each chat
+     history collection.
   """
 
+  writeQueues: dict[str, WriteBehindQueue] = {}
+
+  @staticmethod
+  def bucketCollectionName(collectionName: str) -> str:
+    """
+    Get the name of the bucket collection of a chat history collection.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+
+    Returns:
+      str: The name of the message bucket collection.
+    """
+    return f"{collectionName}{ideation.MESSAGE_BUCKET_SUFFIX}"
+
+  @staticmethod
+  def bucketId(sessionId: str, index: int) -> str:
+    """
+    Get the `_id` of a message bucket.
+
+    Args:
+      sessionId (str): The ID of the chat session.
+      index (int): The position of the bucket in the session.
+
+    Returns:
+      str: The bucket ID.
+    """
+    return f"{sessionId}:{index:06d}"
+
+  @staticmethod
+  def bucketRange(sessionId: str) -> dict:
+    """
+    Get the filter matching every bucket of a session.
+
+    Args:
+      sessionId (str): The ID of the chat session.
+
+    Returns:
+      dict: An `_id` range filter (';' sorts right after ':').
+    """
+    return {"_id": {"$gte": f"{sessionId}:", "$lt": f"{sessionId};"}}
+
+  @staticmethod
+  def bucketDocuments(sessionId: str,
+                      messages: list[dict],
+                      bucketSize: int = None) -> list[dict]:
+    """
+    Split the messages of a new session into bucket documents.
+
+    Args:
+      sessionId (str): The ID of the chat session.
+      messages (list[dict]): The encoded messages, oldest first.
+      bucketSize (int): Maximum number of messages per bucket. Defaults to the
+       MESSAGE_BUCKET_SIZE from ideationConfig.
+
+    Returns:
+      list[dict]: The bucket documents, in order.
+    """
+    bucketSize = bucketSize or ideation.MESSAGE_BUCKET_SIZE
+    return [{
+        "_id": MessageListService.bucketId(sessionId, index),
+        "sessionId": sessionId,
+        "index": index,
+        "count": len(messages[start:start + bucketSize]),
+        "messages": messages[start:start + bucketSize],
+    } for index, start in enumerate(range(0, len(messages), bucketSize))]
+
+  @staticmethod
+  async def getBucketLayout(collectionName: str, sessionId: str) -> list[dict]:
+    """
+    Get the index and message count of every bucket of a session.
+
+    Only the small bucket headers are transferred, not the messages.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+
+    Returns:
+      list[dict]: The `index` and `count` of each bucket, in order.
+    """
+    buckets = getAsyncNoSqlConn().database[
+        MessageListService.bucketCollectionName(collectionName)]
+    cursor = buckets.find(MessageListService.bucketRange(sessionId), {
+        "_id": 0,
+        "index": 1,
+        "count": 1
+    }).sort("_id", 1)
+    return [bucket async for bucket in cursor]
+
+  @staticmethod
+  async def getMessages(collectionName: str,
+                        sessionId: str,
+                        start: int = 0) -> tuple[list[Message], int]:
+    """
+    Read the messages of a session from a given position to the end.
+
+    Buckets that only hold messages before `start` are not fetched.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      start (int): Position of the first message to return. Defaults to 0.
+
+    Returns:
+      tuple[list[Message], int]: The messages from `start` on and the total
+       number of messages in the session.
+    """
+    messages, _, total = await MessageListService.getMessagePage(
+        collectionName, sessionId, after=start - 1 if start > 0 else None)
+    return messages, total
+
+  @staticmethod
+  def resolvePage(total: int, limit: int | None, before: int | None,
+                  after: int | None) -> tuple[int, int]:
+    """
+    Turn page parameters into a range of message positions.
+
+    Args:
+      total (int): Number of messages in the session.
+      limit (int | None): Maximum number of messages to return.
+      before (int | None): Only return messages before this position.
+      after (int | None): Only return messages after this position.
+
+    Returns:
+      tuple[int, int]: The first position of the page and the position right
+       after its end.
+    """
+    end = total if before is None else min(before, total)
+    if after is not None:
+      start = after + 1
+      if limit is not None:
+        end = min(end, start + limit)
+    else:
+      start = 0 if limit is None else max(0, end - limit)
+    return start, end
+
+  @staticmethod
+  async def getMessagePage(
+      collectionName: str,
+      sessionId: str,
+      limit: int | None = None,
+      before: int | None = None,
+      after: int | None = None) -> tuple[list[Message], int, int]:
+    """
+    Read one page of the messages of a session.
+
+    Without `before`/`after` the page is the last `limit` messages. With
+    `after` it is the first `limit` messages after that position; with only
+    `before` it is the last `limit` messages before it. Messages are addressed
+    by their position in the session, starting at 0.
+
+    Sessions of up to SESSION_CACHE_MAX_MESSAGES messages are read whole once
+    and then paged from the session cache. For larger ones, the total
+    comes from the bucket counts, and the page is read in a single aggregation
+    that only fetches the overlapping buckets and `$slice`s the first and last
+    of them, so no message outside the page is transferred.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      limit (int | None): Maximum number of messages to return. Defaults to
+       every message in the range.
+      before (int | None): Only return messages before this position.
+      after (int | None): Only return messages after this position.
+
+    Returns:
+      tuple[list[Message], int, int]: The messages of the page, the position of
+       its first message and the total number of messages in the session.
+    """
+    await MessageListService.settle(collectionName, sessionId)
+    buckets = getAsyncNoSqlConn().database[
+        MessageListService.bucketCollectionName(collectionName)]
+    cache = getSessionCache()
+    version = await cache.getVersion(collectionName, sessionId)
+    messages = await cache.getMessages(collectionName, sessionId, version)
+    if messages is None:
+      layout = await MessageListService.getBucketLayout(
+          collectionName, sessionId)
+      total = sum(bucket["count"] for bucket in layout)
+      if version is not None and total <= cache.maxMessages:
+        # Small sessions are read whole once, then served from the cache
+        messages = []
+        async for bucket in buckets.find(
+            MessageListService.bucketRange(sessionId)).sort("_id", 1):
+          messages.extend(Message.model_validate(m) for m in bucket["messages"])
+        await cache.storeMessages(collectionName, sessionId, messages, version)
+    if messages is not None:
+      total = len(messages)
+      start, end = MessageListService.resolvePage(total, limit, before, after)
+      return messages[start:end], min(start, total), total
+
+    start, end = MessageListService.resolvePage(total, limit, before, after)
+    if start >= end:
+      return [], min(start, total), total
+
+    # Slice the buckets overlapping the range
+    slices = []
+    position = 0
+    for bucket in layout:
+      first = max(start - position, 0)
+      last = min(end - position, bucket["count"])
+      if first < last:
+        slices.append((MessageListService.bucketId(sessionId,
+                                                   bucket["index"]), first,
+                       last - first, bucket["count"]))
+      position += bucket["count"]
+    branches = [{
+        "case": {
+            "$eq": ["$_id", bucketId]
+        },
+        "then": {
+            "$slice": ["$messages", skip, count]
+        }
+    } for bucketId, skip, count, size in slices if count < size]
+
+    pipeline = [{
+        "$match": {
+            "_id": {
+                "$in": [bucketId for bucketId, *_ in slices]
+            }
+        }
+    }, {
+        "$sort": {
+            "_id": 1
+        }
+    }, {
+        "$project": {
+            "_id": 0,
+            "messages": {
+                "$switch": {
+                    "branches": branches,
+                    "default": "$messages"
+                }
+            } if branches else 1
+        }
+    }]
+    messages = []
+    async for bucket in await buckets.aggregate(pipeline):
+      messages.extend(bucket["messages"])
+    return [Message.model_validate(m) for m in messages], start, total
+
+  @staticmethod
+  async def deleteMessages(collectionName: str, sessionId: str) -> int:
+    """
+    Delete every message bucket of a session.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+
+    Returns:
+      int: The number of buckets deleted.
+    """
+    await MessageListService.settle(collectionName, sessionId)
+    buckets = getAsyncNoSqlConn().database[
+        MessageListService.bucketCollectionName(collectionName)]
+    deleteResult = await buckets.delete_many(
+        MessageListService.bucketRange(sessionId))
+    return deleteResult.deleted_count
+
+  @staticmethod
+  async def appendToBuckets(collectionName: str, sessionId: str,
+                            messages: list[dict]) -> bool:
+    """
+    Append encoded messages to the buckets of a session.
+
+    Messages go to the tail bucket until it holds MESSAGE_BUCKET_SIZE messages,
+    then to a new bucket. Both writes are conditional, so concurrent pushes
+    never overfill a bucket or create the same bucket twice; a push that loses
+    the race re-reads the tail and retries.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      messages (list[dict]): The encoded messages to add.
+
+    Returns:
+      bool: True if the messages were appended, False if the session does
+       not exist.
+    """
+    database = getAsyncNoSqlConn().database
+    buckets = database[MessageListService.bucketCollectionName(collectionName)]
+    bucketSize = ideation.MESSAGE_BUCKET_SIZE
+    while messages:
+      tail = await buckets.find_one(MessageListService.bucketRange(sessionId),
+                                    {
+                                        "index": 1,
+                                        "count": 1
+                                    },
+                                    sort=[("_id", -1)])
+      if tail is None and not await database[collectionName].find_one(
+          {"_id": sessionId}, {"_id": 1}):
+        return False
+
+      if tail is not None and tail["count"] < bucketSize:
+        part = messages[:bucketSize - tail["count"]]
+        updateResult = await buckets.update_one(
+            {
+                "_id": tail["_id"],
+                "count": {
+                    "$lte": bucketSize - len(part)
+                }
+            }, {
+                "$push": {
+                    "messages": {
+                        "$each": part
+                    }
+                },
+                "$inc": {
+                    "count": len(part)
+                }
+            })
+        if updateResult.modified_count == 0:
+          continue
+      else:
+        index = tail["index"] + 1 if tail is not None else 0
+        part = messages[:bucketSize]
+        try:
+          await buckets.insert_one({
+              "_id": MessageListService.bucketId(sessionId, index),
+              "sessionId": sessionId,
+              "index": index,
+              "count": len(part),
+              "messages": part
+          })
+        except errors.DuplicateKeyError:
+          continue
+      messages = messages[len(part):]
+    return True
+
   @staticmethod
   async def pushMessages(collectionName: str, sessionId: str, newMessages: list[Message]) -> bool:
     """
     Push a list of new messages to the end of the messages list in a chat session.
 
+    See `appendToBuckets` for how the messages are stored.
+
     Args:
       collectionName (str): The name of the collection to update.
       sessionId (str): The ID of the chat session to update.
@@ -33,22 +394,329 @@ class MessageListService:
     Returns:
       bool: True if the messages were successfully pushed, False otherwise.
     """
-    try:
-      messages = jsonable_encoder(newMessages)
-      updateResult = getNoSqlConn().database[collectionName].update_one(
-          {"_id": sessionId},
-          {"$push": {"messages": {"$each": messages}}}
-      )
-      return updateResult.modified_count > 0
-    except Exception as e:
-      logging.error(f"Error pushing messages: {e}")
-      return False
-    
+    await MessageListService.settle(collectionName, sessionId)
+    async with getSessionCache().write(collectionName, sessionId) as write:
+      try:
+        messages = jsonable_encoder(newMessages)
+        pushed = [Message.model_validate(m) for m in messages]
+        if not await MessageListService.appendToBuckets(
+            collectionName, sessionId, messages):
+          return False
+        write.commit(updateMessages=lambda cached: cached.extend(pushed))
+        return True
+      except Exception as e:
+        logging.error(f"Error pushing messages: {e}")
+        return False
+
+  @staticmethod
+  async def getTails(collectionName: str,
+                     sessionIds: list[str]) -> dict[str, dict]:
+    """
+    Get the tail bucket of several sessions in one aggregation.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionIds (list[str]): The IDs of the chat sessions.
+
+    Returns:
+      dict[str, dict]: The `_id`, `index` and `count` of the tail bucket of
+       each session that has one.
+    """
+    buckets = getAsyncNoSqlConn().database[
+        MessageListService.bucketCollectionName(collectionName)]
+    pipeline = [{
+        "$match": {
+            "$or": [
+                MessageListService.bucketRange(sessionId)
+                for sessionId in sessionIds
+            ]
+        }
+    }, {
+        "$sort": {
+            "_id": -1
+        }
+    }, {
+        "$group": {
+            "_id": "$sessionId",
+            "bucketId": {
+                "$first": "$_id"
+            },
+            "index": {
+                "$first": "$index"
+            },
+            "count": {
+                "$first": "$count"
+            }
+        }
+    }]
+    return {
+        tail["_id"]: {
+            "_id": tail["bucketId"],
+            "index": tail["index"],
+            "count": tail["count"]
+        } async for tail in await buckets.aggregate(pipeline)
+    }
+
+  @staticmethod
+  async def pushMessageBatch(
+      collectionName: str, batch: dict[str,
+                                       list[Message]]) -> dict[str, bool]:
+    """
+    Push the new messages of several sessions with one bulk_write.
+
+    The tails of every session are read in one aggregation. A session whose
+    messages fit in its tail bucket gets an update conditional on the tail
+    count read; one whose tail is full (or has no bucket yet) gets an insert
+    of the next bucket. Every write tags its bucket with the ID of the batch,
+    so when the bulk_write applied fewer writes than sent (a concurrent push
+    moved a tail), the missing ones are found and pushed one by one, as are
+    the sessions whose messages span two buckets.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      batch (dict[str, list[Message]]): The new messages of each session.
+
+    Returns:
+      dict[str, bool]: Whether the messages of each session were pushed.
+    """
+    database = getAsyncNoSqlConn().database
+    buckets = database[MessageListService.bucketCollectionName(collectionName)]
+    bucketSize = ideation.MESSAGE_BUCKET_SIZE
+    results = {sessionId: False for sessionId in batch}
+    async with AsyncExitStack() as stack:
+      writes = {
+          sessionId: await stack.enter_async_context(
+              getSessionCache().write(collectionName, sessionId))
+          for sessionId in batch
+      }
+      encoded = {
+          sessionId: jsonable_encoder(messages)
+          for sessionId, messages in batch.items()
+      }
+      try:
+        tails = await MessageListService.getTails(collectionName, list(batch))
+        withoutTail = [
+            sessionId for sessionId in batch if sessionId not in tails
+        ]
+        existing = set()
+        if withoutTail:
+          existing = {
+              header["_id"] async for header in database[collectionName].find(
+                  {"_id": {
+                      "$in": withoutTail
+                  }}, {"_id": 1})
+          }
+
+        batchId = uuid.uuid4().hex
+        operations = []
+        planned: dict[str, str] = {}
+        oneByOne = []
+        for sessionId, messages in encoded.items():
+          tail = tails.get(sessionId)
+          if tail is None and sessionId not in existing:
+            continue
+          if tail is not None and tail["count"] + len(messages) <= bucketSize:
+            operations.append(
+                UpdateOne({
+                    "_id": tail["_id"],
+                    "count": tail["count"]
+                }, {
+                    "$push": {
+                        "messages": {
+                            "$each": messages
+                        }
+                    },
+                    "$inc": {
+                        "count": len(messages)
+                    },
+                    "$set": {
+                        "writeId": batchId
+                    }
+                }))
+            planned[sessionId] = tail["_id"]
+          elif ((tail is None or tail["count"] >= bucketSize) and
+                len(messages) <= bucketSize):
+            index = tail["index"] + 1 if tail is not None else 0
+            bucketId = MessageListService.bucketId(sessionId, index)
+            operations.append(
+                InsertOne({
+                    "_id": bucketId,
+                    "sessionId": sessionId,
+                    "index": index,
+                    "count": len(messages),
+                    "messages": messages,
+                    "writeId": batchId
+                }))
+            planned[sessionId] = bucketId
+          else:
+            oneByOne.append(sessionId)
+
+        if operations:
+          try:
+            writeResult = await buckets.bulk_write(operations, ordered=False)
+            applied = writeResult.modified_count + writeResult.inserted_count
+          except errors.BulkWriteError as e:
+            # Lost races surface as duplicate keys; the rest still applied
+            applied = e.details["nModified"] + e.details["nInserted"]
+          if applied == len(operations):
+            landed = set(planned.values())
+          else:
+            landed = {
+                bucket["_id"] async for bucket in buckets.find(
+                    {
+                        "_id": {
+                            "$in": list(planned.values())
+                        },
+                        "writeId": batchId
+                    }, {"_id": 1})
+            }
+          for sessionId, bucketId in planned.items():
+            if bucketId in landed:
+              results[sessionId] = True
+            else:
+              oneByOne.append(sessionId)
+      except Exception as e:
+        logging.error(f"Error pushing message batch: {e}")
+        return results
+
+      for sessionId in oneByOne:
+        try:
+          results[sessionId] = await MessageListService.appendToBuckets(
+              collectionName, sessionId, encoded[sessionId])
+        except Exception as e:
+          logging.error(f"Error pushing messages: {e}")
+      for sessionId, pushed in results.items():
+        if pushed:
+          messages = [Message.model_validate(m) for m in encoded[sessionId]]
+          writes[sessionId].commit(
+              updateMessages=lambda cached, messages=messages: cached.extend(
+                  messages))
+    return results
+
+  @staticmethod
+  def getWriteQueue(collectionName: str) -> WriteBehindQueue:
+    """
+    Get the write queue of a chat history collection, creating it on first
+    use.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+
+    Returns:
+      WriteBehindQueue: The queue of the collection.
+    """
+    queue = MessageListService.writeQueues.get(collectionName)
+    if queue is None:
+      queue = WriteBehindQueue(
+          collectionName, lambda batch: MessageListService.pushMessageBatch(
+              collectionName, batch), ideation.WRITE_BEHIND_BATCH_SIZE,
+          ideation.WRITE_BEHIND_MAX_PENDING,
+          ideation.WRITE_BEHIND_FLUSH_SECONDS,
+          ideation.WRITE_BEHIND_MAX_ATTEMPTS,
+          ideation.WRITE_BEHIND_RETRY_SECONDS)
+      MessageListService.writeQueues[collectionName] = queue
+    return queue
+
+  @staticmethod
+  async def queueMessages(collectionName: str, sessionId: str,
+                          newMessages: list[Message]) -> bool:
+    """
+    Queue new messages to be pushed by the background write queue.
+
+    Returns once the messages are queued, usually before they are written;
+    they are pushed inline when WRITE_BEHIND_ENABLED is off.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      newMessages (list[Message]): The messages to add.
+
+    Returns:
+      bool: True if the messages were queued (or pushed), False otherwise.
+    """
+    if not ideation.WRITE_BEHIND_ENABLED:
+      return await MessageListService.pushMessages(collectionName, sessionId,
+                                                   newMessages)
+    await MessageListService.getWriteQueue(collectionName).put(
+        sessionId, list(newMessages))
+    return True
+
+  @staticmethod
+  async def settle(collectionName: str, sessionId: str) -> bool:
+    """
+    Wait until the queued messages of a session are written.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+
+    Returns:
+      bool: False if queued messages of the session were dropped after
+       failing WRITE_BEHIND_MAX_ATTEMPTS times.
+    """
+    queue = MessageListService.writeQueues.get(collectionName)
+    if queue is None:
+      return True
+    written = await queue.flushKey(sessionId)
+    if not written:
+      logging.error(f"Queued messages of session {sessionId} were lost")
+    return written
+
+  @staticmethod
+  async def flushWriteQueues() -> bool:
+    """
+    Write every queued message. Called on application shutdown.
+
+    Returns:
+      bool: False if queued messages were dropped instead of written.
+    """
+    written = True
+    for queue in list(MessageListService.writeQueues.values()):
+      written = await queue.close() and written
+    return written
+
+  @staticmethod
+  def getWriteQueueStats() -> dict:
+    """
+    Get the counters of the write queues.
+
+    Returns:
+      dict: The queue counters by collection.
+    """
+    return {
+        collectionName: queue.getStats()
+        for collectionName, queue in MessageListService.writeQueues.items()
+    }
+
+  @staticmethod
+  def headExpression(length) -> dict:
+    """
+    Get an aggregation expression for the first messages of a bucket.
+
+    Args:
+      length (int | dict): Number of messages to keep, or an expression
+       resolving to it.
+
+    Returns:
+      dict: An expression resolving to the first `length` messages of the
+       bucket, or to an empty list when `length` is not positive.
+    """
+    return {
+        "$cond": [{
+            "$gt": [length, 0]
+        }, {
+            "$slice": ["$messages", length]
+        }, []]
+    }
+
   @staticmethod
   async def popMessage(collectionName: str, sessionId: str) -> Message:
     """
     Pop the last message from the messages list in a chat session.
 
+    The last non-empty bucket is popped with a single atomic
+    find_one_and_update that only returns its last message.
+
     Args:
       collectionName (str): The name of the collection to update.
       sessionId (str): The ID of the chat session to update.
@@ -56,25 +724,228 @@ class MessageListService:
     Returns:
       Message: The removed message or None if no message was removed.
     """
-    try:
-      # Retrieve the chat session to get the last message
-      chatSession = getNoSqlConn().database[collectionName].find_one(
-          {"_id": sessionId})
-      if not chatSession or not chatSession["messages"]:
+    await MessageListService.settle(collectionName, sessionId)
+    async with getSessionCache().write(collectionName, sessionId) as write:
+      try:
+        buckets = getAsyncNoSqlConn().database[
+            MessageListService.bucketCollectionName(collectionName)]
+        bucket = await buckets.find_one_and_update(
+            {
+                **MessageListService.bucketRange(sessionId), "count": {
+                    "$gt": 0
+                }
+            }, {
+                "$pop": {
+                    "messages": 1
+                },
+                "$inc": {
+                    "count": -1
+                }
+            },
+            projection={"messages": {
+                "$slice": -1
+            }},
+            sort=[("_id", -1)],
+            return_document=ReturnDocument.BEFORE)
+        if not bucket or not bucket["messages"]:
+          write.commit()
+          return None
+
+        write.commit(
+            updateMessages=lambda cached: cached.pop() if cached else None)
+        return Message.model_validate(bucket["messages"][-1])
+      except Exception as e:
+        logging.error(f"Error popping message: {e}")
         return None
 
-      # Get the last message
-      lastMessage = chatSession["messages"][-1]
+  @staticmethod
+  async def popMessages(collectionName: str, sessionId: str,
+                        count: int) -> list[Message]:
+    """
+    Pop the last `count` messages from a chat session.
+
+    Each step is one atomic find_one_and_update on the last non-empty bucket
+    that removes up to the remaining count and only returns the removed
+    messages, so concurrent pops never return the same message twice. A pop
+    that fits in the tail bucket takes a single round trip.
 
-      # Remove the last message
-      updateResult = getNoSqlConn().database[collectionName].update_one(
-          {"_id": sessionId}, {"$pop": {
-              "messages": 1
-          }})
-      if updateResult.modified_count == 0:
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      count (int): The number of messages to pop.
+
+    Returns:
+      list[Message]: The removed messages, in session order (oldest first).
+       Fewer than `count` when the session runs out of messages, or None on
+       error.
+    """
+    await MessageListService.settle(collectionName, sessionId)
+    async with getSessionCache().write(collectionName, sessionId) as write:
+      try:
+        buckets = getAsyncNoSqlConn().database[
+            MessageListService.bucketCollectionName(collectionName)]
+        popped = []
+        while len(popped) < count:
+          remaining = count - len(popped)
+          bucket = await buckets.find_one_and_update(
+              {
+                  **MessageListService.bucketRange(sessionId), "count": {
+                      "$gt": 0
+                  }
+              }, [{
+                  "$set": {
+                      "messages":
+                          MessageListService.headExpression(
+                              {"$subtract": ["$count", remaining]}),
+                      "count": {
+                          "$max": [{
+                              "$subtract": ["$count", remaining]
+                          }, 0]
+                      }
+                  }
+              }],
+              projection={"messages": {
+                  "$slice": -remaining
+              }},
+              sort=[("_id", -1)],
+              return_document=ReturnDocument.BEFORE)
+          if not bucket or not bucket["messages"]:
+            break
+          popped = bucket["messages"] + popped
+
+        def dropPopped(cached: list[Message]) -> None:
+          del cached[max(len(cached) - len(popped), 0):]
+
+        write.commit(updateMessages=dropPopped)
+        return [Message.model_validate(m) for m in popped]
+      except Exception as e:
+        logging.error(f"Error popping messages: {e}")
         return None
 
-      return Message.model_validate(lastMessage)
-    except Exception as e:
-      logging.error(f"Error popping message: {e}")
-      return None
+  @staticmethod
+  async def truncateMessages(collectionName: str, sessionId: str,
+                             index: int) -> int:
+    """
+    Remove every message from position `index` on.
+
+    The bucket holding `index` is cut in one find_one_and_update that only
+    returns its count, and the buckets after it are deleted in one
+    delete_many. Buckets are located from their counts, without reading any
+    message.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      index (int): Position of the first message to remove.
+
+    Returns:
+      int: The number of messages removed, or None on error.
+    """
+    await MessageListService.settle(collectionName, sessionId)
+    async with getSessionCache().write(collectionName, sessionId) as write:
+      try:
+        buckets = getAsyncNoSqlConn().database[
+            MessageListService.bucketCollectionName(collectionName)]
+        layout = await MessageListService.getBucketLayout(
+            collectionName, sessionId)
+        position = 0
+        for bucket in layout:
+          if position + bucket["count"] > index:
+            break
+          position += bucket["count"]
+        else:
+          write.commit()
+          return 0
+
+        keep = index - position
+        bucketId = MessageListService.bucketId(sessionId, bucket["index"])
+        cut = await buckets.find_one_and_update(
+            {"_id": bucketId}, [{
+                "$set": {
+                    "messages": MessageListService.headExpression(keep),
+                    "count": {
+                        "$min": ["$count", keep]
+                    }
+                }
+            }],
+            projection={
+                "_id": 0,
+                "count": 1
+            },
+            return_document=ReturnDocument.BEFORE)
+        removed = max(cut["count"] - keep, 0) if cut else 0
+
+        # The buckets after the cut one are dropped whole
+        later = MessageListService.bucketRange(sessionId)
+        later["_id"] = {"$gt": bucketId, "$lt": later["_id"]["$lt"]}
+        await buckets.delete_many(later)
+
+        def dropTruncated(cached: list[Message]) -> None:
+          del cached[index:]
+
+        write.commit(updateMessages=dropTruncated)
+        return removed + sum(laterBucket["count"]
+                             for laterBucket in layout
+                             if laterBucket["index"] > bucket["index"])
+      except Exception as e:
+        logging.error(f"Error truncating messages: {e}")
+        return None
+
+  @staticmethod
+  async def replaceLastMessage(collectionName: str, sessionId: str,
+                               newMessage: Message) -> Message:
+    """
+    Replace the last message of a chat session.
+
+    Runs as one atomic find_one_and_update on the last non-empty bucket that
+    only returns the replaced message.
+
+    Args:
+      collectionName (str): The name of the collection to update.
+      sessionId (str): The ID of the chat session to update.
+      newMessage (Message): The message that replaces the last one.
+
+    Returns:
+      Message: The replaced message or None if the session has no messages.
+    """
+    await MessageListService.settle(collectionName, sessionId)
+    async with getSessionCache().write(collectionName, sessionId) as write:
+      try:
+        buckets = getAsyncNoSqlConn().database[
+            MessageListService.bucketCollectionName(collectionName)]
+        bucket = await buckets.find_one_and_update(
+            {
+                **MessageListService.bucketRange(sessionId), "count": {
+                    "$gt": 0
+                }
+            }, [{
+                "$set": {
+                    "messages": {
+                        "$concatArrays": [
+                            MessageListService.headExpression(
+                                {"$subtract": ["$count", 1]}),
+                            # $literal keeps contents starting with '$' as text
+                            [{
+                                "$literal": jsonable_encoder(newMessage)
+                            }]
+                        ]
+                    }
+                }
+            }],
+            projection={"messages": {
+                "$slice": -1
+            }},
+            sort=[("_id", -1)],
+            return_document=ReturnDocument.BEFORE)
+        if not bucket or not bucket["messages"]:
+          write.commit()
+          return None
+
+        def replaceLast(cached: list[Message]) -> None:
+          cached[-1:] = [newMessage]
+
+        write.commit(updateMessages=replaceLast)
+        return Message.model_validate(bucket["messages"][-1])
+      except Exception as e:
+        logging.error(f"Error replacing last message: {e}")
+        return None
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: responseCheckpointer.py
+Description: This module provides the ResponseCheckpointer class, which saves
+ the partial answer of a chat turn while the model is still generating it.
+Author: MathTeixeira
+Date: August 1, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import logging
+import time
+
+from core.config import ideation
+from models import Message
+from .chatHistoryRepository import ChatHistoryRepository
+
+
+class ResponseCheckpointer:
+  """
+  Saves the answer of one chat turn every few tokens or seconds.
+
+  The first checkpoint pushes the user message and the partial answer, marked
+  `complete=False`; the next ones replace the answer in place, and `finish`
+  replaces it with the complete one. If the worker dies halfway, the session
+  keeps the answer up to its last checkpoint, and the turn can be continued
+  instead of generated again. A turn that ends before its first checkpoint
+  writes nothing here; its messages are saved like any other turn. A turn
+  whose client left is saved as it is by `interrupt`.
+
+  Checkpoints are written by a background task, one at a time, so the stream
+  never waits for the database; a checkpoint falling due while the previous
+  one is still being written is skipped.
+
+  Attributes:
+    collectionName (str): The name of the chat history collection.
+    sessionId (str | None): The ID of the chat session.
+    humanMessage (str | None): The user message of the turn, pushed with the
+     first checkpoint; None when continuing an answer already saved.
+    everyTokens (int): Output tokens between checkpoints (0 disables).
+    everySeconds (float): Seconds between checkpoints (0 disables).
+    saved (bool): Whether the answer is in the database.
+    savedLength (int): Characters of the answer saved by the last checkpoint.
+    lastAt (float): Monotonic time of the last checkpoint, or of the start.
+    task (asyncio.Task | None): The checkpoint being written.
+    stats (dict): Counters shared with the service: checkpoints written,
+     answers completed, answers saved after their client left and failed
+     writes.
+  """
+
+  def __init__(self,
+               collectionName: str,
+               sessionId: str | None,
+               humanMessage: str | None,
+               text: str = "",
+               everyTokens: int = ideation.CHECKPOINT_TOKENS,
+               everySeconds: float = ideation.CHECKPOINT_SECONDS,
+               stats: dict | None = None) -> None:
+    """
+    Initialize the ResponseCheckpointer of a turn.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str | None): The ID of the chat session; nothing is saved
+       when None.
+      humanMessage (str | None): The user message of the turn, or None to
+       continue the partial answer that ends the session.
+      text (str): The answer saved so far. Defaults to "".
+      everyTokens (int): Output tokens between checkpoints. Defaults to the
+       CHECKPOINT_TOKENS from ideationConfig.
+      everySeconds (float): Seconds between checkpoints. Defaults to the
+       CHECKPOINT_SECONDS from ideationConfig.
+      stats (dict, optional): Counters to update.
+    """
+    self.collectionName: str = collectionName
+    self.sessionId: str | None = sessionId
+    self.humanMessage: str | None = humanMessage
+    self.everyTokens: int = everyTokens
+    self.everySeconds: float = everySeconds
+    self.saved: bool = humanMessage is None
+    self.savedLength: int = len(text)
+    self.lastAt: float = time.monotonic()
+    self.task: asyncio.Task | None = None
+    self.stats: dict = stats if stats is not None else {
+        "checkpoints": 0,
+        "completed": 0,
+        "interrupted": 0,
+        "failures": 0
+    }
+
+  def isDue(self, text: str) -> bool:
+    """
+    Check whether the answer should be saved now.
+
+    Args:
+      text (str): The answer generated so far.
+
+    Returns:
+      bool: True if enough tokens or seconds passed since the last
+       checkpoint.
+    """
+    if self.sessionId is None:
+      return False
+    # About four characters per token
+    if (self.everyTokens > 0 and
+        (len(text) - self.savedLength) / 4 >= self.everyTokens):
+      return True
+    return (self.everySeconds > 0 and len(text) > self.savedLength and
+            time.monotonic() - self.lastAt >= self.everySeconds)
+
+  def update(self, text: str) -> None:
+    """
+    Start a checkpoint of the answer if one is due.
+
+    Args:
+      text (str): The answer generated so far.
+    """
+    if self.task is not None and not self.task.done():
+      return
+    if self.isDue(text):
+      self.task = asyncio.create_task(
+          self.write(text, complete=False, counter="checkpoints"))
+
+  async def write(self, text: str, complete: bool, counter: str) -> bool:
+    """
+    Save the answer.
+
+    Args:
+      text (str): The answer generated so far.
+      complete (bool): Whether the answer is finished.
+      counter (str): The counter of `stats` a successful write adds to.
+
+    Returns:
+      bool: True if the answer was saved.
+    """
+    answer = Message(content=text, type="ai", complete=complete)
+    try:
+      if self.saved:
+        written = await ChatHistoryRepository.replaceLastMessage(
+            self.collectionName, self.sessionId, answer) is not None
+      else:
+        written = await ChatHistoryRepository.pushMessages(
+            self.collectionName, self.sessionId,
+            [Message(content=self.humanMessage, type="human"), answer])
+        self.saved = written
+    except Exception as e:
+      logging.error(f"Error saving the answer of session {self.sessionId}: {e}")
+      written = False
+    if not written:
+      self.stats["failures"] += 1
+      return False
+    self.savedLength = len(text)
+    self.lastAt = time.monotonic()
+    self.stats[counter] += 1
+    return True
+
+  async def settle(self) -> None:
+    """
+    Wait for the checkpoint being written, if any.
+    """
+    if self.task is not None:
+      await asyncio.gather(self.task, return_exceptions=True)
+
+  async def interrupt(self, text: str) -> bool:
+    """
+    Save the answer of a turn whose client left, as incomplete.
+
+    Args:
+      text (str): The answer generated before the client left.
+
+    Returns:
+      bool: True if the answer is saved up to `text`.
+    """
+    await self.settle()
+    if self.sessionId is None or len(text) <= self.savedLength:
+      return self.saved
+    return await self.write(text, complete=False, counter="interrupted")
+
+  async def finish(self, text: str) -> bool:
+    """
+    Save the complete answer over the last checkpoint.
+
+    Args:
+      text (str): The complete answer.
+
+    Returns:
+      bool: True if the answer was saved.
+    """
+    await self.settle()
+    return await self.write(text, complete=True, counter="completed")
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: sessionCache.py
+Description: This module provides the SessionCache class, a read-through,
+ write-through cache of chat session headers and messages on a pluggable
+ CacheBackend.
+Author: MathTeixeira
+Date: July 26, 2024
+Version: 1.1.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+from core.cache import CacheBackend, createCacheBackend
+from core.config import ideation
+from models import Message
+
+# A write adds IN_FLIGHT + 1 to the session version when it starts and
+# 1 - IN_FLIGHT when it ends, so `version // IN_FLIGHT` is the number of
+# writes still running and every start and end changes the version
+IN_FLIGHT = 1 << 32
+
+
+class SessionWrite:
+  """
+  One write to a session, from its start to its report to the SessionCache.
+
+  Attributes:
+    collectionName (str): The name of the chat history collection.
+    sessionId (str): The ID of the chat session.
+    version (int | None): The session version once the write started.
+    header (dict | None): The cached header before the write, if any.
+    messages (list[Message] | None): The cached messages before the write, if
+     any.
+    succeeded (bool): Whether the database write succeeded.
+    updateHeader (Callable[[dict], None] | None): Applies the write to the
+     cached header.
+    updateMessages (Callable[[list[Message]], None] | None): Applies the write
+     to the cached messages.
+  """
+
+  def __init__(self, collectionName: str, sessionId: str) -> None:
+    """
+    Initialize a write that has not succeeded yet.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+    """
+    self.collectionName: str = collectionName
+    self.sessionId: str = sessionId
+    self.version: int | None = None
+    self.header: dict | None = None
+    self.messages: list[Message] | None = None
+    self.succeeded: bool = False
+    self.updateHeader: Callable[[dict], None] | None = None
+    self.updateMessages: Callable[[list[Message]], None] | None = None
+
+  def commit(self,
+             updateHeader: Callable[[dict], None] | None = None,
+             updateMessages: Callable[[list[Message]], None] | None = None
+            ) -> None:
+    """
+    Mark the write as succeeded.
+
+    Cached entries without an update callback are left as they are.
+
+    Args:
+      updateHeader (Callable[[dict], None], optional): Applies the write to
+       the cached header.
+      updateMessages (Callable[[list[Message]], None], optional): Applies the
+       write to the cached messages.
+    """
+    self.succeeded = True
+    self.updateHeader = updateHeader
+    self.updateMessages = updateMessages
+
+
+class SessionCache:
+  """
+  Cache of chat sessions, keyed by collection, session ID and version.
+
+  The entries live in a CacheBackend: in this worker's memory, or on a Redis
+  server shared by every worker. Each session has a version counter, and its
+  entries are stored under the version they were read at:
+    version:<collection>:<sessionId>             the version counter
+    header:<collection>:<sessionId>:<version>    the session without messages
+    messages:<collection>:<sessionId>:<version>  every message of the session
+    lookup:<collection>:<field>:<value>          the session ID of a field value
+
+  Every write changes the version when it starts and again when it ends, so
+  whatever any worker cached before or during the write can no longer be
+  found, and a read only stores its result if no write was running when it
+  read the version. A write that was the only one running moves the entries
+  it read before the write to the new version, with its change applied
+  (write-through); otherwise the next read goes to the database. Counters
+  start at a random value, so a counter that expired or was evicted never
+  brings back old entries.
+
+  Attributes:
+    backend (CacheBackend): Where the entries are stored.
+    ttl (float): Seconds an entry stays valid.
+    maxMessages (int): Largest session whose messages are cached.
+    stats (dict): Hits, misses, invalidations and stores skipped because a
+     write was running.
+  """
+
+  _instance: 'SessionCache | None' = None
+
+  def __init__(self,
+               backend: CacheBackend | None = None,
+               ttl: float = ideation.SESSION_CACHE_TTL,
+               maxMessages: int = ideation.SESSION_CACHE_MAX_MESSAGES) -> None:
+    """
+    Initialize the SessionCache instance.
+
+    Args:
+      backend (CacheBackend, optional): Where the entries are stored. Defaults
+       to the SESSION_CACHE_BACKEND from ideationConfig.
+      ttl (float): Seconds an entry stays valid. Defaults to the
+       SESSION_CACHE_TTL from ideationConfig.
+      maxMessages (int): Largest session whose messages are cached. Defaults
+       to the SESSION_CACHE_MAX_MESSAGES from ideationConfig.
+    """
+    self.backend: CacheBackend = backend or createCacheBackend(
+        ideation.SESSION_CACHE_BACKEND, ideation.SESSION_CACHE_SIZE, ttl,
+        ideation.SESSION_CACHE_REDIS_URL)
+    self.ttl: float = ttl
+    self.maxMessages: int = maxMessages
+    self.stats: dict = {
+        "hits": 0,
+        "misses": 0,
+        "invalidations": 0,
+        "busyStoresSkipped": 0
+    }
+
+  @classmethod
+  def getInstance(cls) -> 'SessionCache':
+    """
+    Get the singleton instance of SessionCache.
+
+    Returns:
+      SessionCache: The singleton instance of SessionCache.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  @property
+  def enabled(self) -> bool:
+    """
+    bool: Whether the cache can hold any entry.
+    """
+    return self.backend.enabled
+
+  @staticmethod
+  def entryKey(kind: str, collectionName: str, sessionId: str,
+               version: int) -> str:
+    """
+    Get the key of a session entry.
+
+    Args:
+      kind (str): 'header' or 'messages'.
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      version (int): The session version the entry belongs to.
+
+    Returns:
+      str: The cache key.
+    """
+    return f"{kind}:{collectionName}:{sessionId}:{version}"
+
+  async def addToVersion(self, collectionName: str, sessionId: str,
+                         amount: int) -> int | None:
+    """
+    Add to the version counter of a session.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      amount (int): The amount to add; 0 only reads the version.
+
+    Returns:
+      int | None: The new version, or None if the backend failed.
+    """
+    return await self.backend.incr(f"version:{collectionName}:{sessionId}",
+                                   amount, random.randrange(IN_FLIGHT // 2),
+                                   self.ttl)
+
+  async def getVersion(self, collectionName: str,
+                       sessionId: str) -> int | None:
+    """
+    Get the token a read takes before querying the database.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+
+    Returns:
+      int | None: The current session version, or None if the cache is
+       disabled or failed.
+    """
+    if not self.enabled:
+      return None
+    return await self.addToVersion(collectionName, sessionId, 0)
+
+  def canStore(self, version: int | None) -> bool:
+    """
+    Check whether a read that started at `version` may store its result.
+
+    Args:
+      version (int | None): The version taken before the read.
+
+    Returns:
+      bool: True if no write to the session was running at that version.
+    """
+    if version is None:
+      return False
+    if version // IN_FLIGHT:
+      self.stats["busyStoresSkipped"] += 1
+      return False
+    return True
+
+  async def findSessionId(self, collectionName: str, field: str,
+                          value: str) -> str | None:
+    """
+    Get the cached session ID a field value maps to.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      field (str): The field to search by.
+      value (str): The value of the field to search for.
+
+    Returns:
+      str | None: The session ID, or None on a miss.
+    """
+    if not self.enabled:
+      return None
+    return await self.backend.get(f"lookup:{collectionName}:{field}:{value}")
+
+  async def storeLookup(self, collectionName: str, field: str, value: str,
+                        sessionId: str) -> None:
+    """
+    Cache the session ID a field value maps to.
+
+    Lookups are not versioned: readers check the value against the header.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      field (str): The field the session was searched by.
+      value (str): The value of the field.
+      sessionId (str): The ID of the chat session.
+    """
+    if self.enabled:
+      await self.backend.set(f"lookup:{collectionName}:{field}:{value}",
+                             sessionId, self.ttl)
+
+  async def getHeader(self, collectionName: str, sessionId: str,
+                      version: int | None) -> dict | None:
+    """
+    Get a cached session header.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      version (int | None): The current session version.
+
+    Returns:
+      dict | None: A copy of the session header, or None on a miss.
+    """
+    if version is None:
+      return None
+    header = await self.backend.get(
+        self.entryKey("header", collectionName, sessionId, version))
+    self.stats["hits" if header is not None else "misses"] += 1
+    return dict(header) if header is not None else None
+
+  async def storeHeader(self, collectionName: str, header: dict,
+                        version: int | None) -> None:
+    """
+    Cache a session header read from the database.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      header (dict): The session header, without messages.
+      version (int | None): The version taken before the read.
+    """
+    if self.canStore(version):
+      await self.backend.set(
+          self.entryKey("header", collectionName, header["_id"], version),
+          dict(header), self.ttl)
+
+  async def getMessages(self, collectionName: str, sessionId: str,
+                        version: int | None) -> list[Message] | None:
+    """
+    Get the cached messages of a session.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      version (int | None): The current session version.
+
+    Returns:
+      list[Message] | None: A copy of the message list, or None on a miss.
+    """
+    if version is None:
+      return None
+    messages = await self.backend.get(
+        self.entryKey("messages", collectionName, sessionId, version))
+    self.stats["hits" if messages is not None else "misses"] += 1
+    if messages is None:
+      return None
+    return [Message.model_validate(message) for message in messages]
+
+  async def storeMessages(self, collectionName: str, sessionId: str,
+                          messages: list[Message],
+                          version: int | None) -> None:
+    """
+    Cache every message of a session read from the database.
+
+    Sessions larger than `maxMessages` are not cached.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+      messages (list[Message]): Every message of the session.
+      version (int | None): The version taken before the read.
+    """
+    if len(messages) <= self.maxMessages and self.canStore(version):
+      await self.backend.set(
+          self.entryKey("messages", collectionName, sessionId, version),
+          list(messages), self.ttl)
+
+  async def beginWrite(self, collectionName: str,
+                       sessionId: str) -> SessionWrite:
+    """
+    Register a write to a session before it reaches the database.
+
+    If no other write is running, the cached entries are read now: read
+    after the database write, they could already contain its change.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+
+    Returns:
+      SessionWrite: The write to commit once the database write succeeded.
+    """
+    write = SessionWrite(collectionName, sessionId)
+    if not self.enabled:
+      return write
+    write.version = await self.addToVersion(collectionName, sessionId,
+                                            IN_FLIGHT + 1)
+    if write.version is not None and write.version // IN_FLIGHT == 1:
+      previous = write.version - IN_FLIGHT - 1
+      write.header, write.messages = await self.backend.getMany([
+          self.entryKey(kind, collectionName, sessionId, previous)
+          for kind in ("header", "messages")
+      ])
+    return write
+
+  async def endWrite(self, write: SessionWrite) -> None:
+    """
+    Apply a finished write to the cached session.
+
+    The update callbacks patch the entries read when the write started, and
+    the result is stored under the new version; entries without a callback
+    are moved unchanged. If the write failed or another write to the session
+    started or ended in the meantime, nothing is stored.
+
+    Args:
+      write (SessionWrite): The finished write.
+    """
+    if write.version is None:
+      return
+    version = await self.addToVersion(write.collectionName, write.sessionId,
+                                      1 - IN_FLIGHT)
+    cached = [(kind, value, update) for kind, value, update in (
+        ("header", write.header, write.updateHeader),
+        ("messages", write.messages, write.updateMessages)) if value is not None]
+    if not cached:
+      return
+    if (not write.succeeded or version is None or
+        version != write.version + 1 - IN_FLIGHT):
+      self.stats["invalidations"] += 1
+      return
+
+    values = {}
+    for kind, value, update in cached:
+      value = dict(value) if kind == "header" else list(value)
+      if update is not None:
+        update(value)
+      if kind == "messages" and len(value) > self.maxMessages:
+        continue
+      values[self.entryKey(kind, write.collectionName, write.sessionId,
+                           version)] = value
+    if values:
+      await self.backend.setMany(values, self.ttl)
+
+  @asynccontextmanager
+  async def write(self, collectionName: str,
+                  sessionId: str) -> AsyncIterator[SessionWrite]:
+    """
+    Wrap a database write to a session.
+
+    Usage:
+      async with getSessionCache().write(collectionName, sessionId) as write:
+        ...  # write to the database
+        write.commit(updateMessages=lambda messages: messages.append(m))
+
+    A write that does not commit (it failed or raised) drops the session.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+
+    Yields:
+      SessionWrite: The write to commit once the database write succeeded.
+    """
+    sessionWrite = await self.beginWrite(collectionName, sessionId)
+    try:
+      yield sessionWrite
+    finally:
+      await self.endWrite(sessionWrite)
+
+  def getStats(self) -> dict:
+    """
+    Get the cache counters.
+
+    Returns:
+      dict: The backend name, hits, misses, invalidations, skipped stores and
+       the backend's own counters.
+    """
+    return {
+        "backend": self.backend.name,
+        **self.stats,
+        **self.backend.getStats()
+    }
+
+  async def close(self) -> None:
+    """
+    Release the backend's connections.
+    """
+    await self.backend.close()
+
+
+# Alias for SessionCache.getInstance
+# This alias allows for easier access to the SessionCache singleton instance.
+getSessionCache = SessionCache.getInstance
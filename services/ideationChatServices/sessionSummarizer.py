@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: sessionSummarizer.py
+Description: This module provides the SessionSummarizer class, which keeps an
+ incremental rolling summary of the older turns of an ideation session.
+Author: MathTeixeira
+Date: July 23, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import logging
+from langchain_core.prompts import ChatPromptTemplate
+
+from core.config import ideation, llm
+from core.llm import AdmissionRejected, getResilienceController
+from models import Message
+from .chatHistoryRepository import ChatHistoryRepository
+
+
+class SessionSummarizer:
+  """
+  Folds the older turns of a chat session into a running summary.
+
+  The summary lives on the ChatHistory document (`summary` and
+  `summarizedCount`). It is updated a few messages at a time, in a background
+  task started after the response has been streamed and saved, so the model
+  call never sits on the request path. The prompt then becomes the summary
+  plus the messages that were not summarized yet.
+
+  Attributes:
+    chain (Runnable): The summarization `prompt | model` chain.
+    modelId (str): ID of the model, used for admission control.
+    batchMessages (int): Minimum number of messages folded per update.
+    recentMessages (int): Number of most recent messages never summarized.
+    tasks (set[asyncio.Task]): Summaries currently running.
+    runningSessions (set[str]): IDs of the sessions being summarized.
+    stats (dict): Number of updates run, failed, shed by admission control,
+     and messages folded.
+  """
+
+  def __init__(self,
+               model,
+               modelId: str = ideation.MODEL,
+               batchMessages: int = ideation.SUMMARY_BATCH_MESSAGES,
+               recentMessages: int = ideation.SUMMARY_RECENT_MESSAGES) -> None:
+    """
+    Initialize the SessionSummarizer instance.
+
+    Args:
+      model (BaseChatModel): The chat model used to write the summaries.
+      modelId (str): ID of the model. Defaults to the MODEL from
+       ideationConfig.
+      batchMessages (int): Minimum number of messages folded per update.
+       Defaults to the SUMMARY_BATCH_MESSAGES from ideationConfig.
+      recentMessages (int): Number of most recent messages never summarized.
+       Defaults to the SUMMARY_RECENT_MESSAGES from ideationConfig.
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You maintain the running summary of a business ideation "
+         "conversation between a user and an advisor. Merge the new lines "
+         "into the current summary. Keep every idea, decision, preference "
+         "and open question; drop small talk. Answer with the updated "
+         "summary only."),
+        ("user", "Current summary:\n{summary}\n\nNew lines:\n{lines}"),
+    ])
+    self.chain = prompt | model
+    self.modelId: str = modelId
+    self.batchMessages: int = batchMessages
+    self.recentMessages: int = recentMessages
+    self.tasks: set[asyncio.Task] = set()
+    self.runningSessions: set[str] = set()
+    self.stats: dict = {
+        "updates": 0,
+        "failures": 0,
+        "shed": 0,
+        "foldedMessages": 0
+    }
+
+  def isDue(self, messageCount: int, summarizedCount: int) -> bool:
+    """
+    Check whether a session has enough unsummarized messages to fold.
+
+    Args:
+      messageCount (int): Total number of messages in the session.
+      summarizedCount (int): Number of leading messages already summarized.
+
+    Returns:
+      bool: True if a summary update should be scheduled.
+    """
+    pending = messageCount - summarizedCount - self.recentMessages
+    return pending >= self.batchMessages
+
+  def foldEnd(self, start: int, total: int) -> int:
+    """
+    Get the end of the messages an update folds into the summary.
+
+    Args:
+      start (int): Number of leading messages already summarized.
+      total (int): Total number of messages in the session.
+
+    Returns:
+      int: The index after the last message to fold. The update is skipped
+       when fewer than batchMessages messages lie before it.
+    """
+    end = total - self.recentMessages
+    # Fold whole turns so the recent window still opens with a human message
+    return end - (end - start) % 2
+
+  @staticmethod
+  def formatLines(messages: list[Message]) -> str:
+    """
+    Format messages as the new lines of a summary update.
+
+    Args:
+      messages (list[Message]): The messages to fold.
+
+    Returns:
+      str: One 'type: content' line per message.
+    """
+    return "\n".join(f"{message.type}: {message.content}"
+                     for message in messages)
+
+  def schedule(self, collectionName: str, sessionId: str) -> None:
+    """
+    Start a background summary update for a session.
+
+    Does nothing when an update for the same session is already running.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+    """
+    if sessionId in self.runningSessions:
+      return
+    self.runningSessions.add(sessionId)
+    task = asyncio.create_task(self.summarize(collectionName, sessionId))
+    self.tasks.add(task)
+    task.add_done_callback(self.tasks.discard)
+
+  async def summarize(self, collectionName: str, sessionId: str) -> None:
+    """
+    Fold the pending messages of a session into its summary.
+
+    Args:
+      collectionName (str): The name of the chat history collection.
+      sessionId (str): The ID of the chat session.
+    """
+    try:
+      chatHistory = await ChatHistoryRepository.getSessionHeader(
+          collectionName, "_id", sessionId)
+      if chatHistory is None:
+        return
+      start = chatHistory.summarizedCount
+      # Only the buckets holding unsummarized messages are read
+      pending, total = await ChatHistoryRepository.getMessages(
+          collectionName, sessionId, start)
+      end = self.foldEnd(start, total)
+      if end - start < self.batchMessages:
+        return
+
+      lines = self.formatLines(pending[:end - start])
+      # Lowest priority: a later turn schedules the update again
+      slot = await getResilienceController().admit(self.modelId,
+                                                   llm.PRIORITY_BACKGROUND)
+      try:
+        response = await self.chain.ainvoke({
+            "summary": chatHistory.summary or "(empty)",
+            "lines": lines
+        })
+      finally:
+        slot.release()
+      saved = await ChatHistoryRepository.updateSummary(
+          collectionName, sessionId, response.content, end, start)
+      if saved:
+        self.stats["updates"] += 1
+        self.stats["foldedMessages"] += end - start
+    except AdmissionRejected as e:
+      self.stats["shed"] += 1
+      logging.warning(f"Summary of session {sessionId} skipped: {e}")
+    except Exception as e:
+      self.stats["failures"] += 1
+      logging.error(f"Error summarizing session {sessionId}: {e}")
+    finally:
+      self.runningSessions.discard(sessionId)
+
+  async def drain(self) -> None:
+    """
+    Wait for the running summary updates to finish.
+
+    Called on application shutdown.
+    """
+    if self.tasks:
+      await asyncio.gather(*self.tasks, return_exceptions=True)
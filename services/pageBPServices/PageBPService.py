@@ -15,8 +15,13 @@ Contact Information:
 from langchain_aws import ChatBedrock
 from langchain_core.prompts import ChatPromptTemplate
 
+import asyncio
 import boto3
-from core.config import pageBP, aws
+from core.config import pageBP, aws, llm
+from core.llm import getModelRouter, getResilienceController
+from core.streaming import ResumableStreams, SingleFlight
+from .businessPlanCache import BusinessPlanCache, getBusinessPlanCache
+from .businessPlanStore import BusinessPlanStore, getBusinessPlanStore
 
 ###### end of imports
 
@@ -32,6 +37,20 @@ class PageBPService:
         awsRegion (string): region for the AWS
         bedrockClient (boto3.client): Bedrock client
         llm (ChatBedrock): LLM model
+        modelId (string): default model id, used when no routing rule
+         matches; the model of a plan is part of its cache key
+        temperature (float): sampling temperature, part of the plan cache key
+        maxTokens (int): output token limit, part of the plan cache key
+        prompt (ChatPromptTemplate): business plan prompt template
+        chain (Runnable): compiled prompt | model chain, shared by all requests
+        chains (dict): compiled chain of each routed model id
+        activeStreams (int): number of business plan streams in flight
+        totalStreams (int): number of business plan streams started
+        inFlight (SingleFlight): in-flight generations by cache key, shared
+         by identical concurrent requests; a generation keeps running for
+         RESUME_GRACE_SECONDS after its last client dropped
+        resumable (ResumableStreams): recent generations by stream id, for
+         clients resuming them from an offset
         """
 
   ############################## Constructor #################################
@@ -42,6 +61,7 @@ class PageBPService:
               MODEL: str = pageBP.MODEL,
               MAX_TOKENS: int = pageBP.MAX_TOKENS,
               TEMPERATURE: int = pageBP.TEMPERATURE,
+              client=None,
               ):
     """Constructor for the BedrockBusinessPlan class.
         
@@ -50,10 +70,12 @@ class PageBPService:
             maxTokens (int): maximum number of tokens for the response
             criativity (float): criativity for the response
             region (string): region for the AWS
+            client (boto3.client, optional): shared Bedrock client, a new one
+             is created when not provided
         """
     ############################# Properties ###############################
     # --- Bedrock client ---
-    self.client = boto3.client(
+    self.client = client or boto3.client(
         service_name=AWS_SERVICE_NAME,
         region_name=AWS_REGION,
         aws_access_key_id=aws.AWS_ACCESS_KEY_ID,
@@ -61,30 +83,18 @@ class PageBPService:
     )
 
     # --- Bedrock model ---
+    self.modelId = MODEL
+    self.temperature = TEMPERATURE
+    self.maxTokens = MAX_TOKENS
     self.model = ChatBedrock(model_id=MODEL,
                              client=self.client,
                              model_kwargs={
                                  'max_tokens': MAX_TOKENS,
                                  'temperature': TEMPERATURE
                              })
-    ######################### end Properties ###############################
-
-  ########################### end Constructor ################################
 
-  ################################ Functions #################################
-  # ----------------------------- Main functions -----------------------------
-  # Function to create a query to the LLM model
-  async def businessPlanQuery(self, businessInfo):
-    """Query the LLM model for a business plan.
-
-    Args:
-        businessInfo (string): the business information provided by the user.
-
-    Returns:
-        string: the business plan in HTML format.
-    """
-    # Prompt template
-    prompt = ChatPromptTemplate.from_messages([(
+    # --- Prompt template ---
+    self.prompt = ChatPromptTemplate.from_messages([(
         "system",
         """<role>You are a backend server</role>
 <task>Your task is to create a business plan. To do this task, you should follow the provided instructions.</task>
@@ -119,10 +129,243 @@ class PageBPService:
 </instructions>
 """
     ), ("user", "{businessInfo}\n\nAssistant:# Title")])
-    # LLMChain: passes the prompt and the LLM model
-    chain = prompt | self.model
 
-    # Execute the chain using the invoke method
-    async for chunk in chain.astream({'businessInfo': businessInfo}):
-      yield chunk.content
+    # --- Chain: compiled once, shared by every request ---
+    self.chain = self.prompt | self.model
+    self.chains = {MODEL: self.chain}
+
+    self.activeStreams: int = 0
+    self.totalStreams: int = 0
+    self.inFlight: SingleFlight = SingleFlight(llm.RESUME_GRACE_SECONDS)
+    self.resumable: ResumableStreams = ResumableStreams()
+    ######################### end Properties ###############################
+
+  ########################### end Constructor ################################
+
+  ################################ Functions #################################
+  # ----------------------------- Main functions -----------------------------
+  # Function to create a query to the LLM model
+  async def businessPlanQuery(self, businessInfo, slot=None, decision=None):
+    """Query the LLM model for a business plan.
+
+    A plan that streams to the end is stored in the business plan cache and
+    in the plan store; one that fails or is cancelled halfway is not.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        slot (AdmissionSlot, optional): model slot granted by
+         admitBusinessPlan, one is acquired when not provided
+        decision (RoutingDecision, optional): model picked by
+         routeBusinessPlan, the default model is used when not provided
+
+    Returns:
+        string: the business plan in HTML format.
+    """
+    modelId = decision.modelId if decision else self.modelId
+    chain = self.getChain(modelId)
+    if slot is None:
+      slot = await getResilienceController().admit(modelId,
+                                                   llm.PRIORITY_BATCH)
+    # Execute the shared chain using the astream method
+    self.activeStreams += 1
+    self.totalStreams += 1
+    try:
+      parts = []
+      # Retried while throttled, until the first chunk only
+      modelStream = getResilienceController().stream(
+          modelId,
+          lambda: chain.astream({'businessInfo': businessInfo}),
+          # About four characters per token
+          countTokens=lambda chunk: len(chunk.content) / 4,
+          requestId=decision.requestId if decision else None)
+      try:
+        async for chunk in modelStream:
+          parts.append(chunk.content)
+          yield chunk.content
+      finally:
+        slot.release()
+        # Cancels the model call if the generation was cancelled
+        await modelStream.aclose()
+      content = "".join(parts)
+      await asyncio.gather(
+          getBusinessPlanCache().store(self.cacheKey(businessInfo, modelId),
+                                       content, modelId),
+          getBusinessPlanStore().save(self.planId(businessInfo, modelId),
+                                      businessInfo, content, modelId))
+    finally:
+      self.activeStreams -= 1
+
+  async def admitBusinessPlan(self, businessInfo, modelId=None):
+    """Get a model slot for a business plan generation, at batch priority.
+
+    A request that will join a generation already in flight needs no slot.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        modelId (string, optional): the model to call, defaults to the
+         default model
+
+    Returns:
+        AdmissionSlot: the granted slot, or None if the plan is in flight.
+
+    Raises:
+        AdmissionRejected: if the model is overloaded or its circuit is open.
+    """
+    if self.cacheKey(businessInfo, modelId) in self.inFlight.streams:
+      return None
+    return await getResilienceController().admit(modelId or self.modelId,
+                                                 llm.PRIORITY_BATCH)
+
+  def businessPlanStream(self, businessInfo, slot=None, decision=None):
+    """Stream a business plan, sharing the generation with identical requests.
+
+    A request arriving while the same plan is being generated gets the chunks
+    produced so far and then the live tail of that generation instead of
+    starting another one. The generation is cancelled only when every
+    request following it has disconnected and none resumed it within
+    RESUME_GRACE_SECONDS.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        slot (AdmissionSlot, optional): model slot granted by
+         admitBusinessPlan, released at once if the request joins a
+         generation in flight
+        decision (RoutingDecision, optional): model picked by
+         routeBusinessPlan, the default model is used when not provided
+
+    Returns:
+        SharedStream: the generation, read with subscribe(); its id
+         resumes it through resumeBusinessPlan.
+    """
+    modelId = decision.modelId if decision else self.modelId
+    key = self.cacheKey(businessInfo, modelId)
+    if slot is not None and key in self.inFlight.streams:
+      # The same plan started while this request waited for its slot
+      slot.release()
+      slot = None
+    stream = self.inFlight.join(
+        key, lambda: self.businessPlanQuery(businessInfo, slot, decision))
+    self.resumable.add(stream, {"model": modelId})
+    return stream
+
+  def resumeBusinessPlan(self, streamId, offset=0):
+    """Read the rest of a recent generation, without calling the model.
+
+    Args:
+        streamId (string): the id of the generation.
+        offset (int): characters of the plan the client already received.
+
+    Returns:
+        tuple: the remaining chunks and the metadata of the generation, or
+         None if it is unknown, evicted or was cancelled.
+
+    Raises:
+        ValueError: if the offset is past the text generated so far.
+    """
+    entry = self.resumable.get(streamId)
+    if entry is None:
+      return None
+    stream, metadata = entry
+    if not 0 <= offset <= stream.characters:
+      raise ValueError(f"Offset {offset} is outside the {stream.characters} "
+                       "characters generated so far")
+    return stream.resume(offset), metadata
+
+  # ---------------------------- Routing functions ---------------------------
+  def getChain(self, modelId):
+    """Get the business plan chain of a model, compiling it on first use.
+
+    Args:
+        modelId (string): the model id.
+
+    Returns:
+        Runnable: the prompt | model chain of the model.
+    """
+    if modelId not in self.chains:
+      self.chains[modelId] = self.prompt | ChatBedrock(
+          model_id=modelId,
+          client=self.client,
+          model_kwargs={
+              'max_tokens': self.maxTokens,
+              'temperature': self.temperature
+          })
+    return self.chains[modelId]
+
+  def routeBusinessPlan(self, businessInfo, tier=None):
+    """Pick the model of a business plan request.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        tier (string, optional): the user tier, defaults to the DEFAULT_TIER
+         of llmConfig
+
+    Returns:
+        RoutingDecision: the picked model and the request id.
+    """
+    # About four characters per token
+    promptTokens = len(businessInfo) // 4
+    return getModelRouter().route("pageBP", self.modelId, promptTokens, tier)
+
+  # ----------------------------- Cache functions ----------------------------
+  def cacheKey(self, businessInfo, modelId=None):
+    """Build the business plan cache key of a request to this service.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        modelId (string, optional): the model of the plan, defaults to the
+         default model
+
+    Returns:
+        string: the cache key.
+    """
+    return BusinessPlanCache.makeKey(businessInfo, modelId or self.modelId,
+                                     self.temperature, self.maxTokens)
+
+  def planId(self, businessInfo, modelId=None):
+    """Get the id of the stored plan of a request to this service.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        modelId (string, optional): the model of the plan, defaults to the
+         default model
+
+    Returns:
+        string: the input hash of the request, equal to its cache key.
+    """
+    return BusinessPlanStore.makeId(businessInfo, modelId or self.modelId,
+                                    self.temperature, self.maxTokens)
+
+  async def storedBusinessPlan(self, businessInfo, modelId=None):
+    """Look up the plan stored for the same request.
+
+    A stored plan is put back in the business plan cache, so the next
+    request for it is a cache hit.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        modelId (string, optional): the model of the plan, defaults to the
+         default model
+
+    Returns:
+        BusinessPlan: the stored plan, or None if there is none yet.
+    """
+    plan = await getBusinessPlanStore().get(self.planId(businessInfo, modelId))
+    if plan is not None:
+      await getBusinessPlanCache().store(self.cacheKey(businessInfo, modelId),
+                                         plan.content, plan.model)
+    return plan
+
+  async def cachedBusinessPlan(self, businessInfo, modelId=None):
+    """Look up a plan generated earlier for the same request.
+
+    Args:
+        businessInfo (string): the business information provided by the user.
+        modelId (string, optional): the model of the plan, defaults to the
+         default model
+
+    Returns:
+        string: the cached business plan, or None on a miss.
+    """
+    return await getBusinessPlanCache().get(
+        self.cacheKey(businessInfo, modelId))
 
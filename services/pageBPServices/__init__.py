@@ -9,5 +9,8 @@ Contact Information: mathteixeira55
 """
 
 from .PageBPService import PageBPService
+from .businessPlanCache import BusinessPlanCache, getBusinessPlanCache
+from .businessPlanStore import BusinessPlanStore, getBusinessPlanStore
 
-__all__ = ['PageBPService']
+__all__ = ['PageBPService', 'BusinessPlanCache', 'getBusinessPlanCache',
+           'BusinessPlanStore', 'getBusinessPlanStore']
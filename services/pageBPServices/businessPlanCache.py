@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: businessPlanCache.py
+Description: This module provides the BusinessPlanCache class, an exact-match
+ cache of generated business plans stored in MongoDB.
+Author: MathTeixeira
+Date: July 27, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import hashlib
+import json
+import logging
+import unicodedata
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from pymongo import ASCENDING, IndexModel, ReturnDocument, errors
+
+from core.config import pageBP
+from core.database import getAsyncNoSqlConn, getNoSqlIndexRegistry
+
+
+class BusinessPlanCache:
+  """
+  Cache of complete business plans, keyed by their normalized questionnaire.
+
+  A plan is only reused for the same questionnaire (after whitespace
+  normalization), model, temperature, token limit and PROMPT_VERSION. Plans
+  live in CACHE_COLLECTION_NAME, and a TTL index on `createdAt` lets MongoDB
+  evict them CACHE_TTL seconds after they were generated.
+
+  Attributes:
+    collectionName (str): The collection that stores the plans.
+    ttl (int): Seconds a plan is kept. 0 disables the cache.
+    chunkSize (int): Characters per chunk when a plan is replayed.
+    stats (dict): Hits, misses, stored plans and errors.
+  """
+
+  _instance: 'BusinessPlanCache | None' = None
+
+  def __init__(self,
+               collectionName: str = pageBP.CACHE_COLLECTION_NAME,
+               ttl: int = pageBP.CACHE_TTL,
+               chunkSize: int = pageBP.CACHE_REPLAY_CHUNK_SIZE) -> None:
+    """
+    Initialize the BusinessPlanCache instance.
+
+    Args:
+      collectionName (str): The collection that stores the plans. Defaults to
+       the CACHE_COLLECTION_NAME from pageBPConfig.
+      ttl (int): Seconds a plan is kept. Defaults to the CACHE_TTL from
+       pageBPConfig.
+      chunkSize (int): Characters per replayed chunk. Defaults to the
+       CACHE_REPLAY_CHUNK_SIZE from pageBPConfig.
+    """
+    self.collectionName: str = collectionName
+    self.ttl: int = ttl
+    self.chunkSize: int = chunkSize
+    self.stats: dict = {"hits": 0, "misses": 0, "stored": 0, "errors": 0}
+
+  @classmethod
+  def getInstance(cls) -> 'BusinessPlanCache':
+    """
+    Get the singleton instance of BusinessPlanCache.
+
+    Returns:
+      BusinessPlanCache: The singleton instance of BusinessPlanCache.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  @property
+  def enabled(self) -> bool:
+    """
+    bool: Whether plans are cached.
+    """
+    return self.ttl > 0
+
+  @staticmethod
+  def normalize(businessInfo: str) -> str:
+    """
+    Normalize a questionnaire so trivially different submissions match.
+
+    Unicode is NFC-normalized, runs of whitespace become one space, and blank
+    lines and leading/trailing whitespace are dropped. Case and punctuation
+    are kept, since they show up in the plan.
+
+    Args:
+      businessInfo (str): The questionnaire answers.
+
+    Returns:
+      str: The normalized questionnaire.
+    """
+    lines = (" ".join(line.split())
+             for line in unicodedata.normalize("NFC", businessInfo).splitlines())
+    return "\n".join(line for line in lines if line)
+
+  @staticmethod
+  def makeKey(businessInfo: str, model: str, temperature: float,
+              maxTokens: int) -> str:
+    """
+    Build the cache key of a business plan request.
+
+    Args:
+      businessInfo (str): The questionnaire answers.
+      model (str): The model ID.
+      temperature (float): The sampling temperature.
+      maxTokens (int): The output token limit.
+
+    Returns:
+      str: The SHA-256 hex digest of the normalized request.
+    """
+    request = json.dumps(
+        {
+            "businessInfo": BusinessPlanCache.normalize(businessInfo),
+            "model": model,
+            "temperature": temperature,
+            "maxTokens": maxTokens,
+            "promptVersion": pageBP.PROMPT_VERSION
+        },
+        sort_keys=True)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+  async def get(self, key: str) -> str | None:
+    """
+    Get a cached plan and count the hit.
+
+    Args:
+      key (str): The cache key.
+
+    Returns:
+      str | None: The plan, or None on a miss, an error or a disabled cache.
+    """
+    if not self.enabled:
+      return None
+    try:
+      cached = await getAsyncNoSqlConn().database[
+          self.collectionName].find_one_and_update(
+              {"_id": key}, {
+                  "$inc": {
+                      "hits": 1
+                  },
+                  "$set": {
+                      "lastHitAt": datetime.now(timezone.utc)
+                  }
+              },
+              projection={"content": 1},
+              return_document=ReturnDocument.AFTER)
+    except errors.PyMongoError as e:
+      self.stats["errors"] += 1
+      logging.error(f"Error reading cached business plan: {e}")
+      return None
+    self.stats["hits" if cached else "misses"] += 1
+    return cached["content"] if cached else None
+
+  async def store(self, key: str, content: str, model: str) -> None:
+    """
+    Cache a complete plan.
+
+    Two requests that missed at the same time both store their plan; the
+    later one replaces the earlier.
+
+    Args:
+      key (str): The cache key.
+      content (str): The complete plan.
+      model (str): The model ID, kept for inspection.
+    """
+    if not self.enabled or not content:
+      return
+    try:
+      await getAsyncNoSqlConn().database[self.collectionName].replace_one(
+          {"_id": key}, {
+              "content": content,
+              "model": model,
+              "promptVersion": pageBP.PROMPT_VERSION,
+              "createdAt": datetime.now(timezone.utc),
+              "hits": 0
+          },
+          upsert=True)
+      self.stats["stored"] += 1
+    except errors.PyMongoError as e:
+      self.stats["errors"] += 1
+      logging.error(f"Error caching business plan: {e}")
+
+  async def replay(self, content: str) -> AsyncIterator[str]:
+    """
+    Stream a cached plan back in chunks.
+
+    Args:
+      content (str): The cached plan.
+
+    Yields:
+      str: Chunks of at most `chunkSize` characters.
+    """
+    for start in range(0, len(content), self.chunkSize):
+      yield content[start:start + self.chunkSize]
+      # Let other requests run between chunks, like a live stream does
+      await asyncio.sleep(0)
+
+  def getStats(self) -> dict:
+    """
+    Get the cache counters.
+
+    Returns:
+      dict: Hits, misses, stored plans and errors.
+    """
+    return dict(self.stats)
+
+
+# MongoDB drops a plan CACHE_TTL seconds after it was generated. The index is
+# registered on import, before the lifespan applies the registry
+if pageBP.CACHE_TTL > 0:
+  getNoSqlIndexRegistry().register(
+      pageBP.CACHE_COLLECTION_NAME,
+      IndexModel([("createdAt", ASCENDING)],
+                 name="createdAt_ttl",
+                 expireAfterSeconds=pageBP.CACHE_TTL))
+
+# Alias for BusinessPlanCache.getInstance
+# This alias allows for easier access to the BusinessPlanCache singleton instance.
+getBusinessPlanCache = BusinessPlanCache.getInstance
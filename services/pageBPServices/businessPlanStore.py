@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: businessPlanStore.py
+Description: This module provides the BusinessPlanStore class, which keeps
+ every finished business plan in MongoDB, one per questionnaire.
+Author: MathTeixeira
+Date: August 2, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import logging
+from datetime import datetime, timezone
+
+from pymongo import DESCENDING, IndexModel, errors
+
+from core.config import pageBP
+from core.database import getAsyncNoSqlConn, getNoSqlIndexRegistry
+from models import BusinessPlan
+from .businessPlanCache import BusinessPlanCache
+
+
+class BusinessPlanStore:
+  """
+  Permanent store of finished business plans, deduplicated by input.
+
+  A plan is stored under its input hash, the same key as in
+  BusinessPlanCache: the normalized questionnaire, the model, its sampling
+  settings and the PROMPT_VERSION. Submitting the same questionnaire again
+  resolves to the stored plan only when it is routed to the same model with
+  the same settings; bumping PROMPT_VERSION starts new plans. The first plan
+  stored for an input is kept, and later ones (e.g. of two identical
+  requests generated at the same time) are dropped.
+
+  Unlike BusinessPlanCache, plans do not expire, and they can be read and
+  listed through the API. The cache stays in front of the store for the
+  plans requested most.
+
+  Attributes:
+    collectionName (str): The collection that stores the plans.
+    stats (dict): Plans found and not found, stored plans, duplicates
+     dropped and errors.
+  """
+
+  _instance: 'BusinessPlanStore | None' = None
+
+  def __init__(self,
+               collectionName: str = pageBP.PLANS_COLLECTION_NAME) -> None:
+    """
+    Initialize the BusinessPlanStore instance.
+
+    Args:
+      collectionName (str): The collection that stores the plans. Defaults to
+       the PLANS_COLLECTION_NAME from pageBPConfig.
+    """
+    self.collectionName: str = collectionName
+    self.stats: dict = {
+        "found": 0,
+        "notFound": 0,
+        "stored": 0,
+        "duplicates": 0,
+        "errors": 0
+    }
+
+  @classmethod
+  def getInstance(cls) -> 'BusinessPlanStore':
+    """
+    Get the singleton instance of BusinessPlanStore.
+
+    Returns:
+      BusinessPlanStore: The singleton instance of BusinessPlanStore.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  @staticmethod
+  def makeId(businessInfo: str, model: str, temperature: float,
+             maxTokens: int) -> str:
+    """
+    Build the input hash of a business plan request, the ID of its plan.
+
+    Args:
+      businessInfo (str): The questionnaire answers.
+      model (str): The model ID.
+      temperature (float): The sampling temperature.
+      maxTokens (int): The output token limit.
+
+    Returns:
+      str: The cache key of the request (see BusinessPlanCache.makeKey).
+    """
+    return BusinessPlanCache.makeKey(businessInfo, model, temperature,
+                                     maxTokens)
+
+  async def get(self, planId: str) -> BusinessPlan | None:
+    """
+    Get a stored plan.
+
+    Args:
+      planId (str): The input hash of the plan.
+
+    Returns:
+      BusinessPlan | None: The plan, or None if it is not stored or on an
+       error.
+    """
+    try:
+      document = await getAsyncNoSqlConn().database[
+          self.collectionName].find_one({"_id": planId})
+    except errors.PyMongoError as e:
+      self.stats["errors"] += 1
+      logging.error(f"Error reading business plan '{planId}': {e}")
+      return None
+    self.stats["found" if document else "notFound"] += 1
+    return BusinessPlan(**document) if document else None
+
+  async def save(self, planId: str, businessInfo: str, content: str,
+                 model: str) -> bool:
+    """
+    Store a finished plan, unless its input has one already.
+
+    Args:
+      planId (str): The input hash of the plan.
+      businessInfo (str): The questionnaire answers.
+      content (str): The complete plan.
+      model (str): The model that generated the plan.
+
+    Returns:
+      bool: True if the plan was stored, False if a plan of the same input
+       was stored first or on an error.
+    """
+    if not content:
+      return False
+    try:
+      result = await getAsyncNoSqlConn().database[
+          self.collectionName].update_one({"_id": planId}, {
+              "$setOnInsert": {
+                  "businessInfo": businessInfo,
+                  "content": content,
+                  "model": model,
+                  "promptVersion": pageBP.PROMPT_VERSION,
+                  "characters": len(content),
+                  "createdAt": datetime.now(timezone.utc)
+              }
+          },
+                                          upsert=True)
+    except errors.DuplicateKeyError:
+      # A concurrent upsert of the same input won
+      result = None
+    except errors.PyMongoError as e:
+      self.stats["errors"] += 1
+      logging.error(f"Error storing business plan '{planId}': {e}")
+      return False
+    stored = result is not None and result.upserted_id is not None
+    self.stats["stored" if stored else "duplicates"] += 1
+    return stored
+
+  async def list(self,
+                 limit: int,
+                 before: str | None = None
+                ) -> tuple[list[BusinessPlan], str | None]:
+    """
+    List stored plans, newest first, without their content.
+
+    Pages are read by keyset on (`createdAt`, `_id`), so a page costs the
+    same however deep it is.
+
+    Args:
+      limit (int): Maximum number of plans to return.
+      before (str, optional): ID of the last plan of the previous page.
+
+    Returns:
+      tuple[list[BusinessPlan], str | None]: The plans and the ID to pass as
+       `before` for the next page, None on the last page.
+
+    Raises:
+      ValueError: If `before` is not a stored plan.
+      PyMongoError: If the plans cannot be read.
+    """
+    plans = getAsyncNoSqlConn().database[self.collectionName]
+    query = {}
+    if before is not None:
+      last = await plans.find_one({"_id": before}, projection={"createdAt": 1})
+      if last is None:
+        raise ValueError(f"Business plan '{before}' not found")
+      query = {
+          "$or": [{
+              "createdAt": {
+                  "$lt": last["createdAt"]
+              }
+          }, {
+              "createdAt": last["createdAt"],
+              "_id": {
+                  "$lt": before
+              }
+          }]
+      }
+    cursor = plans.find(query, {"content": 0}).sort([("createdAt", DESCENDING),
+                                                     ("_id", DESCENDING)])
+    # One more than asked tells whether there is a next page
+    documents = [document async for document in cursor.limit(limit + 1)]
+    page = [BusinessPlan(**document) for document in documents[:limit]]
+    return page, page[-1].id if len(documents) > limit else None
+
+  def getStats(self) -> dict:
+    """
+    Get the store counters.
+
+    Returns:
+      dict: Plans found and not found, stored plans, duplicates dropped and
+       errors.
+    """
+    return dict(self.stats)
+
+
+# Plan lists are read newest first. The index is registered on import, before
+# the lifespan applies the registry
+getNoSqlIndexRegistry().register(
+    pageBP.PLANS_COLLECTION_NAME,
+    IndexModel([("createdAt", DESCENDING), ("_id", DESCENDING)],
+               name="createdAt_id_desc"))
+
+# Alias for BusinessPlanStore.getInstance
+# This alias allows for easier access to the BusinessPlanStore singleton instance.
+getBusinessPlanStore = BusinessPlanStore.getInstance
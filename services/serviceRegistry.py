@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: serviceRegistry.py
+Description: This module provides the ServiceRegistry class, which owns the
+ app-scoped Bedrock clients and LLM services shared by every request of a
+ worker.
+Author: MathTeixeira
+Date: July 22, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import logging
+import os
+import time
+import boto3
+from botocore.config import Config
+from starlette.requests import HTTPConnection
+
+from core.config import aws, ideation, pageBP
+from core.database import getAsyncNoSqlConn
+from core.llm import (getAdmissionController, getModelRouter,
+                      getResilienceController)
+from .ideationChatServices import (IdeationService, MessageListService,
+                                   getSessionCache)
+from .pageBPServices import (PageBPService, getBusinessPlanCache,
+                             getBusinessPlanStore)
+
+
+class ServiceRegistry:
+  """
+  Registry for the LLM-backed services of a worker process.
+
+  The registry is created once in the FastAPI lifespan and stored in
+  `app.serviceRegistry`. It builds one pooled boto3 client per (service,
+  region) pair and one instance of each service, so the ChatBedrock models,
+  prompt templates and compiled `prompt | model` chains are reused by every
+  request instead of being rebuilt per POST. boto3 clients and LangChain
+  runnables are safe to share between concurrent requests.
+
+  Attributes:
+    maxPoolConnections (int): Maximum pooled connections per boto3 client.
+    clients (dict[tuple[str, str], BaseClient]): Shared boto3 clients keyed by
+     (service name, region).
+    ideationService (IdeationService): Shared ideation chat service.
+    pageBPService (PageBPService): Shared 1-page business plan service.
+    startedAt (float): Epoch time at which the registry was started.
+  """
+
+  _instance: 'ServiceRegistry | None' = None
+
+  def __init__(self,
+               maxPoolConnections: int = aws.MAX_POOL_CONNECTIONS) -> None:
+    """
+    Initialize the ServiceRegistry instance.
+
+    Args:
+      maxPoolConnections (int): Maximum pooled connections per boto3 client.
+       Defaults to the MAX_POOL_CONNECTIONS from awsConfig.
+    """
+    self.maxPoolConnections: int = maxPoolConnections
+    self.clients: dict[tuple[str, str], object] = {}
+    self.ideationService: IdeationService | None = None
+    self.pageBPService: PageBPService | None = None
+    self.startedAt: float | None = None
+
+  @classmethod
+  def getInstance(cls) -> 'ServiceRegistry':
+    """
+    Get the singleton instance of ServiceRegistry.
+
+    Returns:
+      ServiceRegistry: The singleton instance of ServiceRegistry.
+    """
+    if cls._instance is None:
+      cls._instance = cls()
+    return cls._instance
+
+  def getBedrockClient(self, serviceName: str, region: str):
+    """
+    Get the shared boto3 client for a service and region, creating it once.
+
+    Args:
+      serviceName (str): The name of the AWS service (e.g. 'bedrock-runtime').
+      region (str): The AWS region of the service.
+
+    Returns:
+      BaseClient: The pooled boto3 client.
+    """
+    key = (serviceName, region)
+    if key not in self.clients:
+      self.clients[key] = boto3.client(
+          service_name=serviceName,
+          region_name=region,
+          aws_access_key_id=aws.AWS_ACCESS_KEY_ID,
+          aws_secret_access_key=aws.AWS_SECRET_ACCESS_KEY,
+          config=Config(max_pool_connections=self.maxPoolConnections),
+      )
+    return self.clients[key]
+
+  def startup(self) -> None:
+    """
+    Build the shared clients, models and chains.
+
+    This method is called once per worker from the FastAPI lifespan.
+    """
+    self.ideationService = IdeationService(client=self.getBedrockClient(
+        ideation.AWS_SERVICE_NAME, ideation.AWS_REGION))
+    self.pageBPService = PageBPService(client=self.getBedrockClient(
+        pageBP.AWS_SERVICE_NAME, pageBP.AWS_REGION))
+    self.startedAt = time.time()
+    print("Service registry started.")
+
+  async def shutdown(self) -> None:
+    """
+    Close the shared services and clients.
+
+    Chat turns still in the write queue are written before anything is
+    closed. This method is called once per worker from the FastAPI lifespan.
+    """
+    if not await MessageListService.flushWriteQueues():
+      logging.error("Some queued chat messages could not be written")
+    if self.ideationService is not None:
+      await self.ideationService.summarizer.drain()
+    for client in self.clients.values():
+      client.close()
+    self.clients.clear()
+    await getSessionCache().close()
+    print("Service registry closed.")
+
+  def getStats(self) -> dict:
+    """
+    Get the pool statistics of this worker.
+
+    Returns:
+      dict: The worker PID, uptime, shared clients, per-service stream
+       counters, history trimming and summary memory totals, the ideation
+       WebSocket counters, the chat turn write queues (depth and flush
+       times), the chat answer checkpoints, the session and business plan
+       cache counters, the business plan store counters, the coalesced and
+       resumable business plan generations, the model
+       admission gates, the retry, hedge and circuit breaker counters of each
+       model, the routing decisions and the checked query shapes (True when
+       they scan a whole collection).
+    """
+    services = {
+        "ideation": self.ideationService,
+        "pageBP": self.pageBPService,
+    }
+    return {
+        "pid": os.getpid(),
+        "uptime": time.time() - self.startedAt if self.startedAt else 0.0,
+        "clients": [{
+            "service": serviceName,
+            "region": region,
+            "maxPoolConnections": client.meta.config.max_pool_connections,
+        } for (serviceName, region), client in self.clients.items()],
+        "services": {
+            name: {
+                "activeStreams": service.activeStreams,
+                "totalStreams": service.totalStreams,
+            } for name, service in services.items() if service is not None
+        },
+        "historyTrimming": dict(self.ideationService.trimStats)
+                           if self.ideationService else {},
+        "summaryMemory": dict(self.ideationService.summarizer.stats)
+                         if self.ideationService else {},
+        "ideationSockets": dict(self.ideationService.socketStats)
+                           if self.ideationService else {},
+        "messageWriteQueues": MessageListService.getWriteQueueStats(),
+        "chatCheckpoints": dict(self.ideationService.checkpointStats)
+                           if self.ideationService else {},
+        "sessionCache": getSessionCache().getStats(),
+        "businessPlanCache": getBusinessPlanCache().getStats(),
+        "businessPlanStore": getBusinessPlanStore().getStats(),
+        "businessPlanSingleFlight": self.pageBPService.inFlight.getStats()
+                                    if self.pageBPService else {},
+        "businessPlanResumable": self.pageBPService.resumable.getStats()
+                                 if self.pageBPService else {},
+        "admission": getAdmissionController().getStats(),
+        "resilience": getResilienceController().getStats(),
+        "routing": getModelRouter().getStats(),
+        "queryPlans": dict(getAsyncNoSqlConn().queryPlans),
+    }
+
+
+def getIdeationService(request: HTTPConnection) -> IdeationService:
+  """
+  FastAPI dependency that returns the worker's shared IdeationService.
+
+  Args:
+    request (HTTPConnection): The incoming request or WebSocket.
+
+  Returns:
+    IdeationService: The shared ideation service.
+  """
+  return request.app.serviceRegistry.ideationService
+
+
+def getPageBPService(request: HTTPConnection) -> PageBPService:
+  """
+  FastAPI dependency that returns the worker's shared PageBPService.
+
+  Args:
+    request (HTTPConnection): The incoming request or WebSocket.
+
+  Returns:
+    PageBPService: The shared business plan service.
+  """
+  return request.app.serviceRegistry.pageBPService
+
+
+# Alias for ServiceRegistry.getInstance
+getServiceRegistry = ServiceRegistry.getInstance
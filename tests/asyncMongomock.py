@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: asyncMongomock.py
+Description: An in-memory stand-in for PyMongo's async database, built on
+ mongomock, for tests of the services that await MongoDB.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import types
+
+import mongomock
+from pymongo import InsertOne, ReturnDocument, UpdateOne, errors
+
+
+def evaluate(expression, document: dict):
+  """
+  Evaluate the aggregation expressions the services use in pipeline updates.
+
+  Args:
+    expression: The expression: a '$field' path, an operator or a literal.
+    document (dict): The document the fields are read from.
+
+  Returns:
+    The value of the expression.
+
+  Raises:
+    NotImplementedError: If the expression uses an unsupported operator.
+  """
+  if isinstance(expression, str) and expression.startswith("$"):
+    return document[expression[1:]]
+  if isinstance(expression, list):
+    return [evaluate(item, document) for item in expression]
+  if not isinstance(expression, dict):
+    return expression
+  if len(expression) != 1 or not next(iter(expression)).startswith("$"):
+    return {key: evaluate(value, document) for key, value in expression.items()}
+
+  operator, arguments = next(iter(expression.items()))
+  if operator == "$literal":
+    return arguments
+  if operator == "$cond":
+    condition, whenTrue, whenFalse = arguments
+    return evaluate(whenTrue if evaluate(condition, document) else whenFalse,
+                    document)
+  values = evaluate(arguments, document)
+  if operator == "$gt":
+    return values[0] > values[1]
+  if operator == "$subtract":
+    return values[0] - values[1]
+  if operator == "$max":
+    return max(values)
+  if operator == "$min":
+    return min(values)
+  if operator == "$concatArrays":
+    return [item for array in values for item in array]
+  if operator == "$slice":
+    return values[0][:values[1]]
+  raise NotImplementedError(f"Unsupported operator: {operator}")
+
+
+def project(document: dict, projection: dict) -> dict:
+  """
+  Apply an inclusion projection, with `$slice`, to a document.
+
+  Args:
+    document (dict): The full document.
+    projection (dict): The projection.
+
+  Returns:
+    dict: The projected document.
+  """
+  projected = {"_id": document["_id"]} if projection.get("_id", 1) else {}
+  for field, value in projection.items():
+    if field == "_id" or field not in document:
+      continue
+    if isinstance(value, dict) and "$slice" in value:
+      length = value["$slice"]
+      projected[field] = (document[field][length:]
+                          if length < 0 else document[field][:length])
+    elif value:
+      projected[field] = document[field]
+  return projected
+
+
+class AsyncCursor:
+  """
+  An async iterator over a mongomock cursor.
+
+  Attributes:
+    cursor (mongomock.collection.Cursor): The wrapped cursor.
+  """
+
+  def __init__(self, cursor) -> None:
+    self.cursor = cursor
+
+  def sort(self, *args, **kwargs) -> 'AsyncCursor':
+    self.cursor = self.cursor.sort(*args, **kwargs)
+    return self
+
+  def limit(self, limit: int) -> 'AsyncCursor':
+    self.cursor = self.cursor.limit(limit)
+    return self
+
+  def __aiter__(self) -> 'AsyncCursor':
+    self.documents = iter(self.cursor)
+    return self
+
+  async def __anext__(self) -> dict:
+    try:
+      return next(self.documents)
+    except StopIteration:
+      raise StopAsyncIteration
+
+  async def to_list(self, length: int | None = None) -> list[dict]:
+    return list(self.cursor)[:length]
+
+
+class AsyncCollection:
+  """
+  An async collection over a mongomock one.
+
+  Every operation yields to the event loop once and then runs without
+  yielding again, so concurrent tasks interleave between operations and each
+  operation is atomic, as on a server.
+
+  Attributes:
+    collection (mongomock.Collection): The wrapped collection.
+  """
+
+  def __init__(self, collection) -> None:
+    self.collection = collection
+
+  def find(self, *args, **kwargs) -> AsyncCursor:
+    kwargs.pop("batch_size", None)
+    return AsyncCursor(self.collection.find(*args, **kwargs))
+
+  async def find_one_and_update(self,
+                                filter: dict,
+                                update: dict | list,
+                                projection: dict | None = None,
+                                sort: list | None = None,
+                                return_document: bool = ReturnDocument.BEFORE,
+                                **kwargs) -> dict | None:
+    await asyncio.sleep(0)
+    if not isinstance(update, list):
+      return self.collection.find_one_and_update(
+          filter,
+          update,
+          projection=projection,
+          sort=sort,
+          return_document=return_document,
+          **kwargs)
+    # mongomock has no pipeline updates: apply the $set stages here
+    cursor = self.collection.find(filter)
+    if sort:
+      cursor = cursor.sort(sort)
+    matches = list(cursor.limit(1))
+    if not matches:
+      return None
+    before = after = matches[0]
+    for stage in update:
+      after = {
+          **after,
+          **{
+              field: evaluate(expression, after)
+              for field, expression in stage["$set"].items()
+          }
+      }
+    self.collection.replace_one({"_id": before["_id"]}, after)
+    document = after if return_document == ReturnDocument.AFTER else before
+    return project(document, projection) if projection else document
+
+  async def bulk_write(self, requests: list, ordered: bool = True):
+    # mongomock cannot read PyMongo's request objects: apply them one by one
+    await asyncio.sleep(0)
+    inserted = modified = 0
+    writeErrors = []
+    for index, request in enumerate(requests):
+      if isinstance(request, InsertOne):
+        try:
+          self.collection.insert_one(request._doc)
+          inserted += 1
+        except errors.DuplicateKeyError as e:
+          writeErrors.append({"index": index, "code": 11000, "errmsg": str(e)})
+          if ordered:
+            break
+      elif isinstance(request, UpdateOne):
+        modified += self.collection.update_one(
+            request._filter, request._doc, upsert=bool(
+                request._upsert)).modified_count
+    if writeErrors:
+      raise errors.BulkWriteError({
+          "nInserted": inserted,
+          "nModified": modified,
+          "writeErrors": writeErrors
+      })
+    return types.SimpleNamespace(inserted_count=inserted,
+                                 modified_count=modified)
+
+  def __getattr__(self, name: str):
+    operation = getattr(self.collection, name)
+
+    async def run(*args, **kwargs):
+      await asyncio.sleep(0)
+      return operation(*args, **kwargs)
+
+    return run
+
+
+class AsyncDatabase:
+  """
+  An async database over a mongomock one.
+
+  Attributes:
+    database (mongomock.Database): The wrapped database.
+  """
+
+  def __init__(self, database=None) -> None:
+    self.database = database or mongomock.MongoClient()["test"]
+
+  def __getitem__(self, name: str) -> AsyncCollection:
+    return AsyncCollection(self.database[name])
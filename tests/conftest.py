@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: conftest.py
+Description: Shared pytest setup and fixtures. The config modules read their
+ credentials on import, so dummy values are set before any test imports the
+ app.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import os
+
+import pytest
+
+for key, value in {
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "NO_SQL_USERNAME": "test",
+    "NO_SQL_PASSWORD": "test",
+    "NO_SQL_NAME": "test",
+    "SQL_USERNAME": "test",
+    "SQL_PASSWORD": "test",
+    "SQL_HOST": "localhost",
+    "SQL_PORT": "5432",
+    "SQL_NAME": "test",
+}.items():
+  os.environ.setdefault(key, value)
+
+
+@pytest.fixture
+def noSqlDatabase(monkeypatch):
+  """
+  Point the async NoSql connection at an empty in-memory database.
+
+  Yields:
+    AsyncDatabase: The in-memory database.
+  """
+  from core.database.asyncNoSqlDatabase import AsyncNoSqlConnection
+  from tests.asyncMongomock import AsyncDatabase
+
+  # The client connects lazily, so it never reaches this URL
+  connection = AsyncNoSqlConnection("mongodb://localhost:27017", "test")
+  connection.database = AsyncDatabase()
+  monkeypatch.setattr(AsyncNoSqlConnection, "_instance", connection)
+  yield connection.database
+
+
+@pytest.fixture
+def sessionCache(monkeypatch):
+  """
+  Give each test its own in-memory session cache.
+
+  Yields:
+    SessionCache: The session cache.
+  """
+  from core.cache import MemoryCacheBackend
+  from services.ideationChatServices.sessionCache import SessionCache
+
+  cache = SessionCache(backend=MemoryCacheBackend(1000, 60))
+  monkeypatch.setattr(SessionCache, "_instance", cache)
+  yield cache
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: test_cacheBackend.py
+Description: Tests of the memory and Redis cache backends. The Redis backend
+ runs against fakeredis.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+
+import pytest
+from fakeredis import FakeServer, aioredis
+
+from core.cache import MemoryCacheBackend
+from core.cache.redisCacheBackend import RedisCacheBackend
+from models import Message
+
+
+def makeBackend(kind: str):
+  if kind == "memory":
+    return MemoryCacheBackend(100, 60)
+  return RedisCacheBackend(aioredis.FakeRedis(server=FakeServer()))
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+def test_valuesRoundTrip(kind):
+
+  async def run():
+    backend = makeBackend(kind)
+    message = Message(type="human", content="Hello")
+    await backend.set("header", {"_id": "s1", "model": "m"}, 60)
+    await backend.setMany({"a": [message], "b": 2}, 60)
+    assert await backend.get("header") == {"_id": "s1", "model": "m"}
+    a, b, missing = await backend.getMany(["a", "b", "missing"])
+    assert [Message.model_validate(m) for m in a] == [message]
+    assert (b, missing) == (2, None)
+    await backend.delete("b")
+    assert await backend.get("b") is None
+    await backend.close()
+
+  asyncio.run(run())
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+def test_incrStartsAtStartAndAdds(kind):
+
+  async def run():
+    backend = makeBackend(kind)
+    assert await backend.incr("counter", 0, 10, 60) == 10
+    assert await backend.incr("counter", 5, 99, 60) == 15
+    assert await backend.incr("counter", -2, 99, 60) == 13
+    assert await backend.incr("counter", 0, 99, 60) == 13
+    await backend.close()
+
+  asyncio.run(run())
+
+
+@pytest.mark.parametrize("kind", ["memory", "redis"])
+def test_readingACounterDoesNotKeepItAlive(kind):
+
+  async def run():
+    backend = makeBackend(kind)
+    await backend.incr("counter", 1, 10, 0.2)
+    await asyncio.sleep(0.12)
+    assert await backend.incr("counter", 0, 50, 0.2) == 11
+    await asyncio.sleep(0.12)
+    # Expired 0.2s after the last change, although it was read since
+    assert await backend.incr("counter", 0, 50, 0.2) == 50
+    await backend.close()
+
+  asyncio.run(run())
+
+
+def test_redisFailuresAnswerLikeAnEmptyCache():
+
+  async def run():
+    server = FakeServer()
+    backend = RedisCacheBackend(aioredis.FakeRedis(server=server))
+    await backend.set("key", 1, 60)
+    server.connected = False
+    assert await backend.get("key") is None
+    assert await backend.getMany(["key", "other"]) == [None, None]
+    assert await backend.incr("counter", 1, 0, 60) is None
+    await backend.set("key", 2, 60)
+    await backend.setMany({"key": 3}, 60)
+    await backend.delete("key")
+    assert backend.getStats() == {"errors": 6}
+    server.connected = True
+    assert await backend.get("key") == 1
+
+  asyncio.run(run())
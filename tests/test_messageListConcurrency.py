@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: test_messageListConcurrency.py
+Description: Tests of concurrent pops, truncations and replacements of the
+ messages of one chat session.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+
+import pytest
+
+from models import Message
+from services.ideationChatServices.messageListService import MessageListService
+
+COLLECTION = "chatHistories"
+SESSION = "session-1"
+MESSAGES = 23
+BUCKET_SIZE = 5
+
+
+@pytest.fixture
+def buckets(noSqlDatabase, sessionCache):
+  """
+  Seed a session of MESSAGES messages in buckets of BUCKET_SIZE.
+
+  Returns:
+    AsyncCollection: The bucket collection.
+  """
+  buckets = noSqlDatabase[MessageListService.bucketCollectionName(COLLECTION)]
+  messages = [{
+      "type": "human",
+      "content": f"message {i}",
+      "complete": True
+  } for i in range(MESSAGES)]
+  asyncio.run(
+      buckets.insert_many(
+          MessageListService.bucketDocuments(SESSION, messages, BUCKET_SIZE)))
+  return buckets
+
+
+def stored(buckets) -> list[str]:
+  """
+  Read back the session, checking each bucket count against its messages.
+
+  Returns:
+    list[str]: The contents of the stored messages, in order.
+  """
+  documents = buckets.collection.find(
+      MessageListService.bucketRange(SESSION)).sort("_id", 1)
+  contents = []
+  for bucket in documents:
+    assert bucket["count"] == len(bucket["messages"])
+    contents += [message["content"] for message in bucket["messages"]]
+  return contents
+
+
+def bucketCount(buckets) -> int:
+  return sum(bucket["count"] for bucket in buckets.collection.find(
+      MessageListService.bucketRange(SESSION)))
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 7])
+def test_concurrentPopsReturnEveryMessageOnce(buckets, count):
+  tasks = MESSAGES // count + 2
+
+  async def popAll():
+    return await asyncio.gather(*[
+        MessageListService.popMessages(COLLECTION, SESSION, count)
+        for _ in range(tasks)
+    ])
+
+  results = asyncio.run(popAll())
+  popped = [message.content for result in results for message in result]
+  assert sorted(popped) == sorted(f"message {i}" for i in range(MESSAGES))
+  assert all(len(result) <= count for result in results)
+  assert bucketCount(buckets) == 0
+  assert stored(buckets) == []
+
+
+def test_concurrentSinglePopsReturnEveryMessageOnce(buckets):
+
+  async def popAll():
+    return await asyncio.gather(*[
+        MessageListService.popMessage(COLLECTION, SESSION)
+        for _ in range(MESSAGES + 3)
+    ])
+
+  results = asyncio.run(popAll())
+  popped = [message.content for message in results if message is not None]
+  assert sorted(popped) == sorted(f"message {i}" for i in range(MESSAGES))
+  assert bucketCount(buckets) == 0
+
+
+def test_concurrentTruncationsKeepTheShortestPrefix(buckets):
+  indexes = [17, 3, 12, 8, 21, 6]
+
+  async def truncateAll():
+    return await asyncio.gather(*[
+        MessageListService.truncateMessages(COLLECTION, SESSION, index)
+        for index in indexes
+    ])
+
+  results = asyncio.run(truncateAll())
+  assert None not in results
+  assert stored(buckets) == [f"message {i}" for i in range(min(indexes))]
+  assert bucketCount(buckets) == min(indexes)
+
+
+def test_concurrentReplacementsReplaceEachMessageOnce(buckets):
+  replacements = [
+      Message(type="ai", content=f"replacement {i}") for i in range(8)
+  ]
+
+  async def replaceAll():
+    return await asyncio.gather(*[
+        MessageListService.replaceLastMessage(COLLECTION, SESSION, message)
+        for message in replacements
+    ])
+
+  results = asyncio.run(replaceAll())
+  replaced = [message.content for message in results]
+  contents = stored(buckets)
+  # Each replacement is replaced by the next one, except the one kept
+  assert len(contents) == MESSAGES
+  assert contents[:-1] == [f"message {i}" for i in range(MESSAGES - 1)]
+  assert sorted(replaced + [contents[-1]]) == sorted(
+      [f"message {MESSAGES - 1}"] +
+      [message.content for message in replacements])
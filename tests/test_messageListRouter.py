@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: test_messageListRouter.py
+Description: Tests of the status codes of the message list endpoints.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import messageListRouter
+from services import ChatHistoryRepository
+from services.ideationChatServices.messageListService import MessageListService
+
+COLLECTION = "chatHistories"
+SESSION = "session-1"
+
+
+@pytest.fixture
+def client(noSqlDatabase, sessionCache):
+  """
+  Serve the message list endpoints on an empty in-memory database.
+
+  Yields:
+    TestClient: The client of the endpoints.
+  """
+  app = FastAPI()
+  app.include_router(messageListRouter, prefix="/api/messages")
+  with TestClient(app) as client:
+    yield client
+
+
+def seed(noSqlDatabase, count: int) -> None:
+  buckets = noSqlDatabase[MessageListService.bucketCollectionName(COLLECTION)]
+  messages = [{
+      "type": "human",
+      "content": f"message {i}",
+      "complete": True
+  } for i in range(count)]
+  asyncio.run(
+      buckets.insert_many(MessageListService.bucketDocuments(
+          SESSION, messages)))
+
+
+def test_popMessagesFromEmptySessionReturnsEmptyList(client):
+  response = client.delete(f"/api/messages/pop/{COLLECTION}/{SESSION}/3")
+  assert response.status_code == 200
+  assert response.json()["message"] == []
+
+
+def test_popMessagesReturnsWhatIsLeft(client, noSqlDatabase):
+  seed(noSqlDatabase, 2)
+  response = client.delete(f"/api/messages/pop/{COLLECTION}/{SESSION}/3")
+  assert response.status_code == 200
+  assert [message["content"] for message in response.json()["message"]
+         ] == ["message 0", "message 1"]
+
+
+def test_popMessagesFailureIsNotWrappedTwice(client, monkeypatch):
+
+  async def failingPop(collectionName, sessionId, count):
+    return None
+
+  monkeypatch.setattr(ChatHistoryRepository, "popMessages", failingPop)
+  response = client.delete(f"/api/messages/pop/{COLLECTION}/{SESSION}/3")
+  assert response.status_code == 500
+  assert response.json()["detail"] == "Failed to pop messages"
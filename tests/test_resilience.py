@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: test_resilience.py
+Description: Tests of the retries, hedging and circuit breaker of the model
+ calls, with a scripted fake streaming model.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+import time
+
+import pytest
+
+from core.config import llm
+from core.llm import CircuitOpen, ResilienceController
+from core.llm.admissionController import AdmissionController, ModelGate
+from core.llm.resilience import CircuitBreaker, ResilientModel
+
+MODEL = "test-model"
+THROTTLE = "An error occurred (ThrottlingException): Too many requests"
+
+
+class ScriptedModel:
+  """
+  A streaming model whose calls follow a script, one entry per call.
+
+  An entry is a list of steps: a float waits that many seconds, an exception
+  is raised and anything else is yielded as a chunk.
+
+  Attributes:
+    script (list[list]): The steps of each call, in call order.
+    startedAt (list[float]): When each call started.
+    cancelled (list[int]): The calls closed or cancelled before their end.
+  """
+
+  def __init__(self, *script: list) -> None:
+    self.script: list[list] = list(script)
+    self.startedAt: list[float] = []
+    self.cancelled: list[int] = []
+
+  def __call__(self):
+    return self.call(len(self.startedAt))
+
+  async def call(self, index: int):
+    self.startedAt.append(time.perf_counter())
+    try:
+      for step in self.script[index]:
+        if isinstance(step, float):
+          await asyncio.sleep(step)
+        elif isinstance(step, BaseException):
+          raise step
+        else:
+          yield step
+    except (GeneratorExit, asyncio.CancelledError):
+      self.cancelled.append(index)
+      raise
+
+
+@pytest.fixture
+def gate(monkeypatch):
+  """
+  Give the model a fresh admission gate of two slots and fast test settings.
+
+  Returns:
+    ModelGate: The gate of the model.
+  """
+  controller = AdmissionController()
+  controller.gates[MODEL] = ModelGate(MODEL, 2, 0, 1)
+  monkeypatch.setattr(AdmissionController, "_instance", controller)
+  monkeypatch.setattr(llm, "RETRY_ATTEMPTS", 2)
+  monkeypatch.setattr(llm, "RETRY_BASE_DELAY", 0.01)
+  monkeypatch.setattr(llm, "RETRY_MAX_DELAY", 0.01)
+  monkeypatch.setattr(llm, "FIRST_CHUNK_TIMEOUT", 1.0)
+  monkeypatch.setattr(llm, "HEDGE_ENABLED", False)
+  monkeypatch.setattr(llm, "BREAKER_FAILURE_THRESHOLD", 2)
+  monkeypatch.setattr(llm, "BREAKER_RESET_TIMEOUT", 0.1)
+  return controller.gates[MODEL]
+
+
+async def collect(model: ResilientModel, scripted: ScriptedModel) -> list:
+  return [chunk async for chunk in model.stream(scripted)]
+
+
+def test_throttleBeforeTheFirstChunkIsRetried(gate):
+  model = ResilientModel(MODEL)
+  scripted = ScriptedModel([Exception(THROTTLE)], [Exception(THROTTLE)],
+                           ["a", "b"])
+
+  assert asyncio.run(collect(model, scripted)) == ["a", "b"]
+  assert len(scripted.startedAt) == 3
+  assert model.stats["retries"] == 2
+  assert model.breaker.getStats()["state"] == "closed"
+
+
+def test_retriesAreBounded(gate):
+  model = ResilientModel(MODEL)
+  scripted = ScriptedModel(*[[Exception(THROTTLE)]] * 5)
+
+  with pytest.raises(Exception, match="ThrottlingException"):
+    asyncio.run(collect(model, scripted))
+  assert len(scripted.startedAt) == llm.RETRY_ATTEMPTS + 1
+  assert model.stats["failures"] == 1
+
+
+def test_throttleAfterTheFirstChunkIsNeverRetried(gate):
+  model = ResilientModel(MODEL)
+  scripted = ScriptedModel(["a", Exception(THROTTLE)], ["b"])
+  received = []
+
+  async def run():
+    async for chunk in model.stream(scripted):
+      received.append(chunk)
+
+  with pytest.raises(Exception, match="ThrottlingException"):
+    asyncio.run(run())
+  assert received == ["a"]
+  assert len(scripted.startedAt) == 1
+  assert model.stats["retries"] == 0
+  assert model.stats["failures"] == 1
+
+
+def test_validationErrorIsNotRetried(gate):
+  model = ResilientModel(MODEL)
+  scripted = ScriptedModel([ValueError("ValidationException: bad input")],
+                           ["a"])
+
+  with pytest.raises(ValueError):
+    asyncio.run(collect(model, scripted))
+  assert len(scripted.startedAt) == 1
+  assert model.breaker.failures == 0
+
+
+def enableHedging(monkeypatch, model: ResilientModel, delay: float) -> None:
+  monkeypatch.setattr(llm, "HEDGE_ENABLED", True)
+  monkeypatch.setattr(llm, "HEDGE_MIN_SAMPLES", 5)
+  monkeypatch.setattr(llm, "HEDGE_PERCENTILE", 95)
+  monkeypatch.setattr(llm, "HEDGE_MIN_DELAY", delay)
+  model.firstChunkSeconds.extend([0.001] * 5)
+
+
+def test_hedgeFiresAfterTheDelayAndCancelsTheLoser(gate, monkeypatch):
+  model = ResilientModel(MODEL)
+  enableHedging(monkeypatch, model, 0.05)
+  scripted = ScriptedModel([0.5, "slow"], ["fast", "er"])
+
+  assert asyncio.run(collect(model, scripted)) == ["fast", "er"]
+  assert scripted.startedAt[1] - scripted.startedAt[0] >= 0.05
+  assert scripted.cancelled == [0]
+  assert model.stats["hedged"] == 1
+  assert model.stats["hedgeWins"] == 1
+  # The slot of the hedge is given back with the stream
+  assert gate.active == 0
+
+
+def test_primaryWinningCancelsTheHedge(gate, monkeypatch):
+  model = ResilientModel(MODEL)
+  enableHedging(monkeypatch, model, 0.05)
+  scripted = ScriptedModel([0.1, "primary"], [0.5, "hedge"])
+
+  assert asyncio.run(collect(model, scripted)) == ["primary"]
+  assert scripted.cancelled == [1]
+  assert (model.stats["hedged"], model.stats["hedgeWins"]) == (1, 0)
+  assert gate.active == 0
+
+
+def test_noHedgeWithoutASpareSlot(gate, monkeypatch):
+  model = ResilientModel(MODEL)
+  enableHedging(monkeypatch, model, 0.02)
+  gate.active = gate.limit
+  scripted = ScriptedModel([0.1, "slow"], ["fast"])
+
+  assert asyncio.run(collect(model, scripted)) == ["slow"]
+  assert len(scripted.startedAt) == 1
+  assert model.stats["hedged"] == 0
+
+
+def test_breakerOpensThenHalfOpensThenCloses():
+  breaker = CircuitBreaker(MODEL, 2, 0.05)
+  breaker.recordFailure()
+  breaker.check()
+  breaker.recordFailure()
+  assert breaker.state == "open"
+  with pytest.raises(CircuitOpen):
+    breaker.check()
+
+  time.sleep(0.06)
+  breaker.check()
+  assert breaker.state == "halfOpen"
+  # Only one trial call at a time
+  with pytest.raises(CircuitOpen):
+    breaker.check()
+  breaker.recordSuccess()
+  assert breaker.state == "closed"
+  breaker.check()
+  assert breaker.getStats() == {
+      "state": "closed",
+      "failures": 0,
+      "opened": 1,
+      "rejected": 2
+  }
+
+
+def test_failedTrialOpensTheBreakerAgain():
+  breaker = CircuitBreaker(MODEL, 2, 0.05)
+  breaker.recordFailure()
+  breaker.recordFailure()
+  time.sleep(0.06)
+  breaker.check()
+  breaker.recordFailure()
+  assert breaker.state == "open"
+  assert breaker.stats["opened"] == 2
+  with pytest.raises(CircuitOpen):
+    breaker.check()
+
+
+def test_failingCallsTripTheBreakerOfTheModel(gate, monkeypatch):
+  monkeypatch.setattr(llm, "RETRY_ATTEMPTS", 0)
+  controller = ResilienceController()
+
+  async def call(scripted: ScriptedModel) -> list:
+    slot = await controller.admit(MODEL, 0)
+    try:
+      return [chunk async for chunk in controller.stream(MODEL, scripted)]
+    finally:
+      slot.release()
+
+  async def run():
+    for _ in range(llm.BREAKER_FAILURE_THRESHOLD):
+      with pytest.raises(Exception, match="ThrottlingException"):
+        await call(ScriptedModel([Exception(THROTTLE)]))
+    breaker = controller.getModel(MODEL).breaker
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+      await call(ScriptedModel(["never"]))
+
+    await asyncio.sleep(llm.BREAKER_RESET_TIMEOUT)
+    assert await call(ScriptedModel(["ok"])) == ["ok"]
+    assert breaker.state == "closed"
+
+  asyncio.run(run())
+  assert gate.active == 0
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: test_sessionCache.py
+Description: Tests of the version protocol of the SessionCache, with two
+ workers sharing a memory or a Redis (fakeredis) backend.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+
+import pytest
+from fakeredis import FakeServer, aioredis
+
+from core.cache import MemoryCacheBackend
+from core.cache.redisCacheBackend import RedisCacheBackend
+from models import Message
+from services.ideationChatServices.sessionCache import IN_FLIGHT, SessionCache
+
+COLLECTION = "chatHistories"
+SESSION = "session-1"
+FIRST = [Message(type="human", content="Hello")]
+SECOND = FIRST + [Message(type="ai", content="Hi!")]
+
+
+def makeWorkers(kind: str,
+                ttl: float = 60) -> tuple[SessionCache, SessionCache]:
+  """
+  Create the session caches of two workers sharing one store.
+
+  Memory backends are per worker in production; sharing one here runs the
+  same protocol as a shared Redis server.
+
+  Args:
+    kind (str): 'memory' or 'redis'.
+    ttl (float): Seconds an entry stays valid.
+
+  Returns:
+    tuple[SessionCache, SessionCache]: The two workers.
+  """
+  if kind == "memory":
+    backend = MemoryCacheBackend(100, ttl)
+    return SessionCache(backend, ttl), SessionCache(backend, ttl)
+  server = FakeServer()
+  return tuple(
+      SessionCache(RedisCacheBackend(aioredis.FakeRedis(server=server)), ttl)
+      for _ in range(2))
+
+
+async def readThrough(worker: SessionCache,
+                      database: list[Message]) -> list[Message]:
+  """
+  Read the messages of the session like the services do.
+
+  Args:
+    worker (SessionCache): The worker reading.
+    database (list[Message]): The messages stored in the database.
+
+  Returns:
+    list[Message]: The cached messages, or the database ones on a miss.
+  """
+  version = await worker.getVersion(COLLECTION, SESSION)
+  cached = await worker.getMessages(COLLECTION, SESSION, version)
+  if cached is not None:
+    return cached
+  await worker.storeMessages(COLLECTION, SESSION, database, version)
+  return list(database)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def kind(request):
+  return request.param
+
+
+def test_writeOnOneWorkerUpdatesTheOther(kind):
+
+  async def run():
+    a, b = makeWorkers(kind)
+    assert await readThrough(b, FIRST) == FIRST
+    assert await readThrough(b, FIRST) == FIRST
+    assert b.stats["hits"] == 1
+
+    async with a.write(COLLECTION, SESSION) as write:
+      write.commit(updateMessages=lambda cached: cached.append(SECOND[-1]))
+    # Written through under the new version: B never sees FIRST again
+    assert await readThrough(b, FIRST) == SECOND
+    assert b.stats["hits"] == 2
+
+  asyncio.run(run())
+
+
+def test_failedWriteDropsTheSession(kind):
+
+  async def run():
+    a, b = makeWorkers(kind)
+    await readThrough(b, FIRST)
+    async with a.write(COLLECTION, SESSION):
+      pass  # The database write failed and did not commit
+    assert await readThrough(b, SECOND) == SECOND
+    assert b.stats["misses"] == 2
+
+  asyncio.run(run())
+
+
+def test_readDuringAWriteIsNotStored(kind):
+
+  async def run():
+    a, b = makeWorkers(kind)
+    await readThrough(b, FIRST)
+    write = await a.beginWrite(COLLECTION, SESSION)
+    assert write.version // IN_FLIGHT == 1
+
+    version = await b.getVersion(COLLECTION, SESSION)
+    assert version == write.version
+    assert await b.getMessages(COLLECTION, SESSION, version) is None
+    # B read the database while the write was running
+    await b.storeMessages(COLLECTION, SESSION, FIRST, version)
+    assert b.stats["busyStoresSkipped"] == 1
+
+    write.commit(updateMessages=lambda cached: cached.append(SECOND[-1]))
+    await a.endWrite(write)
+    assert (await b.getVersion(COLLECTION, SESSION)) // IN_FLIGHT == 0
+    assert await readThrough(b, SECOND) == SECOND
+
+  asyncio.run(run())
+
+
+def test_readRacingAWriteIsNeverServed(kind):
+
+  async def run():
+    a, b = makeWorkers(kind)
+    # B takes its version, then the write runs before B stores its result
+    version = await b.getVersion(COLLECTION, SESSION)
+    async with a.write(COLLECTION, SESSION) as write:
+      write.commit(updateMessages=lambda cached: cached.append(SECOND[-1]))
+    await b.storeMessages(COLLECTION, SESSION, FIRST, version)
+    assert await readThrough(b, SECOND) == SECOND
+    assert await readThrough(a, SECOND) == SECOND
+
+  asyncio.run(run())
+
+
+def test_overlappingWritesInvalidate(kind):
+
+  async def run():
+    a, b = makeWorkers(kind)
+    await readThrough(b, FIRST)
+    first = await a.beginWrite(COLLECTION, SESSION)
+    second = await b.beginWrite(COLLECTION, SESSION)
+    assert second.version // IN_FLIGHT == 2
+    assert second.messages is None
+    for write in (first, second):
+      write.commit(updateMessages=lambda cached: cached.append(SECOND[-1]))
+    await a.endWrite(first)
+    await b.endWrite(second)
+
+    assert a.stats["invalidations"] == 1
+    # Neither write could know the result of the other: the next read misses
+    assert await readThrough(b, SECOND) == SECOND
+    assert b.stats["misses"] == 2
+
+  asyncio.run(run())
+
+
+def test_expiredVersionNeverBringsBackOldEntries(kind):
+
+  async def run():
+    a, b = makeWorkers(kind, ttl=0.3)
+    async with a.write(COLLECTION, SESSION) as write:
+      write.commit()
+    await asyncio.sleep(0.15)
+    # Stored after the version last changed, so it outlives the version
+    await readThrough(b, FIRST)
+    old = await b.getVersion(COLLECTION, SESSION)
+    entryKey = b.entryKey("messages", COLLECTION, SESSION, old)
+    await asyncio.sleep(0.2)
+
+    assert await b.backend.get(entryKey) is not None
+    version = await b.getVersion(COLLECTION, SESSION)
+    assert version != old
+    assert await readThrough(b, SECOND) == SECOND
+
+  asyncio.run(run())
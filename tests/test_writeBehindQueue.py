@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+File Name: test_writeBehindQueue.py
+Description: Tests of the retries of the WriteBehindQueue.
+Author: MathTeixeira
+Date: August 3, 2024
+Version: 1.0.0
+License: MIT License
+Contact Information: mathteixeira55
+"""
+
+### Imports ###
+import asyncio
+
+from core.database import WriteBehindQueue
+
+
+class ScriptedWriter:
+  """
+  A writeBatch that fails the keys it is told to, a number of times each.
+
+  Attributes:
+    failures (dict): Failed attempts left per key (-1 fails forever).
+    raises (int): Batches left that raise instead of returning.
+    written (dict[str, list]): The items written per key, in order.
+    batches (list[dict]): Every batch received.
+  """
+
+  def __init__(self, failures: dict | None = None, raises: int = 0) -> None:
+    self.failures: dict = dict(failures or {})
+    self.raises: int = raises
+    self.written: dict[str, list] = {}
+    self.batches: list[dict] = []
+
+  async def __call__(self, batch: dict) -> dict:
+    self.batches.append({key: list(items) for key, items in batch.items()})
+    await asyncio.sleep(0)
+    if self.raises:
+      self.raises -= 1
+      raise ConnectionError("database unavailable")
+    results = {}
+    for key, items in batch.items():
+      left = self.failures.get(key, 0)
+      if left:
+        self.failures[key] = left - 1 if left > 0 else left
+        results[key] = False
+        continue
+      self.written.setdefault(key, []).extend(items)
+      results[key] = True
+    return results
+
+
+def makeQueue(writer: ScriptedWriter, maxAttempts: int = 4) -> WriteBehindQueue:
+  return WriteBehindQueue("test",
+                          writer,
+                          batchSize=10,
+                          maxPending=1000,
+                          flushSeconds=0.001,
+                          maxAttempts=maxAttempts,
+                          retrySeconds=0.01)
+
+
+def test_failedKeyIsRetriedInOrder():
+  writer = ScriptedWriter(failures={"a": 2})
+
+  async def scenario():
+    queue = makeQueue(writer)
+    await queue.put("a", [1, 2])
+    await asyncio.sleep(0.005)
+    # Queued while the first items are failing: written after them
+    await queue.put("a", [3])
+    written = await queue.flushKey("a")
+    return queue, written
+
+  queue, written = asyncio.run(scenario())
+  assert written
+  assert writer.written == {"a": [1, 2, 3]}
+  assert queue.stats["retried"] >= 2
+  assert queue.stats["failed"] == 0
+  assert queue.depth() == 0 and not queue.attempts
+
+
+def test_raisingBatchIsRetried():
+  writer = ScriptedWriter(raises=2)
+
+  async def scenario():
+    queue = makeQueue(writer)
+    await queue.put("a", ["x"])
+    await queue.put("b", ["y"])
+    return await queue.close()
+
+  assert asyncio.run(scenario())
+  assert writer.written == {"a": ["x"], "b": ["y"]}
+  assert len(writer.batches) == 3
+
+
+def test_keyIsDroppedAfterMaxAttempts():
+  writer = ScriptedWriter(failures={"bad": -1})
+
+  async def scenario():
+    queue = makeQueue(writer, maxAttempts=3)
+    await queue.put("bad", ["lost"])
+    await queue.put("good", ["kept"])
+    good = await queue.flushKey("good")
+    bad = await queue.flushKey("bad")
+    return queue, good, bad
+
+  queue, good, bad = asyncio.run(scenario())
+  assert good and not bad
+  assert writer.written == {"good": ["kept"]}
+  assert sum("bad" in batch for batch in writer.batches) == 3
+  assert queue.stats["failed"] == 1 and queue.dropped == {"bad": 1}
+
+
+def test_healthyKeysDoNotWaitForRetries():
+  writer = ScriptedWriter(failures={"bad": -1})
+
+  async def scenario():
+    queue = makeQueue(writer, maxAttempts=5)
+    queue.retrySeconds = 10
+    await queue.put("bad", ["b"])
+    await asyncio.sleep(0.01)
+    await queue.put("good", ["g"])
+    return await asyncio.wait_for(queue.flushKey("good"), 1)
+
+  assert asyncio.run(scenario())
+  assert writer.written == {"good": ["g"]}
+
+
+def test_closeReportsDroppedItems():
+  writer = ScriptedWriter(failures={"bad": -1})
+
+  async def scenario():
+    queue = makeQueue(writer, maxAttempts=2)
+    await queue.put("bad", ["b"])
+    return await queue.close()
+
+  assert not asyncio.run(scenario())
@@ -9,6 +9,11 @@ License: MIT License
 Contact Information: mathteixeira55
 """
 
-from .docDetails import collectionPath, fieldPath, valuePath, sessionPath
+from .docDetails import (collectionPath, fieldPath, valuePath, sessionPath,
+                         limitQuery, beforeQuery, afterQuery, countPath,
+                         indexPath)
 
-__all__ = ["collectionPath", "fieldPath", "valuePath", "sessionPath"]
+__all__ = [
+    "collectionPath", "fieldPath", "valuePath", "sessionPath", "limitQuery",
+    "beforeQuery", "afterQuery", "countPath", "indexPath"
+]
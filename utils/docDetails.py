@@ -22,6 +22,33 @@ from fastapi import Query, Path
 #         "value": "s"
 #     }})
 
+limitQuery: int | None = Query(
+    None,
+    ge=1,
+    description="Maximum number of messages to return",
+    openapi_examples={"Last screen": {
+        "summary": "Last 20 messages",
+        "value": 20
+    }})
+
+beforeQuery: int | None = Query(
+    None,
+    ge=0,
+    description="Only return messages before this position (older page)",
+    openapi_examples={"Older": {
+        "summary": "Messages before position 100",
+        "value": 100
+    }})
+
+afterQuery: int | None = Query(
+    None,
+    ge=0,
+    description="Only return messages after this position (newer page)",
+    openapi_examples={"Newer": {
+        "summary": "Messages after position 100",
+        "value": 100
+    }})
+
 ### Path Parameters ###
 # Path is used to define path parameters for the API endpoints.
 collectionPath: str = Path(
@@ -63,3 +90,21 @@ sessionPath: str = Path(
             "value": "be46af78-63da-42d8-9145-ea99419689c4"
         }
     })
+
+countPath: int = Path(
+    ...,
+    ge=1,
+    description="Number of messages",
+    openapi_examples={"Turn": {
+        "summary": "One human and one AI message",
+        "value": 2
+    }})
+
+indexPath: int = Path(
+    ...,
+    ge=0,
+    description="Position of a message in the chat session, starting at 0",
+    openapi_examples={"Test": {
+        "summary": "The tenth message",
+        "value": 9
+    }})